@@ -0,0 +1,88 @@
+# ROM images larger than the 64K address space, with banked regions
+#
+# A bank map tells which part of the image the CPU sees in each bank: the
+# addresses of the window come from the bank's offset in the image, the other
+# (common) addresses from the same offset in the image.  Each bank is traced
+# as its own 64K view, built on demand from a memory-mapped image so that only
+# the banks traced are read from the file.
+import mmap
+
+ADDRESS_SPACE = 0x10000
+ERASED = 0xff
+
+class BankMap(object):
+    '''The window (a range of CPU addresses) and the image offset of the
+    window of each bank'''
+
+    def __init__(self, window, offsets):
+        if window.start < 0 or window.stop > ADDRESS_SPACE or not len(window):
+            raise ValueError("Bank window must be within 0x0000-0xffff")
+        self.window = window
+        self.offsets = list(offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def regions(self, bank):
+        '''Return the (address, image offset, length) regions of the view of
+        bank'''
+        window = self.window
+        return [
+            (0, 0, window.start),
+            (window.start, self.offsets[bank], len(window)),
+            (window.stop, window.stop, ADDRESS_SPACE - window.stop),
+        ]
+
+    def bank_image(self, image, bank):
+        '''Return the 64K view of bank read from image (e.g. an mmap).
+        Addresses beyond the end of image read as erased.'''
+        if not 0 <= bank < len(self.offsets):
+            raise ValueError("Bank %d not in bank map (%d banks)"
+                             % (bank, len(self.offsets)))
+        contents = bytearray([ERASED]) * ADDRESS_SPACE
+        for address, offset, length in self.regions(bank):
+            chunk = image[offset:offset + length]
+            contents[address:address + len(chunk)] = chunk
+        return contents
+
+
+def parse_bank_map(spec, image_size):
+    '''Parse a START-END[:OFFSET,...] bank map (END is inclusive).  Without
+    offsets, the windows of the banks follow each other in the image after
+    the common area below START, as many as the image holds: bank N is read
+    from START + N * (END - START + 1), so bank 0 is the first 64K.'''
+    window_spec, _, offsets_spec = spec.partition(':')
+    start, sep, end = window_spec.partition('-')
+    try:
+        window = range(int(start, 0), int(end, 0) + 1)
+        offsets = [int(offset, 0) for offset in offsets_spec.split(',')
+                   if offsets_spec]
+    except ValueError:
+        raise ValueError(f"Invalid bank map {spec!r}") from None
+    if not sep:
+        raise ValueError(f"Invalid bank map {spec!r}")
+    if not offsets:
+        offsets = list(range(window.start, max(image_size, window.stop),
+                             max(len(window), 1)))
+    return BankMap(window, offsets)
+
+def load_rom(image, bank_map=None, bank=0):
+    '''Return the 64K contents traced for image (e.g. an mmap): the view of
+    bank if bank_map (a START-END[:OFFSET,...] spec) is given, else the
+    whole image, which must then fit in the address space'''
+    if bank_map is not None:
+        return parse_bank_map(bank_map, len(image)).bank_image(image, bank)
+    if len(image) > ADDRESS_SPACE:
+        raise ValueError("Image is larger than 64K, a bank map is needed")
+    return bytearray(image)
+
+def open_image(filename):
+    '''Return a read-only mmap of the ROM image filename'''
+    with open(filename, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def read_rom(filename, bank_map=None, bank=0):
+    '''Return the 64K contents traced for the ROM image filename, see
+    load_rom()'''
+    with open_image(filename) as image:
+        return load_rom(image, bank_map, bank)
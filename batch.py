@@ -0,0 +1,121 @@
+# Disassemble a library of ROM images in a pool of worker processes
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import sys
+import time
+
+import banks
+from dasm import analyze, make_printer, write_listing
+from profiling import Profiler
+
+LISTING_EXTENSION = '.lst'
+SUMMARY_FILENAME = 'summary.json'
+IMAGE_EXTENSIONS = ('.bin', '.rom')
+
+def find_images(source):
+    '''Return the ROM image paths of a directory (*.bin, *.rom) or of a
+    manifest file listing one image path per line.  Manifest paths are
+    relative to the manifest, blank lines and lines starting with # are
+    ignored.'''
+    if os.path.isdir(source):
+        names = sorted(os.listdir(source))
+        return [os.path.join(source, name) for name in names
+                if name.lower().endswith(IMAGE_EXTENSIONS)]
+
+    images = []
+    base = os.path.dirname(source)
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                images.append(os.path.join(base, line))
+    return images
+
+def listing_filename(image, output_dir):
+    name = os.path.splitext(os.path.basename(image))[0]
+    return os.path.join(output_dir, name + LISTING_EXTENSION)
+
+def disassemble_image(image, listing, bank_map=None, bank=0):
+    '''Run the whole pipeline on one image (on bank of bank_map, see
+    banks.load_rom) and write its listing.  Return a summary dict; failures
+    are reported in it rather than raised.'''
+    result = {'image': image, 'listing': listing, 'error': None}
+    profiler = Profiler()
+    start = time.perf_counter()
+    try:
+        with profiler.phase('load'):
+            rom = banks.read_rom(image, bank_map, bank)
+        result['size'] = len(rom)
+
+        memory, symbol_table = analyze(rom, profiler=profiler)
+        result['analysis_seconds'] = time.perf_counter() - start
+
+        with profiler.phase('listing'):
+            write_listing(make_printer(memory, symbol_table), listing)
+    except Exception as exc:
+        result['error'] = '%s: %s' % (type(exc).__name__, exc)
+    result['seconds'] = time.perf_counter() - start
+    result['profile'] = profiler.to_dict()
+    return result
+
+def run_batch(images, output_dir, jobs=None, bank_map=None, bank=0):
+    '''Disassemble images in a pool of jobs processes (one per CPU by
+    default) and return their summaries in input order'''
+    os.makedirs(output_dir, exist_ok=True)
+    listings = [listing_filename(image, output_dir) for image in images]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(disassemble_image, images, listings,
+                                 [bank_map] * len(images),
+                                 [bank] * len(images)))
+
+if __name__ == '__main__':
+    # Parse command line
+    parser = argparse.ArgumentParser(description="NEC 78K Batch Disassembler.")
+    parser.add_argument("source",       help="Directory of ROM images or manifest file", type=str)
+    parser.add_argument("-o", "--output-dir", help="Listings directory (listings)", type=str, default="listings")
+    parser.add_argument("-j", "--jobs", help="Number of worker processes (one per CPU)", type=int, default=None)
+    parser.add_argument("--banks",      help="Bank map START-END[:OFFSET,...] of images larger than 64K", type=str, default=None)
+    parser.add_argument("--bank",       help="Bank to disassemble with --banks (0)", type=int, default=0)
+    parser.add_argument("-d",           help="Set loglevel to debug", action="store_true")
+
+    args = parser.parse_args()
+
+    # Setup logger
+    loglevel = logging.DEBUG if args.d else logging.INFO
+    logging.basicConfig(stream=sys.stdout, level=loglevel)
+
+    logger = logging.getLogger("Disassembler")
+
+    try:
+        images = find_images(args.source)
+    except OSError:
+        logger.error(f"Unable to read {args.source}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results = run_batch(images, args.output_dir, args.jobs, args.banks, args.bank)
+    elapsed = time.perf_counter() - start
+
+    failures = [r for r in results if r['error'] is not None]
+    for r in results:
+        if r['error'] is None:
+            logger.debug(f"{r['image']}: {r['seconds']:.2f}s")
+        else:
+            logger.error(f"{r['image']}: {r['error']}")
+
+    summary = {
+        'images': len(results),
+        'failures': len(failures),
+        'seconds': elapsed,
+        'results': results,
+    }
+    summary_filename = os.path.join(args.output_dir, SUMMARY_FILENAME)
+    with open(summary_filename, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    logger.info(f"{len(results)} images, {len(failures)} failures in "
+                f"{elapsed:.2f}s, summary in {summary_filename}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,191 @@
+# Conformance and speed of disassemble() over every opcode encoding
+#
+# Record the decode of the current decoder as a golden table, check an
+# alternative (e.g. optimized) decoder against it, and time either one:
+#
+#   python3 benchmarks/decoder.py record golden.json.gz
+#   python3 benchmarks/decoder.py check golden.json.gz --decoder mymodule:disassemble
+#   python3 benchmarks/decoder.py bench --decoder mymodule:disassemble
+import argparse
+import gzip
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from uPD78k2.disassemble import IllegalInstructionError
+
+GOLDEN_VERSION = 1
+DEFAULT_DECODER = 'uPD78k2.disassemble:disassemble'
+
+# Every input is decoded at the start of its own slot of a 64K image
+SLOT_SIZE = 8
+SLOTS_PER_IMAGE = 0x10000 // SLOT_SIZE
+
+# Operand bytes following the two opcode bytes: sign and parity boundaries
+# of displacements and addresses, saddr/sfr ranges and all zeros/ones
+OPERAND_PATTERNS = (
+    (0x00, 0x00, 0x00, 0x00),
+    (0xff, 0xff, 0xff, 0xff),
+    (0x01, 0xfe, 0x81, 0x7f),
+    (0x7f, 0x80, 0x1f, 0x20),
+)
+
+
+def iter_inputs():
+    '''Yield the byte sequence of every input: all first and second bytes,
+    with and without the 0x01 prefix, followed by each operand pattern'''
+    for prefix in ((), (0x01, )):
+        for first in range(256):
+            for second in range(256):
+                for operands in OPERAND_PATTERNS:
+                    yield bytes(prefix + (first, second) + operands)
+
+def build_images():
+    '''Return the 64K images holding the inputs and the (image index, pc)
+    of each input, in iter_inputs() order'''
+    images = []
+    locations = []
+    for i, code in enumerate(iter_inputs()):
+        slot = i % SLOTS_PER_IMAGE
+        if slot == 0:
+            images.append(bytearray(0x10000))
+        pc = slot * SLOT_SIZE
+        images[-1][pc:pc + len(code)] = code
+        locations.append((len(images) - 1, pc))
+    return images, locations
+
+def inputs_digest(images):
+    h = hashlib.sha256()
+    for rom in images:
+        h.update(rom)
+    return h.hexdigest()
+
+def load_decoder(spec):
+    '''Return the decoder function named by 'module:function' '''
+    module_name, _, func_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), func_name or 'disassemble')
+
+def signature(decoder, rom, pc):
+    '''Return what the golden table records for the decode at pc: None for
+    an illegal instruction, the exception name for any other failure, or
+    [text, asm_args, flow_type, length]'''
+    try:
+        inst = decoder(rom, pc)
+    except IllegalInstructionError:
+        return None
+    except Exception as exc:
+        return type(exc).__name__
+    asm_args = [[address, arg_type] for address, arg_type in inst.asm_args]
+    return [inst.to_string(), asm_args, inst.flow_type, len(inst)]
+
+def opcode_class(code, sig):
+    '''Return the mnemonic of a decode, prefixed by 01 for prefixed ones'''
+    if sig is None:
+        name = 'illegal'
+    elif isinstance(sig, str):
+        name = 'error'
+    else:
+        name = sig[0].split()[0].upper()
+    return '01 ' + name if code[0] == 0x01 else name
+
+
+def record(decoder, filename):
+    images, locations = build_images()
+    entries = [signature(decoder, images[i], pc) for i, pc in locations]
+    golden = {
+        'version': GOLDEN_VERSION,
+        'inputs': inputs_digest(images),
+        'entries': entries,
+    }
+    with gzip.open(filename, 'wt') as f:
+        json.dump(golden, f)
+    return len(entries)
+
+def check(decoder, filename, max_reports=20):
+    '''Compare decoder against the golden table.  Return the list of
+    (input bytes, expected, actual) mismatches.'''
+    with gzip.open(filename, 'rt') as f:
+        golden = json.load(f)
+    images, locations = build_images()
+    if golden['version'] != GOLDEN_VERSION or golden['inputs'] != inputs_digest(images):
+        raise ValueError(f"{filename} was recorded from different inputs")
+
+    mismatches = []
+    for code, (i, pc), expected in zip(iter_inputs(), locations, golden['entries']):
+        # round trip through JSON so that tuples compare equal to lists
+        actual = json.loads(json.dumps(signature(decoder, images[i], pc)))
+        if actual != expected:
+            mismatches.append((code, expected, actual))
+    return mismatches
+
+def bench(decoder, repeat=3):
+    '''Return {opcode class: (inputs, ns per decode)} for decoder, keeping
+    the fastest of repeat runs'''
+    images, locations = build_images()
+    classes = {}
+    for code, (i, pc) in zip(iter_inputs(), locations):
+        name = opcode_class(code, signature(decoder, images[i], pc))
+        classes.setdefault(name, []).append((images[i], pc))
+
+    results = {}
+    for name, inputs in sorted(classes.items()):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for rom, pc in inputs:
+                try:
+                    decoder(rom, pc)
+                except Exception:
+                    pass
+            best = min(best, time.perf_counter() - start)
+        results[name] = (len(inputs), best * 1e9 / len(inputs))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Decoder conformance and speed.")
+    parser.add_argument("command", choices=("record", "check", "bench"))
+    parser.add_argument("golden",   help="Golden table file (record, check)", nargs="?", default=None)
+    parser.add_argument("--decoder", help=f"Decoder as module:function ({DEFAULT_DECODER})",
+                        type=str, default=DEFAULT_DECODER)
+    parser.add_argument("-r", "--repeat", help="Runs per opcode class, the fastest is kept (3)", type=int, default=3)
+    parser.add_argument("-o", "--output", help="Write bench results to a JSON file", type=str, default=None)
+
+    args = parser.parse_args()
+    decoder = load_decoder(args.decoder)
+
+    if args.command in ('record', 'check') and args.golden is None:
+        parser.error(f"{args.command} needs a golden table file")
+
+    if args.command == 'record':
+        count = record(decoder, args.golden)
+        print(f"{count} decodes recorded in {args.golden}")
+
+    elif args.command == 'check':
+        mismatches = check(decoder, args.golden)
+        for code, expected, actual in mismatches[:20]:
+            print(f"{code.hex(' ')}: expected {expected!r}, got {actual!r}")
+        print(f"{len(mismatches)} mismatches")
+        sys.exit(1 if mismatches else 0)
+
+    else:
+        results = bench(decoder, args.repeat)
+        total = sum(count for count, _ in results.values())
+        total_ns = sum(count * ns for count, ns in results.values())
+        print('%-12s %8s %10s' % ('class', 'inputs', 'ns/inst'))
+        for name, (count, ns) in results.items():
+            print('%-12s %8d %10.0f' % (name, count, ns))
+        print('%-12s %8d %10.0f' % ('all', total, total_ns / total))
+        if args.output is not None:
+            with open(args.output, 'w') as f:
+                json.dump({
+                    'decoder': args.decoder,
+                    'repeat': args.repeat,
+                    'classes': {name: {'inputs': count, 'ns_per_instruction': ns}
+                                for name, (count, ns) in results.items()},
+                }, f, indent=2)
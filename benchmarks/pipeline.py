@@ -0,0 +1,102 @@
+# Time each phase of the disassembly pipeline on the synthetic ROM images
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import roms
+from dasm import ALL_VECTORS, ENTRY_POINTS, TRACEABLE_RANGE, make_printer
+from memory import Memory
+from trace import Tracer
+from uPD78k2.disassemble import disassemble
+from uPD78k2.symbols import SymbolTable, uPD78213_SYMBOLS
+
+PHASES = ('memory', 'trace', 'symbols', 'listing')
+
+
+def run_pipeline(rom):
+    '''Run the pipeline once on rom.  Return the seconds spent in each phase
+    and the resulting memory and symbol table.'''
+    times = {}
+
+    start = time.perf_counter()
+    memory = Memory(rom)
+    times['memory'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tracer = Tracer(memory, ENTRY_POINTS, ALL_VECTORS, TRACEABLE_RANGE)
+    tracer.trace(disassemble)
+    times['trace'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    symbol_table = SymbolTable(uPD78213_SYMBOLS)
+    symbol_table.generate(memory, TRACEABLE_RANGE)
+    times['symbols'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    make_printer(memory, symbol_table).print_listing(io.StringIO())
+    times['listing'] = time.perf_counter() - start
+
+    return times, memory, symbol_table
+
+
+def bench_image(name, seed, repeat):
+    '''Return the result of the fastest of repeat runs of each phase on
+    image name'''
+    rom = roms.generate(name, seed)
+    best = dict.fromkeys(PHASES, float('inf'))
+    for _ in range(repeat):
+        times, memory, symbol_table = run_pipeline(rom)
+        for phase in PHASES:
+            best[phase] = min(best[phase], times[phase])
+
+    return {
+        'image': name,
+        'seed': seed,
+        'size': len(rom),
+        'instructions': len(memory.instructions),
+        'symbols': len(symbol_table.symbols),
+        'seconds': best,
+        'total_seconds': sum(best.values()),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Disassembly pipeline benchmark.")
+    parser.add_argument("-o", "--output", help="Results file (pipeline.json)", type=str, default="pipeline.json")
+    parser.add_argument("-r", "--repeat", help="Runs per image, the fastest is kept (3)", type=int, default=3)
+    parser.add_argument("-s", "--seed",   help="Seed of the image generators (0)", type=int, default=0)
+    parser.add_argument("images", help="Images to run (all): %s" % ", ".join(roms.GENERATORS),
+                        nargs="*")
+
+    args = parser.parse_args()
+    names = args.images or list(roms.GENERATORS)
+    for name in names:
+        if name not in roms.GENERATORS:
+            parser.error(f"unknown image {name}")
+
+    results = []
+    print('%-14s %8s' % ('image', 'insts') +
+          ''.join('%10s' % phase for phase in PHASES) + '%10s' % 'total')
+    for name in names:
+        result = bench_image(name, args.seed, args.repeat)
+        results.append(result)
+        print('%-14s %8d' % (name, result['instructions']) +
+              ''.join('%10.4f' % result['seconds'][phase] for phase in PHASES) +
+              '%10.4f' % result['total_seconds'])
+
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
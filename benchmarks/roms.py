@@ -0,0 +1,183 @@
+# Reproducible synthetic 78K/II ROM images for the benchmarks
+import bisect
+import os
+import random
+import sys
+
+IMAGE_SIZE = 0x10000
+CODE_START = 0x0100
+CODE_END = 0xff00
+STUB_ADDRESS = 0x00ff       # RET, target of the unused vectors and CALLT table
+CALLF_AREA = range(0x0800, 0x1000)
+
+NOP = 0x00
+RET = 0x56
+
+# (opcode, number of operand bytes) of instructions that fall through
+_STRAIGHT = (
+    [(NOP, 0)] +
+    [(0xb8 | r, 1) for r in range(8)] +     # MOV r, #byte
+    [(0xd0 | r, 0) for r in range(8)] +     # MOV A, r
+    [(0xc0 | r, 0) for r in range(16)] +    # INC/DEC r
+    [(0x60 | rp, 2) for rp in range(8)] +   # MOVW rp, #word
+    [(0xa8 | op, 1) for op in range(8)] +   # ALU A, #byte
+    [(0x20, 1), (0x22, 1)] +                # MOV A, saddr / MOV saddr, A
+    [(0x44 | rp, 0) for rp in range(4)]     # INCW rp
+)
+
+
+def _straight(r):
+    '''Return the bytes of a random instruction that falls through'''
+    opcode, operands = r.choice(_STRAIGHT)
+    return bytes([opcode] + [r.randrange(256) for _ in range(operands)])
+
+def _image(reset_vector=CODE_START):
+    '''Return an erased (0xff) image where the reset vector points to
+    reset_vector and the other hardware vectors and the CALLT table entries
+    to a RET stub.'''
+    rom = bytearray([0xff]) * IMAGE_SIZE
+    for vector in range(0, 0x80, 2):
+        rom[vector] = STUB_ADDRESS & 0xff
+        rom[vector + 1] = STUB_ADDRESS >> 8
+    rom[STUB_ADDRESS] = RET
+    rom[0] = reset_vector & 0xff
+    rom[1] = reset_vector >> 8
+    return rom
+
+def _terminate(rom, address):
+    '''Write BR !CODE_START at address'''
+    rom[address:address + 3] = bytes([0x2c, CODE_START & 0xff, CODE_START >> 8])
+
+
+def straight_line(seed=0):
+    '''Dense code without any branch, from CODE_START up to CODE_END'''
+    r = random.Random(seed)
+    rom = _image()
+    address = CODE_START
+    while address < CODE_END:
+        inst = _straight(r)
+        rom[address:address + len(inst)] = inst
+        address += len(inst)
+    _terminate(rom, address)
+    return rom
+
+def branch_heavy(seed=0):
+    '''Short blocks ended by conditional or unconditional relative branches
+    to nearby instructions'''
+    r = random.Random(seed)
+    rom = _image()
+    starts = []
+    branches = []
+    address = CODE_START
+    while address < CODE_END:
+        for _ in range(r.randrange(1, 4)):
+            inst = _straight(r)
+            starts.append(address)
+            rom[address:address + len(inst)] = inst
+            address += len(inst)
+        starts.append(address)
+        branches.append(address)
+        if r.randrange(8):
+            rom[address] = 0x80 | r.randrange(4)  # BNZ/BZ/BNC/BC $addr16
+        else:
+            rom[address] = 0x14  # BR $addr16
+        address += 2
+    _terminate(rom, address)
+
+    # point every branch to an instruction start within reach
+    for branch in branches:
+        low = bisect.bisect_left(starts, branch + 2 - 128)
+        high = bisect.bisect_right(starts, branch + 2 + 127)
+        target = starts[r.randrange(low, high)]
+        rom[branch + 1] = (target - (branch + 2)) & 0xff
+    return rom
+
+def call_heavy(seed=0):
+    '''Straight code interleaved with CALLF, CALLT and CALL !addr16 to small
+    subroutines'''
+    r = random.Random(seed)
+    rom = _image()
+
+    def subroutine(address):
+        for _ in range(r.randrange(0, 4)):
+            inst = _straight(r)
+            rom[address:address + len(inst)] = inst
+            address += len(inst)
+        rom[address] = RET
+        return address + 1
+
+    callf_targets = []
+    address = CALLF_AREA.start
+    while address < CALLF_AREA.stop - 16:
+        callf_targets.append(address)
+        address = subroutine(address)
+
+    call_targets = []
+    address = 0xe000
+    while address < CODE_END - 16:
+        call_targets.append(address)
+        address = subroutine(address)
+
+    address = 0x1000
+    while address < 0xe000 - 8:
+        kind = r.randrange(4)
+        if kind == 0:
+            target = r.choice(callf_targets)
+            inst = bytes([0x90 | ((target >> 8) & 0x07), target & 0xff])
+        elif kind == 1:
+            inst = bytes([0xe0 | r.randrange(0x20)])
+        elif kind == 2:
+            target = r.choice(call_targets)
+            inst = bytes([0x28, target & 0xff, target >> 8])
+        else:
+            inst = _straight(r)
+        rom[address:address + len(inst)] = inst
+        address += len(inst)
+    _terminate(rom, address)
+
+    rom[CODE_START:CODE_START + 3] = bytes([0x2c, 0x00, 0x10])  # BR !0x1000
+    return rom
+
+def erased(seed=0):
+    '''Mostly erased (0xff) flash with a short program'''
+    r = random.Random(seed)
+    rom = _image()
+    address = CODE_START
+    while address < CODE_START + 0x100:
+        inst = _straight(r)
+        rom[address:address + len(inst)] = inst
+        address += len(inst)
+    _terminate(rom, address)
+    return rom
+
+def random_bytes(seed=0):
+    '''Random bytes with vectors to random addresses'''
+    r = random.Random(seed)
+    rom = bytearray(r.randrange(256) for _ in range(IMAGE_SIZE))
+    for vector in range(0, 0x80, 2):
+        target = r.randrange(CODE_START, 0xf000)
+        rom[vector] = target & 0xff
+        rom[vector + 1] = target >> 8
+    return rom
+
+
+GENERATORS = {
+    'straight_line': straight_line,
+    'branch_heavy': branch_heavy,
+    'call_heavy': call_heavy,
+    'erased': erased,
+    'random': random_bytes,
+}
+
+def generate(name, seed=0):
+    return GENERATORS[name](seed)
+
+
+if __name__ == '__main__':
+    # Write all images to the directory given on the command line, for
+    # use with dasm.py or batch.py
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'roms'
+    os.makedirs(directory, exist_ok=True)
+    for name in GENERATORS:
+        with open(os.path.join(directory, name + '.bin'), 'wb') as f:
+            f.write(generate(name))
@@ -0,0 +1,54 @@
+# Tracing time against the number of queued processor states
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from memory import Memory
+from trace import Tracer, TraceQueue, ProcessorState
+from uPD78k2.disassemble import disassemble
+
+
+def bench_queue(count):
+    '''Push count states in random PC order, then pop them all'''
+    pcs = list(range(count))
+    random.Random(count).shuffle(pcs)
+
+    start = time.perf_counter()
+    queue = TraceQueue()
+    for pc in pcs:
+        queue.push(ProcessorState(pc=pc))
+    while len(queue):
+        queue.pop()
+    return time.perf_counter() - start
+
+
+def callf_rom(count):
+    '''Return a 64K image where 0x0000 starts a run of count CALLF !addr11
+    instructions (2 bytes each) followed by RET, with RET at every CALLF
+    target.  Each CALLF queues two states, so the queue grows with count.'''
+    rom = bytearray([0x56]) * 0x10000  # RET
+    for i in range(count):
+        target = 0x0800 + (i * 2) % 0x0800
+        rom[0x1000 + i * 2] = 0x90 | ((target >> 8) & 0x07)
+        rom[0x1000 + i * 2 + 1] = target & 0xff
+    rom[0] = 0x2c  # BR !0x1000
+    rom[1] = 0x00
+    rom[2] = 0x10
+    return rom
+
+
+def bench_trace(count):
+    memory = Memory(callf_rom(count))
+    tracer = Tracer(memory, [0], [], range(0, 0xffff))
+    start = time.perf_counter()
+    tracer.trace(disassemble)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    print('%8s %12s %12s' % ('states', 'queue (s)', 'trace (s)'))
+    for count in (500, 1000, 2000, 4000, 8000, 16000):
+        print('%8d %12.4f %12.4f' % (count, bench_queue(count), bench_trace(count)))
@@ -0,0 +1,122 @@
+# On-disk cache of the analysis (tracing and symbol generation) of a ROM image
+import hashlib
+import itertools
+import os
+import struct
+import zlib
+
+from memory import LazyInstructions, LocationTypes, Memory
+from uPD78k2.symbols import SymbolTable
+
+# Bump in every change to decoding, tracing, xrefs or symbol generation (any
+# change of the traced or generated output), so results of an older version
+# are never reused
+CACHE_VERSION = 8
+
+CACHE_EXTENSION = '.k2c'
+_MAGIC = b'K2DC'
+_HEADER = struct.Struct('<4sH32sI')  # magic, version, key, image size
+_SYMBOL = struct.Struct('<IHH')      # address, name and comment lengths
+_XREF = struct.Struct('<IIB')        # target, source, XrefKinds
+
+
+def cache_key(rom, entry_points, vectors, traceable_range):
+    '''Return the digest identifying an analysis of rom with this
+    configuration'''
+    h = hashlib.sha256()
+    h.update(b'%d\0' % CACHE_VERSION)
+    h.update(bytes(rom))
+    h.update(b'\0entry_points=%r' % list(entry_points))
+    h.update(b'\0vectors=%r' % list(vectors))
+    h.update(b'\0traceable_range=%d,%d' % (traceable_range.start,
+                                           traceable_range.stop))
+    return h.digest()
+
+def cache_filename(directory, key):
+    return os.path.join(directory, key.hex() + CACHE_EXTENSION)
+
+def save_analysis(filename, key, memory, symbol_table):
+    '''Write the location types, annotations, cross references and
+    generated symbols of an analysis.  The generated symbols shadowed by
+    initial ones are saved too, so that they are still used once these
+    initial symbols are removed.'''
+    symbols = []
+    for address, (name, comment) in sorted(symbol_table.generated.items()):
+        name = name.encode('utf-8')
+        comment = comment.encode('utf-8')
+        symbols.append(_SYMBOL.pack(address, len(name), len(comment)))
+        symbols.append(name)
+        symbols.append(comment)
+
+    # xrefs are saved rather than rebuilt from the instructions since the
+    # tracer adds some (BR rp and CALL rp targets) that no decode yields
+    xrefs = [_XREF.pack(target, source, kind)
+             for target, sources in memory.xrefs.items()
+             for source, kind in sources]
+
+    payload = b''.join([
+        bytes(memory.types),
+        bytes(memory.annotations),
+        struct.pack('<I', len(xrefs)),
+    ] + xrefs + [
+        struct.pack('<I', len(symbols) // 3),
+    ] + symbols)
+
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, CACHE_VERSION, key, len(memory)))
+        f.write(zlib.compress(payload))
+    os.replace(tmp_filename, filename)
+
+def load_analysis(filename, key, rom, disassemble_func, initial_symbols):
+    '''Return the cached (memory, symbol_table) of rom, or None if there is
+    no usable cache entry.  Instructions are decoded again from the cached
+    instruction starts when first accessed.'''
+    try:
+        with open(filename, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, cached_key, size = _HEADER.unpack_from(data)
+    if (magic, version, cached_key, size) != (_MAGIC, CACHE_VERSION, key, len(rom)):
+        return None
+
+    try:
+        payload = zlib.decompress(data[_HEADER.size:])
+    except zlib.error:
+        return None
+
+    memory = Memory(rom)
+    memory.types[:] = payload[:size]
+    memory.annotations[:] = payload[size:2 * size]
+    memory.annotated.update(itertools.compress(range(size), memory.annotations))
+    starts = [address for address, loc_type in enumerate(memory.types)
+              if loc_type == LocationTypes.InstructionStart]
+    memory.instructions = LazyInstructions(starts, memory.contents,
+                                           disassemble_func)
+
+    offset = 2 * size
+    count, = struct.unpack_from('<I', payload, offset)
+    offset += 4
+    for target, source, kind in _XREF.iter_unpack(
+            payload[offset:offset + count * _XREF.size]):
+        memory.add_xref(target, source, kind)
+    offset += count * _XREF.size
+
+    symbol_table = SymbolTable(initial_symbols)
+    count, = struct.unpack_from('<I', payload, offset)
+    offset += 4
+    for _ in range(count):
+        address, name_len, comment_len = _SYMBOL.unpack_from(payload, offset)
+        offset += _SYMBOL.size
+        name = payload[offset:offset + name_len].decode('utf-8')
+        offset += name_len
+        comment = payload[offset:offset + comment_len].decode('utf-8')
+        offset += comment_len
+        symbol_table.generated[address] = (name, comment)
+        symbol_table.symbols.setdefault(address, (name, comment))
+
+    return memory, symbol_table
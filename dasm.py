@@ -1,23 +1,157 @@
 # Work derived from https://github.com/mnaberez/k0dasm
 import argparse
 import logging
+import os
+import sqlite3
 import sys
 
+import banks
+import cache
+import database
+import export
 from memory import Memory
-from trace import Tracer
+from profiling import Profiler
+from trace import Tracer, TraceEventLog
 from listing import Printer
 from uPD78k2.disassemble import disassemble
 from uPD78k2.symbols import SymbolTable, uPD78213_SYMBOLS
 
 ROM_FILENAME = 'rom.bin'
+OUTPUT_BUFFER_SIZE = 1 << 20
+
 def _vector(address):
     return address[0] + (address[1] >> 8)
 
+HARDWARE_VECTORS = [
+    0x0000, # RST
+    0x0002, # NMI
+    0x0004, # (unused)
+    0x0006, # INTP0
+    0x0008, # INTP1
+    0x000a, # INTP2
+    0x000c, # INTP3
+    0x000e, # INTP4/INTC30
+    0x0010, # INTP5/INTAD
+    0x0012, # INTP6/INTC20
+    0x0014, # INTC00
+    0x0016, # INTC01
+    0x0018, # INTC10
+    0x001a, # INTC11
+    0x001c, # INTC21
+    0x001e, # (unused)
+    0x0020, # INTSER
+    0x0022, # INTSR
+    0x0024, # INTST
+    0x0026, # INTCSI
+    0x0028, # INTEER
+    0x002a, # INTEPW
+    0x002c, # (unused)
+    0x002e, # (unused)
+    0x0030, # (unused)
+    0x0032, # (unused)
+    0x0034, # (unused)
+    0x0036, # (unused)
+    0x0038, # (unused)
+    0x003a, # (unused)
+    0x003c, # (unused)
+    0x003e,  # BRK
+]
+#CALLT_VECTORS = list(range(0x40, 0x7f, 2))
+CALLT_VECTORS = list(range(0x42, 0x7f, 2))
+ALL_VECTORS = HARDWARE_VECTORS + CALLT_VECTORS
+
+ENTRY_POINTS = [
+]
+
+START_ADDRESS = 0
+#TRACEABLE_RANGE = range(START_ADDRESS, START_ADDRESS + len(rom) + 1)
+TRACEABLE_RANGE = range(START_ADDRESS, 0xffff)
+
+def analyze(rom, entry_points=ENTRY_POINTS, vectors=ALL_VECTORS,
+            traceable_range=TRACEABLE_RANGE, cache_dir=None, profiler=None,
+            trace_hook=None):
+    '''Trace a ROM image and generate its symbols.  Return the
+    (memory, symbol_table) pair.  With a cache_dir, the results are reused
+    from, or saved to, the cache.  When only a leading part of entry_points
+    has a cached analysis, the remaining entry points are traced
+    incrementally on top of it.  The phases and tracer counters are recorded
+    in profiler, if any, and trace_hook is passed to the Tracer as its
+    event hook.'''
+    if profiler is None:
+        profiler = Profiler()
+
+    memory = None
+    if cache_dir is not None:
+        with profiler.phase('cache load'):
+            for count in range(len(entry_points), -1, -1):
+                key = cache.cache_key(rom, entry_points[:count], vectors,
+                                      traceable_range)
+                cached = cache.load_analysis(cache.cache_filename(cache_dir, key),
+                                             key, rom, disassemble,
+                                             uPD78213_SYMBOLS)
+                if cached is not None:
+                    if count == len(entry_points):
+                        return cached
+                    memory, _ = cached
+                    break
+
+    incremental = memory is not None
+    if not incremental:
+        with profiler.phase('memory'):
+            memory = Memory(rom)
+
+    with profiler.phase('trace'):
+        if incremental:
+            tracer = Tracer(memory, entry_points[count:], [], traceable_range,
+                            event_hook=trace_hook)
+        else:
+            tracer = Tracer(memory, entry_points, vectors, traceable_range,
+                            event_hook=trace_hook)
+        tracer.trace(disassemble)
+    profiler.counters.update(tracer.counters())
+
+    with profiler.phase('symbols'):
+        symbol_table = SymbolTable(uPD78213_SYMBOLS)
+        symbol_table.generate(memory, traceable_range)
+
+    if cache_dir is not None:
+        with profiler.phase('cache save'):
+            os.makedirs(cache_dir, exist_ok=True)
+            key = cache.cache_key(rom, entry_points, vectors, traceable_range)
+            cache.save_analysis(cache.cache_filename(cache_dir, key), key,
+                                memory, symbol_table)
+    return memory, symbol_table
+
+def make_printer(memory, symbol_table, traceable_range=TRACEABLE_RANGE):
+    return Printer(memory,
+                   traceable_range.start,
+                   traceable_range[-1] - 1,
+                   symbol_table
+                   )
+
+def write_listing(printer, filename, jobs=1):
+    with open(filename, 'w', buffering=OUTPUT_BUFFER_SIZE) as f:
+        printer.print_listing(f, jobs=jobs)
+
 if __name__ == '__main__':
     # Parse command line
     parser = argparse.ArgumentParser(description="NEC 78K Disassembler.")
     parser.add_argument("-f", type=str, help=f"ROM file ({ROM_FILENAME})", nargs="?", default=ROM_FILENAME)
     parser.add_argument("-d",           help="Set loglevel to debug", action="store_true")
+    parser.add_argument("--output",     help="Listing file (stdout)", type=str, default=None)
+    parser.add_argument("-j", "--jobs", help="Render the listing in JOBS processes (1)", type=int, default=1)
+    parser.add_argument("--cache",      help="Reuse the analysis cached in CACHE directory", type=str, default=None)
+    parser.add_argument("-e", "--entry-point", help="Additional entry point (repeatable)",
+                        type=lambda x: int(x, 0), action="append", default=[])
+    parser.add_argument("--profile",    help="Report time, memory and counters of each phase on stderr", action="store_true")
+    parser.add_argument("--profile-json", help="Write the profile report to a JSON file", type=str, default=None)
+    parser.add_argument("--profile-heap", help="Measure the peak Python heap of each phase with tracemalloc (slower)", action="store_true")
+    parser.add_argument("--export",     help="Write the analysis to a binary export file", type=str, default=None)
+    parser.add_argument("--sqlite",     help="Add the analysis to an SQLite database", type=str, default=None)
+    parser.add_argument("--name",       help="Image name in the SQLite database (ROM file name)", type=str, default=None)
+    parser.add_argument("--trace-log",  help="Write the tracer events to an NDJSON file", type=str, default=None)
+    parser.add_argument("--banks",      help="Bank map START-END[:OFFSET,...] of an image larger than 64K", type=str, default=None)
+    parser.add_argument("--bank",       help="Bank to disassemble with --banks (0)", type=int, default=0)
 
     args = parser.parse_args()
 
@@ -27,68 +161,67 @@ if __name__ == '__main__':
 
     logger = logging.getLogger("Disassembler")
 
+    profiler = Profiler(trace_malloc=args.profile_heap)
+
     try:
-      with open(args.f, 'rb') as f:
-         rom = bytearray(f.read())
-    except :
+        with profiler.phase('load'):
+            rom = banks.read_rom(args.f, args.banks, args.bank)
+    except OSError:
         logger.error(f"Unable to open {args.f}")
         sys.exit(1)
+    except ValueError as exc:
+        logger.error(f"{args.f}: {exc}")
+        sys.exit(1)
+
+    trace_log = None
+    if args.trace_log is not None:
+        try:
+            trace_log = TraceEventLog(args.trace_log, OUTPUT_BUFFER_SIZE)
+        except OSError:
+            logger.error(f"Unable to write {args.trace_log}")
+            sys.exit(1)
+
+    try:
+        memory, symbol_table = analyze(rom, ENTRY_POINTS + args.entry_point,
+                                       cache_dir=args.cache, profiler=profiler,
+                                       trace_hook=trace_log)
+    except ValueError as exc:
+        logger.error(str(exc))
+        sys.exit(1)
+    finally:
+        if trace_log is not None:
+            trace_log.close()
+
+    if args.export is not None:
+        try:
+            with profiler.phase('export'):
+                export.export_analysis(args.export, memory, symbol_table)
+        except OSError:
+            logger.error(f"Unable to write {args.export}")
+            sys.exit(1)
+
+    if args.sqlite is not None:
+        name = args.name if args.name is not None else os.path.basename(args.f)
+        try:
+            with profiler.phase('sqlite'):
+                database.export_database(args.sqlite, name, memory, symbol_table)
+        except (OSError, sqlite3.Error) as exc:
+            logger.error(f"Unable to write {args.sqlite}: {exc}")
+            sys.exit(1)
+
+    printer = make_printer(memory, symbol_table)
+    with profiler.phase('listing'):
+        if args.output is None:
+            printer.print_listing(sys.stdout, jobs=args.jobs)
+        else:
+            try:
+                write_listing(printer, args.output, jobs=args.jobs)
+            except OSError:
+                logger.error(f"Unable to write {args.output}")
+                sys.exit(1)
 
-    memory = Memory(rom)
-
-    hardware_vectors = [
-        0x0000, # RST
-        0x0002, # NMI
-        0x0004, # (unused)
-        0x0006, # INTP0
-        0x0008, # INTP1
-        0x000a, # INTP2
-        0x000c, # INTP3
-        0x000e, # INTP4/INTC30
-        0x0010, # INTP5/INTAD
-        0x0012, # INTP6/INTC20
-        0x0014, # INTC00
-        0x0016, # INTC01
-        0x0018, # INTC10
-        0x001a, # INTC11
-        0x001c, # INTC21
-        0x001e, # (unused)
-        0x0020, # INTSER
-        0x0022, # INTSR
-        0x0024, # INTST
-        0x0026, # INTCSI
-        0x0028, # INTEER
-        0x002a, # INTEPW
-        0x002c, # (unused)
-        0x002e, # (unused)
-        0x0030, # (unused)
-        0x0032, # (unused)
-        0x0034, # (unused)
-        0x0036, # (unused)
-        0x0038, # (unused)
-        0x003a, # (unused)
-        0x003c, # (unused)
-        0x003e,  # BRK
-    ]
-    #callt_vectors = list(range(0x40, 0x7f, 2))
-    callt_vectors = list(range(0x42, 0x7f, 2))
-    all_vectors = hardware_vectors + callt_vectors
-
-    entry_points = [
-    ]
-
-    start_address = 0
-    #traceable_range = range(start_address, start_address + len(rom) + 1)
-    traceable_range = range(start_address, 0xffff)
-    tracer = Tracer(memory, entry_points, all_vectors, traceable_range)
-    tracer.trace(disassemble)
-
-    symbol_table = SymbolTable(uPD78213_SYMBOLS)
-    symbol_table.generate(memory, start_address) # xxx should pass traceable_range
-
-    printer = Printer(memory,
-                      start_address,
-                      traceable_range[-1] - 1,
-                      symbol_table
-                      )
-    printer.print_listing()
+    if args.profile:
+        sys.stdout.flush()
+        sys.stderr.write(profiler.format_text())
+    if args.profile_json is not None:
+        profiler.write_json(args.profile_json)
@@ -0,0 +1,135 @@
+# Export of analyses to an SQLite database, for ad-hoc queries across images
+#
+# Each image (e.g. a firmware version) is a row of images; the other tables
+# refer to it by image_id.  For instance, all CALLT users of an image:
+#
+#   SELECT printf('%04x', address), text FROM instructions
+#    WHERE image_id = ? AND mnemonic = 'CALLT';
+import hashlib
+import re
+import sqlite3
+
+from memory import LocationTypes
+from uPD78k2.disassemble import FlowTypes, XrefKinds
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS flow_types (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS xref_kinds (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS instructions (
+    image_id INTEGER NOT NULL REFERENCES images(id),
+    address INTEGER NOT NULL,
+    bytes BLOB NOT NULL,
+    mnemonic TEXT NOT NULL,
+    operands TEXT NOT NULL,
+    text TEXT NOT NULL,
+    flow_type INTEGER NOT NULL REFERENCES flow_types(id),
+    target INTEGER,
+    PRIMARY KEY (image_id, address)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS symbols (
+    image_id INTEGER NOT NULL REFERENCES images(id),
+    address INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    comment TEXT NOT NULL,
+    PRIMARY KEY (image_id, address)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS xrefs (
+    image_id INTEGER NOT NULL REFERENCES images(id),
+    target INTEGER NOT NULL,
+    source INTEGER NOT NULL,
+    kind INTEGER NOT NULL REFERENCES xref_kinds(id)
+);
+CREATE TABLE IF NOT EXISTS data_regions (
+    image_id INTEGER NOT NULL REFERENCES images(id),
+    start INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (image_id, start)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS instructions_mnemonic ON instructions (mnemonic, image_id);
+CREATE INDEX IF NOT EXISTS instructions_target ON instructions (target, image_id);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+CREATE INDEX IF NOT EXISTS xrefs_target ON xrefs (image_id, target);
+CREATE INDEX IF NOT EXISTS xrefs_source ON xrefs (image_id, source);
+'''
+
+_IMAGE_TABLES = ('instructions', 'symbols', 'xrefs', 'data_regions')
+
+
+def _constants(cls):
+    '''Return the (value, name) pairs of the integer constants of cls'''
+    return sorted((value, name) for name, value in vars(cls).items()
+                  if isinstance(value, int) and not name.startswith('_'))
+
+def iter_instruction_rows(image_id, memory, symbol_table):
+    names = {address: name for address, (name, _)
+             in symbol_table.symbols.items()}
+    for address, inst in memory.iter_instructions():
+        text = inst.render(names)
+        mnemonic, _, operands = text.partition(' ')
+        yield (image_id, address, bytes(inst.all_bytes), mnemonic,
+               operands.strip(), text, inst.flow_type, inst.target_address)
+
+def iter_xref_rows(image_id, memory):
+    for target in sorted(memory.xrefs):
+        for source, kind in memory.get_xrefs(target):
+            yield image_id, target, source, kind
+
+def iter_data_regions(memory):
+    '''Yield the (start, length) of the runs of Data locations'''
+    for match in re.finditer(re.escape(bytes([LocationTypes.Data])) + b'+',
+                             bytes(memory.types)):
+        yield match.start(), match.end() - match.start()
+
+def export_database(filename, name, memory, symbol_table):
+    '''Write the analysis of image name to the SQLite database filename,
+    replacing any previous export of that name, in a single transaction'''
+    connection = sqlite3.connect(filename)
+    try:
+        with connection:
+            connection.executescript(SCHEMA)
+            connection.executemany('INSERT OR REPLACE INTO flow_types VALUES (?, ?)',
+                                   _constants(FlowTypes))
+            connection.executemany('INSERT OR REPLACE INTO xref_kinds VALUES (?, ?)',
+                                   _constants(XrefKinds))
+
+            row = connection.execute('SELECT id FROM images WHERE name = ?',
+                                     (name, )).fetchone()
+            if row is not None:
+                for table in _IMAGE_TABLES:
+                    connection.execute(f'DELETE FROM {table} WHERE image_id = ?', row)
+                connection.execute('DELETE FROM images WHERE id = ?', row)
+
+            digest = hashlib.sha256(bytes(memory.contents)).hexdigest()
+            image_id = connection.execute(
+                'INSERT INTO images (name, size, sha256) VALUES (?, ?, ?)',
+                (name, len(memory), digest)).lastrowid
+
+            connection.executemany(
+                'INSERT INTO instructions VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                iter_instruction_rows(image_id, memory, symbol_table))
+            connection.executemany(
+                'INSERT INTO symbols VALUES (?, ?, ?, ?)',
+                ((image_id, address, symbol_name, comment)
+                 for address, (symbol_name, comment) in symbol_table.symbols.items()))
+            connection.executemany(
+                'INSERT INTO xrefs VALUES (?, ?, ?, ?)',
+                iter_xref_rows(image_id, memory))
+            connection.executemany(
+                'INSERT INTO data_regions VALUES (?, ?, ?)',
+                ((image_id, start, length)
+                 for start, length in iter_data_regions(memory)))
+    finally:
+        connection.close()
+    return image_id
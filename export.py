@@ -0,0 +1,232 @@
+# Compact binary export of an analysis, for tools that need the disassembly
+# without tracing again.  The file is a header followed by packed arrays:
+#
+#   contents, types, annotations         image size bytes each
+#   instruction starts (u32), lengths (u8)
+#   xref targets (u32), sources (u32), XrefKinds (u8), sorted by target
+#   symbol addresses (u32), string offsets (u32), name and comment
+#   lengths (u16), then the UTF-8 strings
+#
+# Every array starts on a 4-byte boundary and multi-byte values are little
+# endian, so a loaded export is a set of views on the (memory-mapped) file.
+import bisect
+import itertools
+import mmap
+import struct
+import sys
+import types
+from array import array
+
+from memory import LazyInstructions, LocationTypes, Memory
+from uPD78k2.disassemble import disassemble
+from uPD78k2.symbols import SymbolTable
+
+EXPORT_VERSION = 2
+EXPORT_EXTENSION = '.k2a'
+_MAGIC = b'K2DA'
+# magic, version, image size, instruction, xref and symbol counts, strings size
+_HEADER = struct.Struct('<4sH2xIIIII')
+
+
+def _align(offset):
+    return (offset + 3) & ~3
+
+def _layout(size, instructions, xrefs, symbols, strings):
+    '''Return the offsets of the sections and the total file size'''
+    offsets = {}
+    offset = _align(_HEADER.size)
+    for name, length in (
+            ('contents', size),
+            ('types', size),
+            ('annotations', size),
+            ('starts', 4 * instructions),
+            ('lengths', instructions),
+            ('xref_targets', 4 * xrefs),
+            ('xref_sources', 4 * xrefs),
+            ('xref_kinds', xrefs),
+            ('symbol_addresses', 4 * symbols),
+            ('symbol_offsets', 4 * symbols),
+            ('name_lengths', 2 * symbols),
+            ('comment_lengths', 2 * symbols),
+            ('strings', strings)):
+        offsets[name] = offset
+        offset = _align(offset + length)
+    return offsets, offset
+
+def _pack(typecode, values):
+    packed = array(typecode, values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+def _view(buffer, offset, count, typecode):
+    '''Return count values of typecode stored at offset of buffer'''
+    itemsize = array(typecode).itemsize
+    view = memoryview(buffer)[offset:offset + count * itemsize]
+    if typecode == 'B':
+        return view
+    if sys.byteorder == 'little':
+        return view.cast(typecode)
+    values = array(typecode)
+    values.frombytes(view)
+    values.byteswap()
+    return values
+
+
+def export_analysis(filename, memory, symbol_table):
+    '''Write memory and symbol_table to filename'''
+    starts = [address for address, _ in memory.iter_instructions()]
+    lengths = [len(memory.get_instruction(address)) for address in starts]
+
+    xref_targets, xref_sources, xref_kinds = [], [], []
+    for target in sorted(memory.xrefs):
+        for source, kind in memory.xrefs[target]:
+            xref_targets.append(target)
+            xref_sources.append(source)
+            xref_kinds.append(kind)
+
+    symbol_addresses, symbol_offsets = [], []
+    name_lengths, comment_lengths = [], []
+    strings = bytearray()
+    for address, (name, comment) in sorted(symbol_table.symbols.items()):
+        name = name.encode('utf-8')
+        comment = comment.encode('utf-8')
+        symbol_addresses.append(address)
+        symbol_offsets.append(len(strings))
+        name_lengths.append(len(name))
+        comment_lengths.append(len(comment))
+        strings += name + comment
+
+    size = len(memory)
+    offsets, total = _layout(size, len(starts), len(xref_targets),
+                             len(symbol_addresses), len(strings))
+    data = bytearray(total)
+    _HEADER.pack_into(data, 0, _MAGIC, EXPORT_VERSION, size, len(starts),
+                      len(xref_targets), len(symbol_addresses), len(strings))
+    for name, packed in (
+            ('contents', bytes(memory.contents)),
+            ('types', bytes(memory.types)),
+            ('annotations', bytes(memory.annotations)),
+            ('starts', _pack('I', starts)),
+            ('lengths', bytes(lengths)),
+            ('xref_targets', _pack('I', xref_targets)),
+            ('xref_sources', _pack('I', xref_sources)),
+            ('xref_kinds', bytes(xref_kinds)),
+            ('symbol_addresses', _pack('I', symbol_addresses)),
+            ('symbol_offsets', _pack('I', symbol_offsets)),
+            ('name_lengths', _pack('H', name_lengths)),
+            ('comment_lengths', _pack('H', comment_lengths)),
+            ('strings', strings)):
+        data[offsets[name]:offsets[name] + len(packed)] = packed
+
+    with open(filename, 'wb') as f:
+        f.write(data)
+
+def load_export(filename, use_mmap=True, disassemble_func=disassemble):
+    '''Return the read-only (memory, symbol_table) of an export.  With
+    use_mmap, the file is memory-mapped and shared with other processes
+    mapping it, otherwise it is read in memory.'''
+    with open(filename, 'rb') as f:
+        if use_mmap:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = f.read()
+
+    if len(buffer) < _HEADER.size:
+        raise ValueError(f"{filename} is not an analysis export")
+    magic, version, size, instructions, xrefs, symbols, strings = \
+        _HEADER.unpack_from(buffer)
+    if magic != _MAGIC or version != EXPORT_VERSION:
+        raise ValueError(f"{filename} is not an analysis export (version {EXPORT_VERSION})")
+    offsets, total = _layout(size, instructions, xrefs, symbols, strings)
+    if len(buffer) < total:
+        raise ValueError(f"{filename} is truncated")
+
+    memory = ReadOnlyMemory(buffer, offsets, size, instructions, xrefs,
+                            disassemble_func)
+
+    addresses = _view(buffer, offsets['symbol_addresses'], symbols, 'I')
+    string_offsets = _view(buffer, offsets['symbol_offsets'], symbols, 'I')
+    name_lengths = _view(buffer, offsets['name_lengths'], symbols, 'H')
+    comment_lengths = _view(buffer, offsets['comment_lengths'], symbols, 'H')
+    blob = bytes(_view(buffer, offsets['strings'], strings, 'B'))
+    table = {}
+    for address, offset, name_len, comment_len in zip(
+            addresses, string_offsets, name_lengths, comment_lengths):
+        name = blob[offset:offset + name_len].decode('utf-8')
+        comment = blob[offset + name_len:offset + name_len + comment_len].decode('utf-8')
+        table[address] = (name, comment)
+    symbol_table = SymbolTable()
+    symbol_table.symbols = types.MappingProxyType(table)
+
+    return memory, symbol_table
+
+
+class ReadOnlyMemory(Memory):
+    '''A Memory whose arrays are views on a loaded export.  Instructions are
+    decoded on first access and the xrefs are looked up in the sorted xref
+    arrays; any attempt to modify it raises TypeError.'''
+
+    def __init__(self, buffer, offsets, size, instructions, xrefs,
+                 disassemble_func=disassemble):
+        self.buffer = buffer
+        self.contents = _view(buffer, offsets['contents'], size, 'B')
+        self.types = _view(buffer, offsets['types'], size, 'B')
+        self.annotations = _view(buffer, offsets['annotations'], size, 'B')
+        self._types_offset = offsets['types']
+
+        self.instruction_starts = _view(buffer, offsets['starts'], instructions, 'I')
+        self.instruction_lengths = _view(buffer, offsets['lengths'], instructions, 'B')
+        self.instructions = LazyInstructions(self.instruction_starts,
+                                             self.contents, disassemble_func,
+                                             read_only=True)
+
+        self.xref_targets = _view(buffer, offsets['xref_targets'], xrefs, 'I')
+        self.xref_sources = _view(buffer, offsets['xref_sources'], xrefs, 'I')
+        self.xref_kinds = _view(buffer, offsets['xref_kinds'], xrefs, 'B')
+        self.xrefs = types.MappingProxyType({})  # see get_xrefs()
+        self._xrefs_from = None  # see get_xrefs_from()
+
+    def add_xref(self, address, from_address, kind):
+        raise TypeError("An exported Memory is read-only")
+
+    def iter_instruction_spans(self):
+        '''Yield the (start, length) of every instruction without decoding'''
+        return zip(self.instruction_starts, self.instruction_lengths)
+
+    def iter_instructions(self, address=0):
+        for a in self.instruction_starts[bisect.bisect_left(self.instruction_starts, address):]:
+            yield a, self.instructions[a]
+
+    def get_xrefs(self, address):
+        low = bisect.bisect_left(self.xref_targets, address)
+        high = bisect.bisect_right(self.xref_targets, address, low)
+        return list(zip(self.xref_sources[low:high], self.xref_kinds[low:high]))
+
+    def get_xrefs_from(self, from_address):
+        if self._xrefs_from is None:
+            # reverse index of the xref arrays, built on first use
+            xrefs_from = {}
+            for target, source, kind in zip(self.xref_targets, self.xref_sources,
+                                            self.xref_kinds):
+                xrefs_from.setdefault(source, []).append((target, kind))
+            self._xrefs_from = xrefs_from
+        return list(self._xrefs_from.get(from_address, []))
+
+    def iter_xref_targets(self, *kinds):
+        last = None
+        for target, xref_kind in zip(self.xref_targets, self.xref_kinds):
+            if xref_kind in kinds and target != last:
+                yield target
+                last = target
+
+    def iter_unknown(self, start, stop):
+        unknown = bytes([LocationTypes.Unknown])
+        base = self._types_offset
+        address = self.buffer.find(unknown, base + start, base + stop)
+        while address != -1:
+            yield address - base
+            address = self.buffer.find(unknown, address + 1, base + stop)
+
+    def iter_annotated(self):
+        return itertools.compress(range(len(self.annotations)), self.annotations)
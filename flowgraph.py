@@ -0,0 +1,131 @@
+# Basic blocks and control flow graph of traced code
+import bisect
+from array import array
+
+from uPD78k2.disassemble import FlowTypes, XrefKinds
+
+
+class EdgeKinds(object):
+    Fallthrough = 0     # next block: no branch, branch not taken or call return
+    Jump = 1            # unconditional jump
+    Branch = 2          # conditional jump taken
+    Call = 3            # subroutine call
+
+
+def build_cfg(memory):
+    '''Split the instructions of a traced memory into basic blocks'''
+    return ControlFlowGraph(memory)
+
+
+class ControlFlowGraph(object):
+    '''Basic blocks of the instructions of a traced memory, stored as
+    parallel arrays indexed by block number: the block spans
+    starts[i]..ends[i]-1 and its last instruction is at lasts[i].  The
+    successors of block i are successors[edge_offsets[i]:edge_offsets[i+1]]
+    with the matching edge_kinds (EdgeKinds).
+
+    A block starts at an entry point, a jump or call target, after an
+    instruction that is not FlowTypes.Continue, or after a gap in the
+    code.  Calls end a block; targets that are not the start of a traced
+    instruction get no edge.  The edges of BR rp and CALL rp go to the
+    targets the tracer resolved, read from their Jump and Call xrefs.'''
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.starts = array('l')
+        self.ends = array('l')
+        self.lasts = array('l')
+        self.edge_offsets = array('L', [0])
+        self.successors = array('l')
+        self.edge_kinds = bytearray()
+
+        leaders = set(a for a in memory.iter_annotated()
+                      if memory.is_instruction_start(a))
+        self.index = {}  # block start: block number
+
+        end = None
+        for address, inst in memory.iter_instructions():
+            if address != end or address in leaders:
+                if end is not None and len(self.ends) < len(self.starts):
+                    self.ends.append(end)
+                self.index[address] = len(self.starts)
+                self.starts.append(address)
+                self.lasts.append(address)
+            self.lasts[-1] = address
+            end = address + len(inst)
+            if inst.flow_type != FlowTypes.Continue:
+                self.ends.append(end)
+                end = None
+        if len(self.ends) < len(self.starts):
+            self.ends.append(end)
+
+        # resolved BR rp / CALL rp: last address: [target block start]
+        resolved = {}
+        for start in self.starts:
+            for source, kind in memory.get_xrefs(start):
+                if kind in (XrefKinds.Jump, XrefKinds.Call):
+                    source_inst = memory.get_instruction(source)
+                    if source_inst is not None and source_inst.target_address is None:
+                        resolved.setdefault(source, []).append(start)
+
+        for i in range(len(self.starts)):
+            inst = memory.get_instruction(self.lasts[i])
+            flow_type = inst.flow_type
+            if inst.target_address is not None:
+                targets = (inst.target_address, )
+            else:
+                targets = resolved.get(self.lasts[i], ())
+            if flow_type in (FlowTypes.UnconditionalJump,
+                             FlowTypes.IndirectUnconditionalJump):
+                for target in targets:
+                    self._add_edge(target, EdgeKinds.Jump)
+            elif flow_type == FlowTypes.ConditionalJump:
+                self._add_edge(self.ends[i], EdgeKinds.Fallthrough)
+                self._add_edge(inst.target_address, EdgeKinds.Branch)
+            elif flow_type == FlowTypes.SubroutineCall:
+                for target in targets:
+                    self._add_edge(target, EdgeKinds.Call)
+                self._add_edge(self.ends[i], EdgeKinds.Fallthrough)
+            elif flow_type == FlowTypes.Continue:
+                self._add_edge(self.ends[i], EdgeKinds.Fallthrough)
+            self.edge_offsets.append(len(self.successors))
+
+    def _add_edge(self, address, kind):
+        block = self.index.get(address)
+        if block is not None:
+            self.successors.append(block)
+            self.edge_kinds.append(kind)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def block_at(self, address):
+        '''Return the number of the block containing address, or None'''
+        i = bisect.bisect_right(self.starts, address) - 1
+        if i >= 0 and address < self.ends[i]:
+            return i
+        return None
+
+    def iter_successors(self, block):
+        '''Yield the (block, EdgeKinds) successors of block'''
+        start = self.edge_offsets[block]
+        end = self.edge_offsets[block + 1]
+        for i in range(start, end):
+            yield self.successors[i], self.edge_kinds[i]
+
+    def predecessors(self):
+        '''Return the list of (block, EdgeKinds) predecessors of every
+        block'''
+        preds = [[] for _ in range(len(self.starts))]
+        for block in range(len(self.starts)):
+            for successor, kind in self.iter_successors(block):
+                preds[successor].append((block, kind))
+        return preds
+
+    def iter_instructions(self, block):
+        '''Yield the (address, Instruction) of the instructions of block'''
+        address = self.starts[block]
+        while address < self.ends[block]:
+            inst = self.memory.get_instruction(address)
+            yield address, inst
+            address += len(inst)
@@ -0,0 +1,183 @@
+# Function discovery, call graph and per-function passes over a process pool
+import concurrent.futures
+
+from flowgraph import EdgeKinds, build_cfg
+from uPD78k2.disassemble import XrefKinds
+
+
+class CallKinds(object):
+    '''How a function reaches another one'''
+    Call = 'CALL'       # CALL !addr16 or CALL rp
+    CallF = 'CALLF'     # CALLF !addr11 into 0x0800-0x0fff
+    CallT = 'CALLT'     # CALLT [addr5] through the CALLT table
+    Jump = 'JUMP'       # tail jump or fall through into another function
+
+
+class Function(object):
+    '''A function: its entry address, the basic blocks reachable from it
+    without following calls nor entering another function, and the
+    (start, end) address spans of these blocks'''
+    __slots__ = ('index', 'entry', 'blocks', 'spans')
+
+    def __init__(self, index, entry, blocks, spans):
+        self.index = index
+        self.entry = entry
+        self.blocks = blocks
+        self.spans = spans
+
+    def __repr__(self):
+        return "<Function %d 0x%04x>" % (self.index, self.entry)
+
+    def iter_instructions(self, memory):
+        '''Yield the (address, Instruction) of the function'''
+        for start, end in self.spans:
+            address = start
+            while address < end:
+                inst = memory.get_instruction(address)
+                yield address, inst
+                address += len(inst)
+
+
+class CallGraph(object):
+    '''Partition the traced code into functions and record the calls
+    between them.  Functions start at call targets (including CALLF and
+    CALLT ones), entry points and vector targets.  A block reachable from
+    several entries belongs to all of these functions.  calls holds
+    (caller, callee, site address, CallKinds) with function indices.'''
+
+    def __init__(self, memory, cfg=None):
+        if cfg is None:
+            cfg = build_cfg(memory)
+        self.memory = memory
+        self.cfg = cfg
+
+        entries = set()
+        for address in memory.iter_annotated():
+            if memory.is_instruction_start(address) and (
+                    memory.is_call_target(address) or
+                    memory.is_entry_point(address)):
+                entries.add(address)
+        for address in memory.iter_xref_targets(XrefKinds.Vector):
+            if address < len(memory) and memory.is_instruction_start(address):
+                entries.add(address)
+        entries = sorted(a for a in entries if a in cfg.index)
+
+        self.entry_index = {entry: i for i, entry in enumerate(entries)}
+        entry_blocks = {cfg.index[entry]: i for i, entry in enumerate(entries)}
+
+        self.functions = []
+        self.block_owners = [[] for _ in range(len(cfg))]
+        self.calls = []
+        for index, entry in enumerate(entries):
+            blocks = self._partition(cfg.index[entry], entry_blocks, index)
+            for block in blocks:
+                self.block_owners[block].append(index)
+            spans = [(cfg.starts[b], cfg.ends[b]) for b in blocks]
+            self.functions.append(Function(index, entry, blocks, spans))
+
+        self.callees = [set() for _ in self.functions]
+        self.callers = [set() for _ in self.functions]
+        for caller, callee, _, _ in self.calls:
+            self.callees[caller].add(callee)
+            self.callers[callee].add(caller)
+
+    def _partition(self, first, entry_blocks, index):
+        '''Return the sorted blocks of function index and record its calls'''
+        cfg = self.cfg
+        seen = {first}
+        stack = [first]
+        while stack:
+            block = stack.pop()
+            for successor, kind in cfg.iter_successors(block):
+                if kind == EdgeKinds.Call:
+                    site = cfg.lasts[block]
+                    callee = entry_blocks.get(successor)
+                    if callee is not None:
+                        self.calls.append((index, callee, site,
+                                           self._call_kind(site)))
+                elif successor in entry_blocks and successor != first:
+                    self.calls.append((index, entry_blocks[successor],
+                                       cfg.lasts[block], CallKinds.Jump))
+                elif successor not in seen:
+                    seen.add(successor)
+                    stack.append(successor)
+        return sorted(seen)
+
+    def _call_kind(self, site):
+        '''Classify the call at site from its opcode'''
+        opcode = self.memory.get_instruction(site).all_bytes[0]
+        if (opcode & 0xf8) == 0x90:     # CALLF !addr11
+            return CallKinds.CallF
+        if (opcode & 0xe0) == 0xe0:     # CALLT [addr5]
+            return CallKinds.CallT
+        return CallKinds.Call
+
+    def __len__(self):
+        return len(self.functions)
+
+    def function_at(self, entry):
+        '''Return the function starting at entry, or None'''
+        index = self.entry_index.get(entry)
+        return None if index is None else self.functions[index]
+
+    def functions_containing(self, address):
+        '''Return the functions owning the instruction at address'''
+        block = self.cfg.block_at(address)
+        if block is None:
+            return []
+        return [self.functions[i] for i in self.block_owners[block]]
+
+    def bottom_up_levels(self):
+        '''Return lists of functions such that the functions of a level
+        only call functions of earlier levels.  Functions of call cycles
+        (recursion) are put together in a last level.'''
+        pending = [len(callees - {i}) for i, callees in enumerate(self.callees)]
+        level = [i for i, count in enumerate(pending) if count == 0]
+        done = set()
+        levels = []
+        while level:
+            levels.append([self.functions[i] for i in level])
+            done.update(level)
+            next_level = []
+            for callee in level:
+                for caller in self.callers[callee]:
+                    if caller != callee:
+                        pending[caller] -= 1
+                        if pending[caller] == 0:
+                            next_level.append(caller)
+            level = sorted(next_level)
+        cyclic = [f for f in self.functions if f.index not in done]
+        if cyclic:
+            levels.append(cyclic)
+        return levels
+
+
+def build_call_graph(memory, cfg=None):
+    return CallGraph(memory, cfg)
+
+def map_functions(pass_func, memory, functions, jobs=1):
+    '''Return [pass_func(memory, function) for function in functions],
+    computed in a pool of jobs processes when jobs > 1.  pass_func must be
+    a module-level function; memory is sent once to every worker.'''
+    if jobs <= 1:
+        return [pass_func(memory, function) for function in functions]
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(memory, )) as executor:
+        chunksize = max(1, len(functions) // (jobs * 4))
+        return list(executor.map(_run_pass, [pass_func] * len(functions),
+                                 functions, chunksize=chunksize))
+
+
+# Worker process state for map_functions()
+
+_worker_memory = None
+
+def _init_worker(memory):
+    global _worker_memory
+    _worker_memory = memory
+
+def _run_pass(pass_func, function):
+    return pass_func(_worker_memory, function)
@@ -1,4 +1,14 @@
-import struct
+import concurrent.futures
+import itertools
+import sys
+
+from uPD78k2.disassemble import DATA_XREF_KINDS
+
+# number of listing lines joined into a single write
+WRITE_BATCH_LINES = 4096
+
+# number of address chunks rendered per worker process
+CHUNKS_PER_JOB = 4
 
 
 class Printer(object):
@@ -9,43 +19,119 @@ class Printer(object):
         self.symbol_table = symbol_table
         self.last_line_type = None
 
-    def print_listing(self):
-        self.print_header()
-        self.print_symbols()
-
-        address = self.start_address
-        while address <= self.end_address:
-            self.print_blank(address)
-            self.print_label(address)
+        # symbol names to substitute into the instruction templates
+        self.names = {address: name for address, (name, _)
+                      in symbol_table.symbols.items()}
+
+    def print_listing(self, stream=None, jobs=1):
+        '''Write the listing to stream (sys.stdout by default) in batches of
+        WRITE_BATCH_LINES lines.  With jobs > 1, the body of the listing is
+        rendered by address chunks in a pool of jobs processes; the output is
+        identical to the serial one.'''
+        if stream is None:
+            stream = sys.stdout
+
+        if jobs > 1:
+            self._write_lines(stream, itertools.chain(self.iter_header(),
+                                                      self.iter_symbols()))
+            for text in self.render_chunks(jobs):
+                stream.write(text)
+        else:
+            self._write_lines(stream, self.iter_listing())
+
+    def _write_lines(self, stream, lines):
+        while True:
+            batch = list(itertools.islice(lines, WRITE_BATCH_LINES))
+            if not batch:
+                break
+            batch.append('')
+            stream.write('\n'.join(batch))
+
+    def iter_listing(self):
+        '''Generate the lines of the listing'''
+        yield from self.iter_header()
+        yield from self.iter_symbols()
+        yield from self.iter_range(self.start_address, self.end_address)
+
+    def iter_range(self, start_address, end_address):
+        '''Generate the lines for the locations starting from start_address
+        up to end_address (inclusive)'''
+        address = start_address
+        while address <= end_address:
+            yield from self.iter_blank(address)
+            yield from self.iter_label(address)
 
             if self.memory.is_instruction_start(address):
                 inst = self.memory.get_instruction(address)
-                self.print_instruction_line(address, inst)
+                yield self.format_instruction_line(address, inst)
                 address += len(inst)
             else:
                 if self.memory.is_vector_start(address):
-                    self.print_vector_line(address)
+                    yield self.format_vector_line(address)
                     address += 2
                 elif self.memory.is_data(address):
-                    self.print_data_line(address)
+                    yield self.format_data_line(address)
                     address += 1
                 else:
                     msg = "Unhandled location type %r at 0x%04x" % (
                         self.memory.types[address], address)
                     raise NotImplementedError(msg) # always a bug
 
-    def print_header(self):
-        print('    .area CODE1 (ABS)')
-        print('    .org 0x%04x\n' % self.start_address)
-
-    def print_symbols(self):
-        symbol_addresses = set(self.symbol_table.symbols.keys())
+    def split_chunks(self, count):
+        '''Split start_address..end_address into at most count chunks that
+        begin on a location start.  Return (start, end, last_line_type)
+        tuples where last_line_type is the type of the location preceding
+        the chunk, as the serial rendering would have it.'''
+        size = self.end_address - self.start_address + 1
+        starts = [self.start_address]
+        for i in range(1, count):
+            address = self.start_address + (size * i) // count
+            while (address <= self.end_address and
+                   self.memory.is_continuation_of_multibyte_type(address)):
+                address += 1
+            if starts[-1] < address <= self.end_address:
+                starts.append(address)
+
+        chunks = []
+        last_line_type = self.last_line_type
+        for i, start in enumerate(starts):
+            if i + 1 < len(starts):
+                end = starts[i + 1] - 1
+            else:
+                end = self.end_address
+            chunks.append((start, end, last_line_type))
+            last_line_type = self._location_type(end)
+        return chunks
+
+    def _location_type(self, address):
+        '''Return the type of the location that address belongs to'''
+        while self.memory.is_continuation_of_multibyte_type(address):
+            address -= 1
+        return self.memory.types[address]
+
+    def render_chunks(self, jobs):
+        '''Render the body of the listing in a pool of jobs processes and
+        return the text of each chunk, in address order'''
+        chunks = self.split_chunks(jobs * CHUNKS_PER_JOB)
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_worker,
+                initargs=(self.memory, self.symbol_table)) as executor:
+            texts = list(executor.map(_render_chunk, *zip(*chunks)))
+        if chunks:
+            self.last_line_type = self._location_type(chunks[-1][1])
+        return texts
+
+    def iter_header(self):
+        yield '    .area CODE1 (ABS)'
+        yield '    .org 0x%04x\n' % self.start_address
+
+    def iter_symbols(self):
         used_addresses = set()
 
-        for _, inst in self.memory.iter_instructions():
-            for address in inst.referenced_addresses:
-                if address in symbol_addresses:
-                    used_addresses.add(address)
+        for address in self.memory.iter_xref_targets(*DATA_XREF_KINDS):
+            if address in self.symbol_table.symbols:
+                used_addresses.add(address)
 
         for _, target in self.memory.iter_vectors():
             if target in self.symbol_table.symbols:
@@ -57,29 +143,29 @@ class Printer(object):
                 line = ("    %s = 0x%04x" % (name, address)).ljust(28)
                 if comment:
                     line += ";%s" % comment
-                print(line)
-        print('')
+                yield line
+        yield ''
 
-    def print_blank(self, address):
+    def iter_blank(self, address):
         typ = self.memory.types[address]
         if self.last_line_type is not None:
             if typ != self.last_line_type:
                 if address not in self.symbol_table.symbols:
-                    print('')
+                    yield ''
         self.last_line_type = typ
 
-    def print_label(self, address):
+    def iter_label(self, address):
         symbol = self.symbol_table.symbols.get(address)
         if symbol is not None:
             name, desc = symbol
-            print("\n%s:" % name)
+            yield "\n%s:" % name
 
-    def print_data_line(self, address):
+    def format_data_line(self, address):
         line = ('    .byte 0x%02x' % self.memory[address]).ljust(32)
         line += ';%04x  %02x          DATA %s ' % (address, self.memory[address], self._data_byte_repr(self.memory[address]))
         if self.memory.is_illegal_instruction(address):
             line += ' ILLEGAL_INSTRUCTION'
-        print(line)
+        return line
 
     def _data_byte_repr(self, b):
         if (b >= 0x20) and (b <= 0x7e):  # printable 7-bit ascii
@@ -87,8 +173,8 @@ class Printer(object):
         else:
             return "0x%02x" % b
 
-    def print_vector_line(self, address):
-        target_address = struct.unpack('<H', self.memory[address:address+2])[0]
+    def format_vector_line(self, address):
+        target_address = self.memory.get_vector(address)
 
         if target_address in self.symbol_table.symbols:
             name, comment = self.symbol_table.symbols[target_address]
@@ -101,10 +187,10 @@ class Printer(object):
         name, comment = self.symbol_table.symbols.get(address, ('',''))
         if comment:
             line += ' ' + comment
-        print(line)
+        return line
 
-    def print_instruction_line(self, address, inst):
-        disasm = inst.to_string(symbols=self.symbol_table.symbols)
+    def format_instruction_line(self, address, inst):
+        disasm = inst.render(self.names)
         hexdump = (' '.join([ '%02x' % h for h in inst.all_bytes ])).ljust(8)
 
         # TODO handle amgibuous reassembly
@@ -115,4 +201,21 @@ class Printer(object):
             line += ' '
         line += ';%04x  %s' % (address, hexdump)
 
-        print(line)
+        return line
+
+
+# Worker process state for Printer.render_chunks()
+
+_worker_printer = None
+
+def _init_worker(memory, symbol_table):
+    global _worker_printer
+    _worker_printer = Printer(memory, 0, 0, symbol_table)
+
+def _render_chunk(start_address, end_address, last_line_type):
+    _worker_printer.last_line_type = last_line_type
+    lines = list(_worker_printer.iter_range(start_address, end_address))
+    if not lines:
+        return ''
+    lines.append('')
+    return '\n'.join(lines)
@@ -1,33 +1,50 @@
+import bisect
+import collections.abc
+import heapq
+import struct
+
+from uPD78k2.disassemble import ARGUMENT_XREF_KINDS, FlowTypes, XrefKinds
+
+# CPU addresses are 16 bits; images larger than 64K are traced one bank view
+# at a time (see banks.py)
+ADDRESS_MASK = 0xFFFF
 
 class Memory(object):
     def __init__(self, rom):
         self.contents = bytearray(rom)
-        self.instructions = {}
-        self.types = {}
-        self.annotations = {}
-
-        for address in range(len(self.contents)):
-            self.instructions[address] = None
-            self.types[address] = LocationTypes.Unknown
-            self.annotations[address] = set()
+        self.instructions = {}  # only instruction starts are stored
+        self.types = bytearray(len(self.contents))  # LocationTypes
+        self.annotations = bytearray(len(self.contents))  # LocationAnnotations bits
+        self.annotated = set()  # addresses with at least one annotation
+        self.xrefs = {}  # address: [(from_address, XrefKinds)]
+        self.xrefs_from = {}  # from_address: [(address, XrefKinds)]
 
     def __len__(self):
         return len(self.contents)
 
     def __getitem__(self, address):
         if isinstance(address, slice):
-            rng = _slice_to_range(address)
-            return bytearray([ self.contents[a] for a in rng ])
+            # zero-copy view on the contents
+            return memoryview(self.contents)[address]
         return self.contents[address]
 
     def read_byte(self, address):
         return self.contents[address]
 
     def read_word(self, address):
-        high = self.contents[(address + 1) & 0xFFFF]
+        high = self.contents[(address + 1) & ADDRESS_MASK]
         low = self.contents[address]
         return (high << 8) + low
 
+    def read_words(self, address, count):
+        '''Read count little-endian words starting at address.  Unlike
+        read_word(), this does not wrap around the end of memory: reading
+        past it raises IndexError.'''
+        if address < 0 or address + 2 * count > len(self.contents):
+            msg = "Reading %d words at 0x%04x past the end of memory"
+            raise IndexError(msg % (count, address))
+        return struct.unpack_from('<%dH' % count, self.contents, address)
+
     # Instruction Storage
 
     def set_instruction(self, address, inst):
@@ -35,7 +52,7 @@ class Memory(object):
 
         # ensure the memory locations are only assigned to one instruction
         for i in range(inst_len):
-            addr = (address + i) & 0xFFFF
+            addr = (address + i) & ADDRESS_MASK
             if not self.is_unknown(addr):
                 msg = "Attempt to overwrite non-unknown at %04x"
                 raise Exception(msg % addr)
@@ -43,50 +60,124 @@ class Memory(object):
         # store instruction and mark its locations
         self.instructions[address] = inst
         for i in range(inst_len):
-            addr = (address + i) & 0xFFFF
+            addr = (address + i) & ADDRESS_MASK
             if addr == address:
                 loc_type = LocationTypes.InstructionStart
             else:
                 loc_type = LocationTypes.InstructionContinuation
             self.types[addr] = loc_type
 
+        self.add_instruction_xrefs(address, inst)
+
     def get_instruction(self, address):
-        return self.instructions[address]
+        return self.instructions.get(address)
 
     def iter_instructions(self, address=0):
-        for a in range(address, len(self.contents)):
-            if self.types[a] == LocationTypes.InstructionStart:
+        for a in sorted(self.instructions):
+            if a >= address and self.types[a] == LocationTypes.InstructionStart:
                 yield a, self.instructions[a]
 
     # Vector Storage
 
     def set_vector(self, address):
         self.types[address] = LocationTypes.VectorStart
-        self.types[(address + 1) & 0xFFFF] = LocationTypes.VectorContinuation
+        self.types[(address + 1) & ADDRESS_MASK] = LocationTypes.VectorContinuation
+        self.add_vector_xref(address)
 
     def get_vector(self, address):
-        high = self.contents[address]
-        low = self.contents[(address + 1) & 0xFFFF]
-        return (high << 8) + low
+        return self.read_words(address, 1)[0]
 
     def iter_vectors(self, address=0):
-        for a in range(address, len(self.contents)):
-            if self.types[a] == LocationTypes.VectorStart:
-                yield a, self.get_vector(a)
+        '''Yield the (address, target) of the vectors from address on, the
+        targets of each run of consecutive vectors being read at once'''
+        types = self.types
+        size = len(types)
+        a = address
+        while a < size:
+            if types[a] != LocationTypes.VectorStart:
+                a += 1
+                continue
+            if a + 1 == size:
+                # its high byte wraps around, as in set_vector()
+                yield a, self.read_word(a)
+                break
+            end = a + 2
+            while end + 1 < size and types[end] == LocationTypes.VectorStart:
+                end += 2
+            for i, target in enumerate(self.read_words(a, (end - a) // 2)):
+                yield a + 2 * i, target
+            a = end
+
+    # Cross References
+
+    def add_xref(self, address, from_address, kind):
+        self.xrefs.setdefault(address, []).append((from_address, kind))
+        self.xrefs_from.setdefault(from_address, []).append((address, kind))
+
+    def add_instruction_xrefs(self, address, inst):
+        '''Index the addresses read, written or branched to by inst'''
+        for referenced, arg_type in inst.asm_args:
+            for kind in ARGUMENT_XREF_KINDS.get(arg_type, ()):
+                self.add_xref(referenced, address, kind)
+        if inst.target_address is not None:
+            if inst.flow_type == FlowTypes.SubroutineCall:
+                self.add_xref(inst.target_address, address, XrefKinds.Call)
+            else:
+                self.add_xref(inst.target_address, address, XrefKinds.Jump)
+
+    def add_vector_xref(self, address):
+        self.add_xref(self.read_word(address), address, XrefKinds.Vector)
+
+    def get_xrefs(self, address):
+        '''Return the (from_address, XrefKinds) pairs referencing address'''
+        return self.xrefs.get(address, [])
+
+    def get_xrefs_from(self, from_address):
+        '''Return the (address, XrefKinds) pairs referenced from from_address'''
+        return self.xrefs_from.get(from_address, [])
+
+    def iter_xref_targets(self, *kinds):
+        '''Yield the addresses that have at least one xref of kinds'''
+        for address, xrefs in self.xrefs.items():
+            for _, xref_kind in xrefs:
+                if xref_kind in kinds:
+                    yield address
+                    break
 
     # Data Storage
 
     def set_data(self, address):
         self.types[address] = LocationTypes.Data
 
+    def clear_data(self, address, length=1):
+        '''Turn Data locations back into Unknown ones'''
+        for i in range(length):
+            addr = (address + i) & ADDRESS_MASK
+            if self.types[addr] == LocationTypes.Data:
+                self.types[addr] = LocationTypes.Unknown
+
     # Location Types
 
     def is_unknown(self, address, length=1):
         for i in range(length):
-            if self.types[(address + i) & 0xFFFF] != LocationTypes.Unknown:
+            if self.types[(address + i) & ADDRESS_MASK] != LocationTypes.Unknown:
                 return False
         return True
 
+    def is_unknown_or_data(self, address, length=1):
+        for i in range(length):
+            if self.types[(address + i) & ADDRESS_MASK] not in _UNKNOWN_OR_DATA:
+                return False
+        return True
+
+    def iter_unknown(self, start, stop):
+        '''Yield the addresses of the Unknown locations in start..stop-1'''
+        unknown = bytes([LocationTypes.Unknown])
+        address = self.types.find(unknown, start, stop)
+        while address != -1:
+            yield address
+            address = self.types.find(unknown, address + 1, stop)
+
     def is_data(self, address):
         return self.types[address] == LocationTypes.Data
 
@@ -116,28 +207,86 @@ class Memory(object):
     # Location Annotations
 
     def annotate_entry_point(self, address):
-        self.annotations[address].add(LocationAnnotations.EntryPoint)
+        self._annotate(address, LocationAnnotations.EntryPoint)
 
     def annotate_jump_target(self, address):
-        self.annotations[address].add(LocationAnnotations.JumpTarget)
+        self._annotate(address, LocationAnnotations.JumpTarget)
 
     def annotate_call_target(self, address):
-        self.annotations[address].add(LocationAnnotations.CallTarget)
+        self._annotate(address, LocationAnnotations.CallTarget)
 
     def annotate_illegal_instruction(self, address):
-        self.annotations[address].add(LocationAnnotations.IllegalInstruction)
+        self._annotate(address, LocationAnnotations.IllegalInstruction)
+
+    def _annotate(self, address, annotation):
+        self.annotations[address] |= annotation
+        self.annotated.add(address)
+
+    def iter_annotated(self):
+        '''Yield the addresses that have at least one annotation'''
+        return iter(self.annotated)
 
     def is_entry_point(self, address):
-        return LocationAnnotations.EntryPoint in self.annotations[address]
+        return bool(self.annotations[address] & LocationAnnotations.EntryPoint)
 
     def is_jump_target(self, address):
-        return LocationAnnotations.JumpTarget in self.annotations[address]
+        return bool(self.annotations[address] & LocationAnnotations.JumpTarget)
 
     def is_call_target(self, address):
-        return LocationAnnotations.CallTarget in self.annotations[address]
+        return bool(self.annotations[address] & LocationAnnotations.CallTarget)
 
     def is_illegal_instruction(self, address):
-        return LocationAnnotations.IllegalInstruction in self.annotations[address]
+        return bool(self.annotations[address] & LocationAnnotations.IllegalInstruction)
+
+
+class LazyInstructions(collections.abc.MutableMapping):
+    '''Memory.instructions restored without decoding (from a cache or an
+    export): the sorted instruction starts are decoded from rom on first
+    access, and never handed out undecoded.  Instructions set afterwards
+    are added to them, unless read_only, in which case setting or deleting
+    raises TypeError.'''
+
+    def __init__(self, starts, rom, disassemble_func, read_only=False):
+        self.starts = starts
+        self.rom = rom
+        self.disassemble_func = disassemble_func
+        self.read_only = read_only
+        self.decoded = {}   # address: Instruction, decoded or set
+        self.added = set()  # addresses set that are not in starts
+
+    def _is_start(self, address):
+        i = bisect.bisect_left(self.starts, address)
+        return i < len(self.starts) and self.starts[i] == address
+
+    def __len__(self):
+        return len(self.starts) + len(self.added)
+
+    def __iter__(self):
+        if not self.added:
+            return iter(self.starts)
+        return heapq.merge(self.starts, sorted(self.added))
+
+    def __contains__(self, address):
+        return address in self.decoded or self._is_start(address)
+
+    def __getitem__(self, address):
+        inst = self.decoded.get(address)
+        if inst is None:
+            if not self._is_start(address):
+                raise KeyError(address)
+            inst = self.disassemble_func(self.rom, address)
+            self.decoded[address] = inst
+        return inst
+
+    def __setitem__(self, address, inst):
+        if self.read_only:
+            raise TypeError("Instructions are read-only")
+        if address not in self:
+            self.added.add(address)
+        self.decoded[address] = inst
+
+    def __delitem__(self, address):
+        raise TypeError("Instructions cannot be deleted")
 
 
 class LocationTypes(object):
@@ -151,17 +300,13 @@ class LocationTypes(object):
 
 
 class LocationAnnotations(object):
-    '''A memory location can have zero or more annotations'''
-    EntryPoint = 0
-    JumpTarget = 1
-    CallTarget = 2
-    IllegalInstruction = 3
-
-
-def _slice_to_range(slc):
-    start, stop, step = slc.start, slc.stop, slc.step
-    if start is None:
-        start = 0
-    if step is None:
-        step = 1
-    return range(start, stop, step)
+    '''A memory location can have zero or more annotations, stored as bit
+    flags'''
+    EntryPoint = 0x01
+    JumpTarget = 0x02
+    CallTarget = 0x04
+    IllegalInstruction = 0x08
+
+
+_UNKNOWN_OR_DATA = (LocationTypes.Unknown, LocationTypes.Data)
+
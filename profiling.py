@@ -0,0 +1,91 @@
+# Wall time, peak memory and counters of the phases of a disassembly
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss_kib():
+    '''Return the peak resident set size of the process so far in KiB (a
+    lifetime high-water mark), or None if it cannot be measured'''
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024  # bytes on macOS
+    return rss
+
+
+class Profiler(object):
+    '''Record the phases of a run and counters reported by its components.
+
+    The peak memory of a phase is how much it raised the peak RSS of the
+    process, i.e. what the phase needed beyond the memory already used
+    before it.  With trace_malloc, it is instead the peak of the Python
+    heap during the phase above the heap at its start, measured with
+    tracemalloc (exact, but slows the run down).'''
+
+    def __init__(self, trace_malloc=False):
+        self.trace_malloc = trace_malloc
+        self.phases = []  # (name, seconds, peak memory in KiB)
+        self.counters = {}
+        if trace_malloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def peak_label(self):
+        return 'peak heap KiB' if self.trace_malloc else 'peak RSS growth KiB'
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if self.trace_malloc:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        else:
+            base = peak_rss_kib()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if self.trace_malloc:
+                peak = (tracemalloc.get_traced_memory()[1] - base) // 1024
+            elif base is None:
+                peak = None
+            else:
+                peak = peak_rss_kib() - base
+            self.phases.append((name, seconds, peak))
+
+    def to_dict(self):
+        key = 'peak_heap_kib' if self.trace_malloc else 'peak_rss_growth_kib'
+        return {
+            'phases': [{'name': name, 'seconds': seconds, key: peak}
+                       for name, seconds, peak in self.phases],
+            'total_seconds': sum(seconds for _, seconds, _ in self.phases),
+            'process_peak_rss_kib': peak_rss_kib(),
+            'counters': dict(self.counters),
+        }
+
+    def format_text(self):
+        lines = ['%-16s %10s %20s' % ('phase', 'seconds', self.peak_label)]
+        for name, seconds, peak in self.phases:
+            lines.append('%-16s %10.4f %20s' % (name, seconds,
+                                                '-' if peak is None else peak))
+        total = sum(seconds for _, seconds, _ in self.phases)
+        lines.append('%-16s %10.4f' % ('total', total))
+        peak = peak_rss_kib()
+        lines.append('%-16s %10s %20s' % ('process peak RSS', '', '-' if peak is None else peak))
+        lines.append('')
+        for name, value in self.counters.items():
+            lines.append('%-24s %10d' % (name, value))
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,239 @@
+# Resident analysis server: load ROM images once and answer queries on a
+# Unix socket.  Requests and responses are JSON objects, one per line:
+#
+#   {"op": "instruction", "image": "rom.bin", "address": 4096}
+#   {"ok": true, "result": {...}}   or   {"ok": false, "error": "..."}
+#
+# Addresses may be given as integers or as strings such as "0x1000".
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+import banks
+from dasm import ALL_VECTORS, ENTRY_POINTS, TRACEABLE_RANGE
+from listing import Printer
+from memory import ADDRESS_MASK, Memory
+from trace import Tracer
+from uPD78k2.disassemble import XrefKinds, disassemble
+from uPD78k2.symbols import SymbolTable, uPD78213_SYMBOLS
+
+SOCKET_PATH = 'k2dasm.sock'
+
+_XREF_KIND_NAMES = {value: name for name, value in vars(XrefKinds).items()
+                    if isinstance(value, int)}
+
+
+class Analysis(object):
+    '''The traced memory and symbols of one ROM image, kept with its tracer
+    so that entry points can be added and traced incrementally'''
+
+    def __init__(self, name, rom, entry_points=ENTRY_POINTS,
+                 vectors=ALL_VECTORS, traceable_range=TRACEABLE_RANGE):
+        self.name = name
+        self.traceable_range = traceable_range
+        self.memory = Memory(rom)
+        self.tracer = Tracer(self.memory, entry_points, vectors, traceable_range)
+        self.tracer.trace(disassemble)
+        self.generate_symbols()
+
+    def generate_symbols(self):
+        self.symbol_table = SymbolTable(uPD78213_SYMBOLS)
+        self.symbol_table.generate(self.memory, self.traceable_range)
+        self.addresses = {name: address for address, (name, _)
+                          in self.symbol_table.symbols.items()}
+
+    def add_entry_point(self, address):
+        '''Trace from a new entry point; return the number of new
+        instructions'''
+        count = len(self.memory.instructions)
+        self.tracer.add_entry_points([address])
+        self.tracer.trace(disassemble)
+        self.generate_symbols()
+        return len(self.memory.instructions) - count
+
+    def location_start(self, address):
+        while (address > 0 and
+               self.memory.is_continuation_of_multibyte_type(address)):
+            address -= 1
+        return address
+
+
+class QueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    '''Serve queries on the analyses, one request at a time'''
+    daemon_threads = True
+
+    def __init__(self, socket_path, analyses):
+        self.analyses = {analysis.name: analysis for analysis in analyses}
+        self.lock = threading.Lock()
+        socketserver.UnixStreamServer.__init__(self, socket_path, QueryHandler)
+
+    def answer(self, request):
+        op = request.get('op')
+        handler = getattr(self, 'query_%s' % op, None)
+        if handler is None:
+            raise ValueError(f"Unknown op {op!r}")
+        with self.lock:
+            return handler(request)
+
+    def _analysis(self, request):
+        name = request.get('image')
+        if name is None and len(self.analyses) == 1:
+            return next(iter(self.analyses.values()))
+        if name not in self.analyses:
+            raise ValueError(f"Unknown image {name!r}")
+        return self.analyses[name]
+
+    # Queries
+
+    def query_images(self, request):
+        return sorted(self.analyses)
+
+    def query_instruction(self, request):
+        '''The instruction at, or covering, address'''
+        analysis = self._analysis(request)
+        address = analysis.location_start(_address(request, 'address'))
+        inst = analysis.memory.get_instruction(address)
+        if inst is None or not analysis.memory.is_instruction_start(address):
+            return None
+        return {
+            'address': address,
+            'text': inst.to_string(symbols=analysis.symbol_table.symbols),
+            'bytes': bytes(inst.all_bytes).hex(),
+            'length': len(inst),
+            'flow_type': inst.flow_type,
+            'target': inst.target_address,
+            'referenced': list(inst.referenced_addresses),
+        }
+
+    def query_xrefs(self, request):
+        '''The references to address and those made from address (by its
+        instruction or vector), as [address, kind] pairs'''
+        analysis = self._analysis(request)
+        address = _address(request, 'address')
+        to = [[source, _XREF_KIND_NAMES[kind]]
+              for source, kind in analysis.memory.get_xrefs(address)]
+        made = [[target, _XREF_KIND_NAMES[kind]]
+                for target, kind in analysis.memory.get_xrefs_from(address)]
+        return {'to': to, 'from': made}
+
+    def query_symbol(self, request):
+        '''Look a symbol up by name or by address'''
+        analysis = self._analysis(request)
+        if 'name' in request:
+            address = analysis.addresses.get(request['name'])
+            if address is None:
+                return None
+        else:
+            address = _address(request, 'address')
+        symbol = analysis.symbol_table.symbols.get(address)
+        if symbol is None:
+            return None
+        name, comment = symbol
+        return {'address': address, 'name': name, 'comment': comment}
+
+    def query_listing(self, request):
+        '''The listing lines of start..end (inclusive), within the traceable
+        range'''
+        analysis = self._analysis(request)
+        start = analysis.location_start(_address(request, 'start'))
+        end = min(_address(request, 'end'), analysis.traceable_range[-1] - 1)
+        printer = Printer(analysis.memory, start, end, analysis.symbol_table)
+        return list(printer.iter_range(start, end))
+
+    def query_add_entry_point(self, request):
+        analysis = self._analysis(request)
+        address = _address(request, 'address')
+        return {'new_instructions': analysis.add_entry_point(address)}
+
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                response = {'ok': True, 'result': self.server.answer(request)}
+            except (ValueError, KeyError, TypeError, IndexError,
+                    NotImplementedError) as exc:
+                response = {'ok': False, 'error': str(exc)}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+def _address(request, key):
+    value = request[key]
+    if isinstance(value, str):
+        value = int(value, 0)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"{key} must be an address")
+    if not 0 <= value <= ADDRESS_MASK:
+        raise ValueError(f"{key} 0x{value:x} out of the 0x0000-0x{ADDRESS_MASK:04x} address space")
+    return value
+
+def query(socket_path, request):
+    '''Send one request to the server at socket_path and return its
+    response'''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        with sock.makefile('rwb') as f:
+            f.write(json.dumps(request).encode('utf-8') + b'\n')
+            f.flush()
+            return json.loads(f.readline())
+
+
+if __name__ == '__main__':
+    # Parse command line
+    parser = argparse.ArgumentParser(description="NEC 78K Disassembler query server.")
+    parser.add_argument("roms",         help="ROM files to serve", type=str, nargs="*")
+    parser.add_argument("-s", "--socket", help=f"Unix socket path ({SOCKET_PATH})", type=str, default=SOCKET_PATH)
+    parser.add_argument("-q", "--query", help="Send a JSON request to a running server and print the response", type=str, default=None)
+    parser.add_argument("--banks",      help="Bank map START-END[:OFFSET,...] of images larger than 64K", type=str, default=None)
+    parser.add_argument("--bank",       help="Bank to serve with --banks (0)", type=int, default=0)
+    parser.add_argument("-d",           help="Set loglevel to debug", action="store_true")
+
+    args = parser.parse_args()
+
+    # Setup logger
+    loglevel = logging.DEBUG if args.d else logging.INFO
+    logging.basicConfig(stream=sys.stderr, level=loglevel)
+
+    logger = logging.getLogger("Disassembler")
+
+    if args.query is not None:
+        try:
+            response = query(args.socket, json.loads(args.query))
+        except (OSError, ValueError) as exc:
+            logger.error(str(exc))
+            sys.exit(1)
+        print(json.dumps(response, indent=2))
+        sys.exit(0 if response.get('ok') else 1)
+
+    analyses = []
+    for filename in args.roms:
+        try:
+            rom = banks.read_rom(filename, args.banks, args.bank)
+        except OSError:
+            logger.error(f"Unable to open {filename}")
+            sys.exit(1)
+        except ValueError as exc:
+            logger.error(f"{filename}: {exc}")
+            sys.exit(1)
+        analyses.append(Analysis(os.path.basename(filename), rom))
+        logger.info(f"Loaded {filename}")
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    with QueryServer(args.socket, analyses) as server:
+        logger.info(f"Serving on {args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(args.socket)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the modules of the disassembler are top-level scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,14 @@
+# Small hand-assembled ROM images for the tests
+IMAGE_SIZE = 0x10000
+CODE_START = 0x0100
+
+
+def make_rom(code=b'', address=CODE_START, reset_vector=CODE_START):
+    '''Return an erased (0xff) image with code at address and the reset
+    vector pointing to reset_vector.  The other vectors are erased (0xffff),
+    outside of the traceable range.'''
+    rom = bytearray([0xff]) * IMAGE_SIZE
+    rom[0] = reset_vector & 0xff
+    rom[1] = reset_vector >> 8
+    rom[address:address + len(code)] = code
+    return rom
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from banks import ADDRESS_SPACE, load_rom, parse_bank_map, read_rom
+
+WINDOW = '0x8000-0xffff'
+
+
+def make_image(size):
+    '''Return an image where every 32K page is filled with its number'''
+    image = bytearray(size)
+    for page in range(size // 0x8000):
+        image[page * 0x8000:(page + 1) * 0x8000] = bytes([page]) * 0x8000
+    return image
+
+
+class BankMapTests(unittest.TestCase):
+    def test_default_offsets_follow_common_area(self):
+        bank_map = parse_bank_map(WINDOW, 0x20000)
+        self.assertEqual(bank_map.window, range(0x8000, 0x10000))
+        self.assertEqual(bank_map.offsets, [0x8000, 0x10000, 0x18000])
+
+    def test_default_bank_views(self):
+        image = make_image(0x20000)
+        bank_map = parse_bank_map(WINDOW, len(image))
+        for bank in range(len(bank_map)):
+            rom = bank_map.bank_image(image, bank)
+            self.assertEqual(len(rom), ADDRESS_SPACE)
+            self.assertEqual(rom[0x0000], 0)            # common area
+            self.assertEqual(rom[0x7fff], 0)
+            self.assertEqual(rom[0x8000], bank + 1)     # window
+            self.assertEqual(rom[0xffff], bank + 1)
+        self.assertEqual(bank_map.bank_image(image, 0), image[:ADDRESS_SPACE])
+
+    def test_explicit_offsets(self):
+        image = make_image(0x20000)
+        bank_map = parse_bank_map(WINDOW + ':0x18000,0x10000', len(image))
+        self.assertEqual(bank_map.offsets, [0x18000, 0x10000])
+        self.assertEqual(bank_map.bank_image(image, 0)[0x8000], 3)
+        self.assertEqual(bank_map.bank_image(image, 1)[0x8000], 2)
+
+    def test_window_beyond_image_reads_erased(self):
+        bank_map = parse_bank_map(WINDOW + ':0x18000', 0x1c000)
+        rom = bank_map.bank_image(make_image(0x20000)[:0x1c000], 0)
+        self.assertEqual(rom[0xbfff], 3)
+        self.assertEqual(rom[0xc000], 0xff)
+
+    def test_invalid_bank_maps(self):
+        for spec in ('0x8000', '0x8000-', 'x-0xffff', '0x8000-0x10000',
+                     WINDOW + ':zz'):
+            with self.assertRaises(ValueError, msg=spec):
+                parse_bank_map(spec, 0x20000)
+        with self.assertRaises(ValueError):
+            parse_bank_map(WINDOW, 0x20000).bank_image(make_image(0x20000), 3)
+
+
+class LoadRomTests(unittest.TestCase):
+    def test_small_image_is_loaded_whole(self):
+        image = make_image(0x10000)
+        self.assertEqual(load_rom(image), image)
+
+    def test_large_image_needs_bank_map(self):
+        with self.assertRaises(ValueError):
+            load_rom(make_image(0x20000))
+        rom = load_rom(make_image(0x20000), WINDOW, 2)
+        self.assertEqual(rom[0x8000], 3)
+
+    def test_read_rom(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'rom.bin')
+            with open(filename, 'wb') as f:
+                f.write(make_image(0x20000))
+            self.assertEqual(read_rom(filename, WINDOW, 1)[0xc000], 2)
+            with self.assertRaises(ValueError):
+                read_rom(filename)
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from cache import load_analysis, save_analysis
+from dasm import TRACEABLE_RANGE, analyze, make_printer
+from helpers import make_rom
+from profiling import Profiler
+from uPD78k2.disassemble import XrefKinds, disassemble
+from uPD78k2.symbols import SymbolTable
+
+# MOVW DE, #0x0200 ; BR DE      and RET at 0x0200
+INDIRECT_JUMP = b'\x64\x00\x02\x05\x4c'
+KEY = bytes(32)
+
+
+def listing(memory, symbol_table):
+    return list(make_printer(memory, symbol_table).iter_listing())
+
+
+class CacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.rom = make_rom(INDIRECT_JUMP)
+        self.rom[0x0200] = 0x56
+        self.rom[0x0300:0x0302] = b'\x00\x56'  # NOP ; RET, only an entry point
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cached_analysis_equals_fresh_one(self):
+        fresh = analyze(self.rom, cache_dir=self.directory.name)
+        cached = analyze(self.rom, cache_dir=self.directory.name)
+        self.assertIsNot(fresh[0], cached[0])
+        self.assertEqual(listing(*cached), listing(*fresh))
+        self.assertEqual(cached[1].symbols, fresh[1].symbols)
+
+    def test_resolved_indirect_xrefs_are_cached(self):
+        fresh, _ = analyze(self.rom, cache_dir=self.directory.name)
+        cached, _ = analyze(self.rom, cache_dir=self.directory.name)
+        self.assertEqual(fresh.get_xrefs(0x0200), [(0x0103, XrefKinds.Jump)])
+        self.assertEqual(cached.get_xrefs(0x0200), fresh.get_xrefs(0x0200))
+        self.assertEqual(cached.xrefs, fresh.xrefs)
+
+    def test_incremental_entry_point_equals_fresh_analysis(self):
+        analyze(self.rom, cache_dir=self.directory.name)
+        profiler = Profiler()
+        incremental = analyze(self.rom, [0x0300], cache_dir=self.directory.name,
+                              profiler=profiler)
+        fresh = analyze(self.rom, [0x0300])
+        self.assertTrue(incremental[0].is_instruction_start(0x0301))
+        self.assertEqual(listing(*incremental), listing(*fresh))
+
+        # only the new code is decoded and traced
+        self.assertEqual(profiler.counters['decoded'], 2)
+        self.assertEqual(profiler.counters['states_popped'], 2)
+
+    def test_removed_initial_symbol_uses_generated_one(self):
+        memory, _ = analyze(self.rom)
+        symbol_table = SymbolTable({0x0200: ('handler', 'initial')})
+        symbol_table.generate(memory, TRACEABLE_RANGE)
+        self.assertEqual(symbol_table.symbols[0x0200], ('handler', 'initial'))
+        filename = os.path.join(self.directory.name, 'analysis.k2c')
+        save_analysis(filename, KEY, memory, symbol_table)
+
+        # the initial symbol is gone when the cache is loaded
+        _, cached = load_analysis(filename, KEY, self.rom, disassemble, {})
+        fresh = SymbolTable({})
+        fresh.generate(memory, TRACEABLE_RANGE)
+        self.assertEqual(cached.symbols[0x0200], ('lab_0200', ''))
+        self.assertEqual(cached.symbols, fresh.symbols)
+
+        _, cached = load_analysis(filename, KEY, self.rom, disassemble,
+                                  {0x0200: ('handler', 'initial')})
+        self.assertEqual(cached.symbols[0x0200], ('handler', 'initial'))
+
+
+if __name__ == '__main__':
+    unittest.main()
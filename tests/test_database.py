@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from dasm import analyze
+from database import export_database
+from helpers import make_rom
+
+CODE = bytes.fromhex(
+    '280002'    # 0x0100 CALL !0x0200
+    '2220'      # 0x0103 MOV 0xfe20, A
+    '56'        # 0x0105 RET
+)
+
+
+class DatabaseTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'k2dasm.db')
+        rom = make_rom(CODE)
+        rom[0x0200] = 0x56  # RET
+        self.memory, self.symbol_table = analyze(rom)
+        self.image_id = export_database(self.filename, 'test', self.memory,
+                                        self.symbol_table)
+        self.connection = sqlite3.connect(self.filename)
+
+    def tearDown(self):
+        self.connection.close()
+        self.directory.cleanup()
+
+    def query(self, sql, *args):
+        return self.connection.execute(sql, args).fetchall()
+
+    def test_instructions(self):
+        rows = self.query('SELECT address, mnemonic, operands, target FROM instructions'
+                          ' WHERE image_id = ? ORDER BY address', self.image_id)
+        self.assertEqual(rows, [
+            (0x0100, 'CALL', '!sub_0200', 0x0200),
+            (0x0103, 'MOV', 'mem_fe20, A', None),
+            (0x0105, 'RET', '', None),
+            (0x0200, 'RET', '', None),
+        ])
+
+    def test_xrefs_by_kind(self):
+        rows = self.query('SELECT source, xref_kinds.name FROM xrefs'
+                          ' JOIN xref_kinds ON xref_kinds.id = kind'
+                          ' WHERE image_id = ? AND target = ?', self.image_id, 0xfe20)
+        self.assertEqual(rows, [(0x0103, 'Write')])
+        rows = self.query('SELECT source, xref_kinds.name FROM xrefs'
+                          ' JOIN xref_kinds ON xref_kinds.id = kind'
+                          ' WHERE image_id = ? AND target = ?', self.image_id, 0x0200)
+        self.assertEqual(rows, [(0x0100, 'Call')])
+
+    def test_symbols(self):
+        rows = self.query('SELECT name FROM symbols WHERE image_id = ? AND address = ?',
+                          self.image_id, 0x0200)
+        self.assertEqual(rows, [('sub_0200', )])
+
+    def test_export_replaces_previous_export_of_name(self):
+        image_id = export_database(self.filename, 'test', self.memory,
+                                   self.symbol_table)
+        self.assertEqual(self.query('SELECT id FROM images'), [(image_id, )])
+        self.assertEqual(self.query('SELECT COUNT(*) FROM instructions'), [(4, )])
+        self.assertEqual(self.query('SELECT COUNT(*) FROM instructions WHERE image_id != ?',
+                                    image_id), [(0, )])
@@ -0,0 +1,38 @@
+import unittest
+
+from dasm import analyze
+from helpers import make_rom
+from uPD78k2.disassemble import FlowTypes, disassemble, decode_all
+
+
+class RelativeBranchTests(unittest.TestCase):
+    def test_backward_branch_wraps_around_address_0(self):
+        rom = make_rom(b'\x14\xf0', address=0x0002)  # BR $-16 at 0x0002
+        inst = disassemble(rom, 0x0002)
+        self.assertEqual(inst.flow_type, FlowTypes.UnconditionalJump)
+        self.assertEqual(inst.target_address, 0xfff4)
+
+    def test_forward_branch_wraps_around_0xffff(self):
+        rom = make_rom(b'\x83\x10', address=0xfff8)  # BC $+16 at 0xfff8
+        self.assertEqual(disassemble(rom, 0xfff8).target_address, 0x000a)
+
+    def test_decoded_targets_are_addresses(self):
+        rom = make_rom(b'\x14\x80', address=0x0010)
+        image = decode_all(rom)
+        self.assertEqual(image.target_address(0x0010), 0xff92)
+
+    def test_wrapped_branch_is_traced(self):
+        rom = make_rom(b'\x14\xf0', address=0x0002)        # BR $0xfff4
+        rom[0xfff4:0xfff7] = b'\x2c\x00\x01'               # BR !0x0100
+        rom[0x0100] = 0x56                                  # RET
+        memory, symbol_table = analyze(rom, entry_points=[0x0002],
+                                       vectors=[])
+        self.assertTrue(memory.is_jump_target(0xfff4))
+        self.assertTrue(memory.is_instruction_start(0xfff4))
+        self.assertTrue(memory.is_instruction_start(0x0100))
+        text = memory.get_instruction(0x0002).to_string(symbol_table.symbols)
+        self.assertEqual(text, 'BR $%s' % symbol_table.symbols[0xfff4][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import operator
+import os
+import struct
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import export
+from dasm import analyze, make_printer
+from export import export_analysis, load_export
+from helpers import make_rom
+from uPD78k2.disassemble import XrefKinds, disassemble
+
+CODE = bytes.fromhex(
+    '280002'    # 0x0100 CALL !0x0200
+    '2220'      # 0x0103 MOV 0xfe20, A
+    '640003'    # 0x0105 MOVW DE, #0x0300
+    '054c'      # 0x0108 BR DE
+)
+
+
+def listing(memory, symbol_table):
+    return list(make_printer(memory, symbol_table).iter_listing())
+
+
+class ExportTests(unittest.TestCase):
+    def setUp(self):
+        rom = make_rom(CODE)
+        rom[0x0200] = 0x56  # RET
+        rom[0x0300] = 0x56  # RET
+        self.memory, self.symbol_table = analyze(rom)
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'rom.k2a')
+        export_analysis(self.filename, self.memory, self.symbol_table)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def check_round_trip(self, use_mmap):
+        memory, symbol_table = load_export(self.filename, use_mmap=use_mmap)
+        self.assertEqual(listing(memory, symbol_table),
+                         listing(self.memory, self.symbol_table))
+        self.assertEqual(dict(symbol_table.symbols), self.symbol_table.symbols)
+        for target in (0x0200, 0x0300, 0xfe20):
+            self.assertEqual(sorted(memory.get_xrefs(target)),
+                             sorted(self.memory.get_xrefs(target)))
+        self.assertEqual(memory.get_xrefs_from(0x0108), [(0x0300, XrefKinds.Jump)])
+        self.assertEqual(sorted(memory.iter_xref_targets(XrefKinds.Call)),
+                         sorted(self.memory.iter_xref_targets(XrefKinds.Call)))
+        self.assertEqual(list(memory.iter_instruction_spans()),
+                         [(address, len(inst)) for address, inst
+                          in self.memory.iter_instructions()])
+        return memory, symbol_table
+
+    def test_round_trip_mmap(self):
+        self.check_round_trip(use_mmap=True)
+
+    def test_round_trip_in_memory(self):
+        self.check_round_trip(use_mmap=False)
+
+    def test_arrays_are_little_endian(self):
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+        header = export._HEADER.unpack_from(data)
+        offsets, _ = export._layout(*header[2:])
+        starts = [address for address, _ in self.memory.iter_instructions()]
+        self.assertEqual(data[offsets['starts']:offsets['starts'] + 4 * len(starts)],
+                         struct.pack('<%dI' % len(starts), *starts))
+
+    def test_big_endian_host(self):
+        big_endian = types.SimpleNamespace(byteorder='big')
+        with mock.patch.object(export, 'sys', big_endian):
+            values = export._view(struct.pack('>3I', 1, 0x0200, 0x12345678), 0, 3, 'I')
+        self.assertEqual(list(values), [1, 0x0200, 0x12345678])
+
+    def test_read_only(self):
+        memory, symbol_table = load_export(self.filename)
+        inst = disassemble(memory.contents, 0x0100)
+        for modify in (lambda: memory.add_xref(0x0200, 0x0100, XrefKinds.Call),
+                       lambda: memory.clear_data(0x0400),
+                       lambda: memory.annotate_entry_point(0x0200),
+                       lambda: memory.set_data(0x0400),
+                       lambda: operator.setitem(memory.instructions, 0x0400, inst),
+                       lambda: operator.setitem(symbol_table.symbols, 0x0400, ('x', ''))):
+            with self.assertRaises(TypeError):
+                modify()
+
+    def test_not_an_export(self):
+        with open(self.filename, 'r+b') as f:
+            f.write(b'XXXX')
+        with self.assertRaises(ValueError):
+            load_export(self.filename)
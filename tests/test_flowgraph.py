@@ -0,0 +1,36 @@
+import unittest
+
+from dasm import analyze
+from flowgraph import EdgeKinds, build_cfg
+from helpers import make_rom
+
+CODE = bytes.fromhex(
+    '640002'    # 0x0100 MOVW DE, #0x0200
+    '055c'      # 0x0103 CALL DE
+    '640003'    # 0x0105 MOVW DE, #0x0300
+    '054c'      # 0x0108 BR DE
+)
+
+
+class ControlFlowGraphTests(unittest.TestCase):
+    def setUp(self):
+        rom = make_rom(CODE)
+        rom[0x0200] = 0x56  # RET
+        rom[0x0300] = 0x56  # RET
+        memory, _ = analyze(rom)
+        self.cfg = build_cfg(memory)
+
+    def successors(self, address):
+        block = self.cfg.block_at(address)
+        return [(self.cfg.starts[successor], kind)
+                for successor, kind in self.cfg.iter_successors(block)]
+
+    def test_blocks(self):
+        self.assertEqual(list(self.cfg.starts), [0x0100, 0x0105, 0x0200, 0x0300])
+
+    def test_resolved_indirect_call(self):
+        self.assertEqual(self.successors(0x0103),
+                         [(0x0200, EdgeKinds.Call), (0x0105, EdgeKinds.Fallthrough)])
+
+    def test_resolved_indirect_jump(self):
+        self.assertEqual(self.successors(0x0108), [(0x0300, EdgeKinds.Jump)])
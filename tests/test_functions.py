@@ -0,0 +1,51 @@
+import unittest
+
+from dasm import analyze
+from functions import CallKinds, build_call_graph
+from helpers import make_rom
+
+CODE = bytes.fromhex(
+    '280002'    # 0x0100 CALL !0x0200
+    '9000'      # 0x0103 CALLF !0x0800
+    'e1'        # 0x0105 CALLT [01]
+    '640004'    # 0x0106 MOVW DE, #0x0400
+    '055c'      # 0x0109 CALL DE
+    '2c0005'    # 0x010b BR !0x0500
+)
+
+
+class CallGraphTests(unittest.TestCase):
+    def setUp(self):
+        rom = make_rom(CODE)
+        rom[0x0042:0x0044] = b'\x00\x03'    # CALLT table entry 1: 0x0300
+        for address in (0x0200, 0x0300, 0x0400, 0x0500, 0x0800):
+            rom[address] = 0x56             # RET
+        self.memory, _ = analyze(rom)
+        self.call_graph = build_call_graph(self.memory)
+
+    def test_callt_target_is_read_from_table_word(self):
+        self.assertEqual(self.memory.get_instruction(0x0105).target_address, 0x0300)
+
+    def test_functions(self):
+        self.assertEqual([f.entry for f in self.call_graph.functions],
+                         [0x0100, 0x0200, 0x0300, 0x0400, 0x0800])
+
+    def test_calls(self):
+        entries = [f.entry for f in self.call_graph.functions]
+        calls = sorted((entries[caller], entries[callee], site, kind)
+                       for caller, callee, site, kind in self.call_graph.calls)
+        self.assertEqual(calls, [
+            (0x0100, 0x0200, 0x0100, CallKinds.Call),
+            (0x0100, 0x0300, 0x0105, CallKinds.CallT),
+            (0x0100, 0x0400, 0x0109, CallKinds.Call),
+            (0x0100, 0x0800, 0x0103, CallKinds.CallF),
+        ])
+
+    def test_tail_jump_stays_in_function(self):
+        main = self.call_graph.function_at(0x0100)
+        self.assertIn(main, self.call_graph.functions_containing(0x0500))
+
+    def test_bottom_up_levels(self):
+        levels = [[f.entry for f in level]
+                  for level in self.call_graph.bottom_up_levels()]
+        self.assertEqual(levels, [[0x0200, 0x0300, 0x0400, 0x0800], [0x0100]])
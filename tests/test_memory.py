@@ -0,0 +1,111 @@
+import unittest
+
+from dasm import analyze
+from helpers import make_rom
+from memory import LazyInstructions, Memory
+from uPD78k2.disassemble import DATA_XREF_KINDS, XrefKinds, disassemble
+
+SADDR = 0xfe20
+
+DATA_ACCESSES = bytes.fromhex(
+    '2020'      # 0x0100 MOV A, 0xfe20
+    '2220'      # 0x0102 MOV 0xfe20, A
+    '2620'      # 0x0104 INC 0xfe20
+    '6f2005'    # 0x0106 CMP 0xfe20, #05
+    '56'        # 0x0109 RET
+)
+
+
+class DataXrefTests(unittest.TestCase):
+    def setUp(self):
+        self.memory, _ = analyze(make_rom(DATA_ACCESSES))
+
+    def sources(self, kind):
+        return sorted(source for source, xref_kind in self.memory.get_xrefs(SADDR)
+                      if xref_kind == kind)
+
+    def test_reads(self):
+        self.assertEqual(self.sources(XrefKinds.Read), [0x0100, 0x0104, 0x0106])
+
+    def test_writes(self):
+        self.assertEqual(self.sources(XrefKinds.Write), [0x0102, 0x0104])
+
+    def test_data_xref_targets(self):
+        self.assertIn(SADDR, self.memory.iter_xref_targets(*DATA_XREF_KINDS))
+        self.assertNotIn(SADDR, self.memory.iter_xref_targets(XrefKinds.Jump))
+
+
+class LazyInstructionsTests(unittest.TestCase):
+    def setUp(self):
+        self.rom = make_rom(DATA_ACCESSES)
+        self.starts = [0x0100, 0x0102, 0x0104]
+
+    def test_nothing_is_decoded_before_access(self):
+        instructions = LazyInstructions(self.starts, self.rom, disassemble)
+        self.assertEqual(len(instructions), 3)
+        self.assertEqual(list(instructions), self.starts)
+        self.assertIn(0x0102, instructions)
+        self.assertNotIn(0x0101, instructions)
+        self.assertEqual(instructions.decoded, {})
+
+    def test_undecoded_instructions_are_never_handed_out(self):
+        instructions = LazyInstructions(self.starts, self.rom, disassemble)
+        self.assertNotIn(None, list(instructions.values()))
+        self.assertNotIn(None, dict(instructions).values())
+        self.assertEqual(str(instructions[0x0104]), 'INC {0}')
+        self.assertIsNone(instructions.get(0x0101))
+        with self.assertRaises(KeyError):
+            instructions[0x0101]
+
+    def test_set_instructions_are_added(self):
+        instructions = LazyInstructions(self.starts, self.rom, disassemble)
+        inst = disassemble(self.rom, 0x0109)
+        instructions[0x0109] = inst
+        instructions[0x0100] = disassemble(self.rom, 0x0100)
+        self.assertEqual(len(instructions), 4)
+        self.assertEqual(list(instructions), self.starts + [0x0109])
+        self.assertIs(instructions[0x0109], inst)
+
+    def test_read_only(self):
+        instructions = LazyInstructions(self.starts, self.rom, disassemble,
+                                        read_only=True)
+        with self.assertRaises(TypeError):
+            instructions[0x0109] = disassemble(self.rom, 0x0109)
+        with self.assertRaises(TypeError):
+            del instructions[0x0100]
+
+
+class WordTests(unittest.TestCase):
+    def setUp(self):
+        rom = bytearray(range(256)) * 256
+        self.memory = Memory(rom)
+
+    def test_read_words(self):
+        self.assertEqual(self.memory.read_words(0x0010, 2), (0x1110, 0x1312))
+        self.assertEqual(self.memory.read_words(0x0010, 1)[0],
+                         self.memory.read_word(0x0010))
+
+    def test_read_words_at_end_of_memory(self):
+        self.assertEqual(self.memory.read_words(0xfffc, 2), (0xfdfc, 0xfffe))
+        self.assertEqual(self.memory.read_words(0xfffc, 0), ())
+        with self.assertRaises(IndexError):
+            self.memory.read_words(0xfffe, 2)
+        with self.assertRaises(IndexError):
+            self.memory.read_words(0xffff, 1)
+        # read_word() wraps around instead
+        self.assertEqual(self.memory.read_word(0xffff), 0x00ff)
+
+    def test_vectors_are_little_endian(self):
+        for address in (0x0000, 0x0002, 0x0006, 0xfffe):
+            self.memory.set_vector(address)
+        self.assertEqual(self.memory.get_vector(0x0002), 0x0302)
+        self.assertEqual(list(self.memory.iter_vectors()), [
+            (0x0000, 0x0100), (0x0002, 0x0302), (0x0006, 0x0706),
+            (0xfffe, 0xfffe),
+        ])
+        self.assertEqual(list(self.memory.iter_vectors(0x0003)),
+                         [(0x0006, 0x0706), (0xfffe, 0xfffe)])
+
+    def test_vector_at_end_of_memory_wraps_around(self):
+        self.memory.set_vector(0xffff)
+        self.assertEqual(list(self.memory.iter_vectors()), [(0xffff, 0x00ff)])
@@ -0,0 +1,33 @@
+import tracemalloc
+import unittest
+
+from profiling import Profiler, peak_rss_kib
+
+
+class ProfilerTests(unittest.TestCase):
+    def test_heap_peak_of_phase_that_frees_its_memory(self):
+        profiler = Profiler(trace_malloc=True)
+        try:
+            with profiler.phase('allocate'):
+                buffer = bytearray(8 << 20)
+                del buffer
+            with profiler.phase('idle'):
+                pass
+        finally:
+            tracemalloc.stop()
+        (_, _, allocate), (_, _, idle) = profiler.phases
+        self.assertGreaterEqual(allocate, 8 << 10)
+        self.assertLess(idle, 64)
+        self.assertIn('peak_heap_kib', profiler.to_dict()['phases'][0])
+
+    @unittest.skipIf(peak_rss_kib() is None, "no getrusage()")
+    def test_rss_peak_growth(self):
+        profiler = Profiler()
+        with profiler.phase('allocate'):
+            # larger than the peak so far, so that the phase raises it
+            buffer = bytearray((peak_rss_kib() + (16 << 10)) << 10)
+            buffer[::4096] = b'\1' * len(buffer[::4096])
+            del buffer
+        (_, _, peak), = profiler.phases
+        self.assertGreater(peak, 0)
+        self.assertIn('peak_rss_growth_kib', profiler.to_dict()['phases'][0])
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from helpers import make_rom
+from server import Analysis, QueryServer, query
+
+CODE = bytes.fromhex(
+    '280002'    # 0x0100 CALL !0x0200
+    '2220'      # 0x0103 MOV 0xfe20, A
+    '56'        # 0x0105 RET
+)
+
+
+class ServerTestCase(unittest.TestCase):
+    '''Serve the analysis of make_rom() for the test'''
+
+    def setUp(self):
+        rom = self.make_rom()
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, 'k2dasm.sock')
+        self.server = QueryServer(self.socket_path, [Analysis('rom.bin', rom)])
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.directory.cleanup()
+
+    def result(self, **request):
+        response = query(self.socket_path, request)
+        self.assertTrue(response['ok'], response)
+        return response['result']
+
+    def error(self, **request):
+        response = query(self.socket_path, request)
+        self.assertFalse(response['ok'], response)
+        return response['error']
+
+
+class QueryServerTests(ServerTestCase):
+    def make_rom(self):
+        rom = make_rom(CODE)
+        rom[0x0200] = 0x56          # RET
+        rom[0x0300:0x0302] = b'\x00\x56'  # NOP ; RET, not traced
+        return rom
+
+    def test_instruction(self):
+        result = self.result(op='instruction', address='0x0101')
+        self.assertEqual(result['address'], 0x0100)
+        self.assertEqual(result['target'], 0x0200)
+        self.assertEqual(result['bytes'], '280002')
+
+    def test_xrefs(self):
+        self.assertEqual(self.result(op='xrefs', address=0x0200),
+                         {'to': [[0x0100, 'Call']], 'from': []})
+        self.assertEqual(self.result(op='xrefs', address=0x0103),
+                         {'to': [], 'from': [[0xfe20, 'Write']]})
+
+    def test_vector_xrefs(self):
+        self.assertEqual(self.result(op='xrefs', address=0x0000)['from'],
+                         [[0x0100, 'Vector']])
+
+    def test_symbol(self):
+        self.assertEqual(self.result(op='symbol', name='sub_0200')['address'], 0x0200)
+
+    def test_listing_is_clamped_to_traceable_range(self):
+        lines = self.result(op='listing', start='0xfff0', end='0xffff')
+        self.assertTrue(lines)
+
+    def test_add_entry_point(self):
+        self.assertEqual(self.result(op='add_entry_point', address=0x0300),
+                         {'new_instructions': 2})
+        self.assertEqual(self.result(op='instruction', address=0x0301)['address'], 0x0301)
+
+    def test_invalid_requests_are_answered(self):
+        self.error(op='instruction', address=0x10000)
+        self.error(op='instruction', address=-1)
+        self.error(op='listing', start='zz', end=0)
+        self.error(op='unknown')
+        self.error(op='instruction')
+        # the server still answers
+        self.assertEqual(self.result(op='images'), ['rom.bin'])
+
+
+class IndirectXrefTests(ServerTestCase):
+    def make_rom(self):
+        rom = make_rom(b'\x64\x00\x02\x05\x4c')   # MOVW DE, #0x0200 ; BR DE
+        rom[0x0200] = 0x56                          # RET
+        return rom
+
+    def test_resolved_indirect_jump(self):
+        self.assertEqual(self.result(op='xrefs', address=0x0103),
+                         {'to': [], 'from': [[0x0200, 'Jump']]})
+        self.assertEqual(self.result(op='xrefs', address=0x0200)['to'],
+                         [[0x0103, 'Jump']])
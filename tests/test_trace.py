@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import unittest
+
+from dasm import analyze
+from helpers import make_rom
+from profiling import Profiler
+from trace import ProcessorState, TraceDecisions, TraceEventLog, TraceQueue
+
+
+class TraceEventLogTests(unittest.TestCase):
+    def test_addresses_are_hexadecimal_in_asm(self):
+        rom = make_rom(b'\x28\x00\x02')  # CALL !0x0200
+        rom[0x0200] = 0x56               # RET
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'trace.log')
+            with TraceEventLog(filename) as log:
+                analyze(rom, trace_hook=log)
+            with open(filename) as f:
+                events = [json.loads(line) for line in f]
+        call = [event for event in events if event['pc'] == 0x0100][0]
+        self.assertEqual(call['asm'], 'CALL !0x0200')
+        self.assertEqual(call['target'], 0x0200)
+
+
+class TraceQueueTests(unittest.TestCase):
+    def test_states_at_a_pc_are_bounded(self):
+        queue = TraceQueue()
+        for a in range(10):
+            regs = (0x12, a) + (None, ) * 6
+            queue.push(ProcessorState(pc=0x0200, regs=regs))
+        # the fifth state is widened to the known X, the next ones to it
+        self.assertEqual(len(queue), TraceQueue.MAX_STATES_PER_PC + 1)
+        self.assertEqual(queue.merged, 6)
+        popped = [queue.pop() for _ in range(len(queue))]
+        self.assertIn(ProcessorState(pc=0x0200, regs=(0x12, ) + (None, ) * 7),
+                      popped)
+
+    def test_join_keeps_agreed_values(self):
+        state = ProcessorState(pc=0x0200, bank=1, regs=(1, 2, 3) + (None, ) * 5)
+        other = ProcessorState(pc=0x0200, bank=1, regs=(1, 5, 3) + (None, ) * 5)
+        self.assertEqual(state.join([other]),
+                         ProcessorState(pc=0x0200, bank=1,
+                                        regs=(1, None, 3) + (None, ) * 5))
+        other.bank = 2
+        self.assertIsNone(state.join([other]).bank)
+
+
+class TracerTests(unittest.TestCase):
+    def trace_count(self, rom, pc):
+        '''Return the number of times pc is traced'''
+        events = []
+        analyze(rom, trace_hook=lambda ps, inst, decision:
+                            events.append((ps.pc, decision)))
+        return sum(1 for event_pc, decision in events if event_pc == pc and
+                   decision in (TraceDecisions.New, TraceDecisions.Retraced))
+
+    def test_widening_bounds_retraces(self):
+        # 6 x (MOV A, #n ; CALL !0x0200) then RET, and RET at 0x0200
+        code = b''.join(bytes([0xb9, n, 0x28, 0x00, 0x02]) for n in range(6))
+        rom = make_rom(code + b'\x56')
+        rom[0x0200] = 0x56
+        profiler = Profiler()
+        analyze(rom, profiler=profiler)
+        self.assertEqual(profiler.counters['merged_states'], 2)
+        self.assertEqual(self.trace_count(rom, 0x0200),
+                         TraceQueue.MAX_STATES_PER_PC + 1)
+
+    def indirect_jump_is_resolved(self, store):
+        '''Trace MOVW DE, #0x0200 ; store ; BR DE'''
+        rom = make_rom(b'\x64\x00\x02' + store + b'\x05\x4c')
+        rom[0x0200] = 0x56  # RET
+        memory, _ = analyze(rom)
+        return memory.is_instruction_start(0x0200)
+
+    def test_unrelated_store_keeps_registers(self):
+        self.assertTrue(self.indirect_jump_is_resolved(b'\x22\x20'))     # MOV 0xfe20, A
+        self.assertTrue(self.indirect_jump_is_resolved(b'\x12\x20'))     # MOV 0xff20, A
+
+    def test_register_area_store_drops_registers(self):
+        self.assertFalse(self.indirect_jump_is_resolved(b'\x22\xe6'))    # MOV 0xfee6, A
+        self.assertFalse(self.indirect_jump_is_resolved(b'\x3a\xe6\x05'))  # MOV 0xfee6, #05
+
+    def test_psw_store_drops_registers(self):
+        self.assertFalse(self.indirect_jump_is_resolved(b'\x12\xfe'))    # MOV PSW, A
+        self.assertFalse(self.indirect_jump_is_resolved(b'\x2b\xfe\x05'))  # MOV PSW, #05
+
+    def test_register_bank_selection_drops_registers(self):
+        self.assertFalse(self.indirect_jump_is_resolved(b'\x05\xa9'))    # SEL RB1
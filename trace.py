@@ -1,69 +1,133 @@
-import os
-from operator import attrgetter
-from uPD78k2.disassemble import FlowTypes, IllegalInstructionError
+import heapq
+import json
+from uPD78k2 import registers
+from uPD78k2.disassemble import DecodedImage, FlowTypes, NO_TARGET, XrefKinds
 
 class Tracer(object):
-    def __init__(self, memory, entry_points, vectors, traceable_range):
+    '''Trace code from entry points and vectors.  The memory may hold the
+    result of a previous trace: its instructions are not traced again and
+    its Data locations are turned back into code when they are reached, so
+    only newly reachable code is traced.
+
+    event_hook, if any, is called as event_hook(ps, inst, decision) for every
+    processor state traced, where inst is None when no instruction could be
+    decoded and decision is one of the TraceDecisions.  The hook is looked
+    up once per trace(), so there is no cost without one.'''
+
+    def __init__(self, memory, entry_points, vectors, traceable_range,
+                 event_hook=None):
         self.memory = memory
         self.traceable_range = traceable_range
         self.queue = TraceQueue()
+        self.image = None
+        self.event_hook = event_hook
 
+        # counters reported by counters()
+        self.retraced = 0
+        self.illegal_instructions = 0
+        self.resolved_indirect = 0
+        self.data_bytes = 0
+
+        for address in memory.instructions:  # without decoding them
+            self.queue.mark_traced(ProcessorState(pc=address))
+
+        self.add_entry_points(entry_points, vectors)
+
+    def add_entry_points(self, entry_points, vectors=()):
+        '''Queue more entry points and vectors; the next trace() only traces
+        the code that they make reachable'''
         for address in entry_points:
-            if address not in traceable_range:
+            if address not in self.traceable_range:
                 msg = "Address 0x%04X outside of traceable range"
                 raise ValueError(msg % address)
             self.memory.annotate_entry_point(address)
             self.enqueue_address(address)
 
         for address in vectors:
-            if address not in traceable_range:
+            if address not in self.traceable_range:
                 msg = "Vector address 0x%04X outside of traceable range"
                 raise ValueError(msg % address)
             self.enqueue_vector(address)
 
-    def trace(self, disassemble_func):
+    def trace(self, disassemble_func, image=None):
+        '''Trace from the queued entry points.  Addresses are decoded on
+        demand, once, into a DecodedImage kept for later traces, unless an
+        already decoded image is passed (e.g. from decode_all()).'''
+        if image is None:
+            image = self.image
+        if image is None:
+            image = DecodedImage(self.memory, disassemble_func)
+        self.image = image
+        decoded = image.decoded
         mem_len = len(self.memory)
+        hook = self.event_hook
 
         while len(self.queue):
             ps = self.queue.pop() # current processor state
-
-            try:
-                inst = disassemble_func(self.memory, ps.pc)
-            except IllegalInstructionError:
-                self.memory.annotate_illegal_instruction(ps.pc)
+            pc = ps.pc
+            if not decoded[pc]:
+                image.decode(pc)
+
+            if image.illegal[pc]:
+                self.memory.annotate_illegal_instruction(pc)
+                self.illegal_instructions += 1
+                if hook is not None:
+                    hook(ps, None, TraceDecisions.Illegal)
                 continue
 
-            if "LOG" in os.environ: # XXX hack
-                self._log(inst, ps)
-
-            inst_len = len(inst)
-            if (ps.pc + inst_len) >= mem_len:
-                continue  # ignore instruction that would wrap around memory
+            inst_len = image.lengths[pc]
+            if (pc + inst_len) >= mem_len:
+                # ignore instruction that would wrap around memory
+                if hook is not None:
+                    hook(ps, None, TraceDecisions.WrapAround)
+                continue
 
-            if self.memory.is_instruction_start(ps.pc):
+            if self.memory.is_instruction_start(pc):
                 # tracing previously seen instruction with new processor state
-                pass
-            elif not self.memory.is_unknown(ps.pc, inst_len):
+                self.retraced += 1
+                if hook is not None:
+                    hook(ps, self.memory.get_instruction(pc),
+                         TraceDecisions.Retraced)
+            elif not self.memory.is_unknown_or_data(pc, inst_len):
                 # ignore new instruction that would overlap a previous marking
+                if hook is not None:
+                    hook(ps, image.instruction(pc), TraceDecisions.Overlap)
                 continue
             else:
-                # mark new instruction
-                self.memory.set_instruction(ps.pc, inst)
+                # mark new instruction, reclaiming data left by a previous trace
+                inst = image.instruction(pc)
+                self.memory.clear_data(pc, inst_len)
+                self.memory.set_instruction(pc, inst)
+                if hook is not None:
+                    hook(ps, inst, TraceDecisions.New)
 
             new_ps = ps.copy()  # new state after this instruction
-            new_ps.pc = (ps.pc + inst_len) & 0xFFFF
+            new_ps.pc = (pc + inst_len) & 0xFFFF
+            new_ps.bank, new_ps.regs = registers.execute(self.memory, pc,
+                                                         ps.bank, ps.regs)
 
             # trace this instruction
-            #handler = self._instruction_handlers.get(inst.opcode)
+            #handler = self._instruction_handlers.get(self.memory[pc])
             handler = None
             if handler is None:
-                handler = self._generic_handlers[inst.flow_type]
-            handler(self, inst, ps, new_ps)
+                handler = self._generic_handlers[image.flow_types[pc]]
+            handler(self, image.targets[pc], ps, new_ps)
 
         self.mark_unknown_memory_as_data()
 
-    def _log(self, inst, ps):
-        print("TRACE " + str(ps).ljust(24) + str(inst))
+    def counters(self):
+        '''Return the work done by the traces so far'''
+        return {
+            'decoded': 0 if self.image is None else len(self.image),
+            'instructions': len(self.memory.instructions),
+            'states_pushed': self.queue.counter,
+            'states_popped': self.queue.popped,
+            'retraced': self.retraced,
+            'illegal_instructions': self.illegal_instructions,
+            'resolved_indirect': self.resolved_indirect,
+            'merged_states': self.queue.merged,
+            'data_bytes': self.data_bytes,
+        }
 
     # Handlers for specific instructions
 
@@ -71,43 +135,67 @@ class Tracer(object):
 
     # Fallback handlers for when an instruction handler is not available
 
-    def _trace_generic_continue(self, inst, ps, new_ps):
+    def _trace_generic_continue(self, target, ps, new_ps):
         self.enqueue_processor_state(new_ps)
 
-    def _trace_generic_stop(self, inst, ps, new_ps):
+    def _trace_generic_stop(self, target, ps, new_ps):
         pass
 
-    def _trace_generic_conditional_jump(self, inst, ps, new_ps):
+    def _trace_generic_conditional_jump(self, target, ps, new_ps):
         # don't take the branch
         self.enqueue_processor_state(new_ps)
 
         # take the branch
         new_ps = new_ps.copy()
-        new_ps.pc = inst.target_address
+        new_ps.pc = target
         self.enqueue_processor_state(new_ps)
-        self.memory.annotate_jump_target(inst.target_address)
+        self.memory.annotate_jump_target(target)
 
-    def _trace_generic_unconditional_jump(self, inst, ps, new_ps):
-        self.memory.annotate_jump_target(inst.target_address)
-        new_ps.pc = inst.target_address
+    def _trace_generic_unconditional_jump(self, target, ps, new_ps):
+        self.memory.annotate_jump_target(target)
+        new_ps.pc = target
         self.enqueue_processor_state(new_ps)
 
-    def _trace_generic_subroutine_call(self, inst, ps, new_ps):
+    def _trace_generic_subroutine_call(self, target, ps, new_ps):
         # enqueue the next instruction after call returns
         # XXX the processor flags are dropped here because we don't
         # know how the subroutine would have affected them.
         new_ps2 = ProcessorState(pc=new_ps.pc)
         self.enqueue_processor_state(new_ps2)
 
-        # enqueue the subroutine called
-        new_ps.pc = inst.target_address
-        self.memory.annotate_call_target(inst.target_address)
+        # enqueue the subroutine called, with the registers before the call
+        # (CALL rp is only followed when its register pair is known)
+        if target == NO_TARGET:
+            target = self.resolve_indirect_target(ps, XrefKinds.Call)
+            if target is None:
+                return
+        new_ps.pc = target
+        new_ps.bank, new_ps.regs = ps.bank, ps.regs
+        self.memory.annotate_call_target(target)
         self.enqueue_processor_state(new_ps)
 
-    def _trace_generic_indirect_unconditional_jump(self, inst, ps, new_ps):
-        pass
-
-    def _trace_generic_subroutine_return(self, inst, ps, new_ps):
+    def _trace_generic_indirect_unconditional_jump(self, target, ps, new_ps):
+        # BR rp is only followed when its register pair is known
+        target = self.resolve_indirect_target(ps, XrefKinds.Jump)
+        if target is not None:
+            self.memory.annotate_jump_target(target)
+            new_ps.pc = target
+            new_ps.bank, new_ps.regs = ps.bank, ps.regs
+            self.enqueue_processor_state(new_ps)
+
+    def resolve_indirect_target(self, ps, kind):
+        '''Return the target of the BR rp or CALL rp at ps.pc from the
+        registers known in ps, recording it as a cross reference, or None
+        if unknown or outside of the traceable range'''
+        target = registers.indirect_target(self.memory, ps.pc, ps.regs)
+        if target is None or target not in self.traceable_range:
+            return None
+        if (ps.pc, kind) not in self.memory.get_xrefs(target):
+            self.memory.add_xref(target, ps.pc, kind)
+        self.resolved_indirect += 1
+        return target
+
+    def _trace_generic_subroutine_return(self, target, ps, new_ps):
         pass
 
     _generic_handlers = {
@@ -122,7 +210,7 @@ class Tracer(object):
 
     def enqueue_processor_state(self, ps):
         if ps.pc in self.traceable_range:
-            if self.memory.is_unknown(ps.pc):
+            if self.memory.is_unknown_or_data(ps.pc):
                 self.queue.push(ps)
             elif self.memory.is_instruction_start(ps.pc):
                 # we need to queue it again to so it's traced with the current
@@ -137,7 +225,7 @@ class Tracer(object):
     def enqueue_vector(self, address):
         if address in self.traceable_range:
             self.memory.set_vector(address)
-            target = self.memory.read_word(address)
+            target = self.memory.get_vector(address)
             # TODO 0xFFFF can be replaced with a check for is unknown or is
             # start of instruction, since 0xFFFF is the reset vector
             #if (target != 0xFFFF) and (target in self.traceable_range):
@@ -146,98 +234,157 @@ class Tracer(object):
                 self.enqueue_address(target)
 
     def mark_unknown_memory_as_data(self):
-        for address in self.traceable_range:
-            if self.memory.is_unknown(address):
-                self.memory.set_data(address)
+        unknown = self.memory.iter_unknown(self.traceable_range.start,
+                                           self.traceable_range.stop)
+        for address in list(unknown):
+            self.memory.set_data(address)
+            self.data_bytes += 1
+
+
+class TraceDecisions(object):
+    '''What the tracer did with a processor state'''
+    New = 'new'                 # instruction marked and followed
+    Retraced = 'retraced'       # instruction already marked, followed again
+    Overlap = 'overlap'         # ignored, overlaps a previous marking
+    WrapAround = 'wrap_around'  # ignored, would wrap around memory
+    Illegal = 'illegal'         # ignored, illegal instruction
+
+
+class TraceEventLog(object):
+    '''A Tracer event hook writing one JSON object per line (NDJSON) to a
+    buffered file.  Addresses are integers, except in the asm text where
+    they are written as 0x%04x.'''
+
+    def __init__(self, filename, buffering=1 << 20):
+        self.file = open(filename, 'w', buffering=buffering)
+
+    def __call__(self, ps, inst, decision):
+        if inst is None:
+            event = {'pc': ps.pc, 'state': str(ps), 'decision': decision}
+        else:
+            event = {'pc': ps.pc, 'state': str(ps), 'decision': decision,
+                     'asm': inst.render({address: '0x%04x' % address
+                                         for address, _ in inst.asm_args}),
+                     'length': len(inst),
+                     'flow_type': inst.flow_type,
+                     'target': inst.target_address}
+        self.file.write(json.dumps(event) + '\n')
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 class TraceQueue(object):
     '''A queue for holding processor states that need to be traced.  States may
     be pushed in any order but are always popped sorted by the program counter.
     A state that was pushed will be ignored if it is pushed again, even if it
-    was popped off.'''
+    was popped off.
+
+    States are kept in a heap keyed by (pc, push order) so push and pop are
+    O(log n), and membership is checked against a companion set.
+
+    At most MAX_STATES_PER_PC distinct states are queued for a pc; past that,
+    a pushed state is widened by joining it with all the states seen at its
+    pc, which only keeps the register values that they all agree on.  Since
+    joining can only forget values, a pc is traced a bounded number of
+    times.'''
+
+    MAX_STATES_PER_PC = 4
 
     def __init__(self):
-        self.untraced_processor_states = SortedSet(key=attrgetter('pc'))
+        self.heap = []
+        self.counter = 0  # number of states pushed
+        self.popped = 0
+        self.merged = 0   # number of states widened
+        self.untraced_processor_states = set()
         self.traced_processor_states = set()
+        self.states_at = {}  # pc: [states pushed or marked traced]
 
     def __len__(self):
-        return len(self.untraced_processor_states)
+        return len(self.heap)
+
+    def __contains__(self, processor_state):
+        return (processor_state in self.traced_processor_states or
+                processor_state in self.untraced_processor_states)
 
     def push(self, processor_state):
-        if processor_state not in self.traced_processor_states:
-            if processor_state not in self.untraced_processor_states:
-                self.untraced_processor_states.add(processor_state)
+        if processor_state in self:
+            return
+
+        states = self.states_at.setdefault(processor_state.pc, [])
+        if len(states) >= self.MAX_STATES_PER_PC:
+            processor_state = processor_state.join(states)
+            self.merged += 1
+            if processor_state in self:
+                return
+
+        states.append(processor_state)
+        self.untraced_processor_states.add(processor_state)
+        entry = (processor_state.pc, self.counter, processor_state)
+        heapq.heappush(self.heap, entry)
+        self.counter += 1
+
+    def mark_traced(self, processor_state):
+        '''Record a state as traced so it is never queued'''
+        self.traced_processor_states.add(processor_state)
+        self.states_at.setdefault(processor_state.pc, []).append(processor_state)
 
     def pop(self):
-        if self.untraced_processor_states:
-            processor_state = self.untraced_processor_states.pop()
+        if self.heap:
+            _, _, processor_state = heapq.heappop(self.heap)
+            self.untraced_processor_states.remove(processor_state)
             self.traced_processor_states.add(processor_state)
+            self.popped += 1
             return processor_state
         raise KeyError("pop from empty trace queue")
 
 
-class SortedSet(object):
-    '''A set-like object where pop() returns items in sorted order'''
-
-    def __init__(self, items=None, key=None):
-        self.items = []            # for ordered retrieval
-        self.key = key             # key function for sorting
-        if items is not None:
-            for item in items:
-                self.add(item)
-
-    def __len__(self):
-        return len(self.items)
-
-    def __contains__(self, item):
-        return item in self.items
-
-    def __iter__(self):
-        return iter(self.items)
-
-    def __eq__(self, other):
-        return sorted(other) == self.items
-
-    def add(self, item):
-        if item not in self.items:
-            self.items.append(item)
-            self.items.sort(key=self.key)
-
-    def remove(self, item):
-        try:
-            self.items.remove(item)
-        except ValueError:
-            raise KeyError(item)
-
-    def pop(self):
-        try:
-            return self.items.pop(0)
-        except IndexError:
-            raise KeyError("pop from empty SortedSet")
-
-
 Unknown = object()
 
 
 class ProcessorState(object):
-    __slots__ = ('pc')
+    '''The program counter and what is known of the register bank and of
+    the registers (see uPD78k2.registers), None meaning unknown'''
+    __slots__ = ('pc', 'bank', 'regs')
 
-    def __init__(self, pc=Unknown):
+    def __init__(self, pc=Unknown, bank=None, regs=registers.UNKNOWN_REGISTERS):
         self.pc = pc  # program counter
+        self.bank = bank
+        self.regs = regs
 
     def __repr__(self):
         return "<ProcessorState %s>" % str(self)
 
     def __str__(self):
         pc = "    " if self.pc is Unknown else "%04x" % self.pc
-        return "pc=%s" % pc
+        text = "pc=%s" % pc
+        if self.bank is not None:
+            text += " rb=%d" % self.bank
+        for name, value in zip(registers.REGISTER_NAMES, self.regs):
+            if value is not None:
+                text += " %s=%02x" % (name, value)
+        return text
 
     def __eq__(self, other):
-        return self.pc == other.pc
+        return (self.pc == other.pc and self.bank == other.bank and
+                self.regs == other.regs)
 
     def __hash__(self):
-        return hash(self.pc)
+        return hash((self.pc, self.bank, self.regs))
 
     def copy(self):
-        return ProcessorState(pc=self.pc)
+        return ProcessorState(pc=self.pc, bank=self.bank, regs=self.regs)
+
+    def join(self, states):
+        '''Return the state at this pc keeping only what this state and
+        all of states agree on'''
+        bank, regs = self.bank, self.regs
+        for state in states:
+            bank, regs = registers.join(bank, regs, state.bank, state.regs)
+        return ProcessorState(pc=self.pc, bank=bank, regs=regs)
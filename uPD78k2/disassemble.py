@@ -1,3 +1,5 @@
+from array import array
+
 
 class IllegalInstructionError(Exception):
     pass
@@ -12,21 +14,72 @@ class FlowTypes(object):
     SubroutineCall = 5
     SubroutineReturn = 6
 
+class XrefKinds(object):
+    '''How a cross reference uses its address'''
+    Call = 0
+    Jump = 1
+    Read = 2
+    Vector = 3
+    Write = 4   # including bit and read-modify-write operations
+
+# the data xref kinds
+DATA_XREF_KINDS = (XrefKinds.Read, XrefKinds.Write)
+
 class ArgumentTypes(object):
-    ReferencedAddress = 1
+    ReadAddress = 1
     TargetAddress = 2
+    WrittenAddress = 3
+    ModifiedAddress = 4     # read and written
+
+# the XrefKinds of the data addresses of each ArgumentTypes
+ARGUMENT_XREF_KINDS = {
+    ArgumentTypes.ReadAddress: (XrefKinds.Read, ),
+    ArgumentTypes.WrittenAddress: (XrefKinds.Write, ),
+    ArgumentTypes.ModifiedAddress: (XrefKinds.Read, XrefKinds.Write),
+}
 
 class Instruction(object):
-    def __init__(self, asm, asm_args, flow_type, opcode, operands):
-        self.asm = asm
+    '''A decoded instruction.  Its text is only built when rendered:
+    template is the constant format string of the instruction form, shared
+    by all its decodes.  asm_args holds (address, ArgumentTypes) pairs with
+    integer addresses, substituted into the first {n} fields of template,
+    and values holds the other operands (registers, immediates...), in the
+    following fields.'''
+    __slots__ = ('template', 'values', 'asm_args', 'flow_type', 'opcode',
+                 'operands', 'target_address', 'referenced_addresses')
+
+    def __init__(self, template, values, asm_args, flow_type, opcode,
+                 operands):
+        self.template = template
+        self.values = values
         self.asm_args = asm_args
         self.flow_type = flow_type
         self.opcode = opcode
         self.operands = operands
 
+        # the branch target address, or None if instruction cannot branch
+        self.target_address = None
+
+        # all addresses that are read, written, or branched by the
+        # instruction.  For indirect or relative addresses, only the
+        # target is returned.
+        referenced = ()
+        for address, arg_type in asm_args:
+            if arg_type == ArgumentTypes.TargetAddress:
+                self.target_address = address
+            else:
+                referenced += (address, )
+        self.referenced_addresses = referenced
+
     def __len__(self):
         return len(self.opcode) + len(self.operands)
 
+    @property
+    def asm(self):
+        '''The text with {n} fields left for the addresses'''
+        fields = ['{%d}' % i for i in range(len(self.asm_args))]
+        return self.template.format(*fields, *self.values)
+
     def __str__(self):
         return self.asm
 
@@ -35,41 +88,26 @@ class Instruction(object):
             symbols = {}  # address: (name, comment)
 
         addresses = []
-        for a, _ in self.asm_args:
-            address = eval('0x'+a)
+        for address, _ in self.asm_args:
             if address in symbols:
                 name, comment = symbols[address]
                 addresses.append(name)
             else:
                 addresses.append(address)
 
-        return self.asm.format(*addresses)
+        return self.template.format(*addresses, *self.values)
+
+    def render(self, names):
+        '''Return the text with the addresses found in names (address: name)
+        replaced by their name'''
+        return self.template.format(
+            *[names.get(address, address) for address, _ in self.asm_args],
+            *self.values)
 
     @property
     def all_bytes(self):
         return list(self.opcode) + list(self.operands)
 
-    @property
-    def referenced_addresses(self):
-        '''Return all addresses that are read, written, or branched
-        by the instruction.  For indirect or relative addresses, only
-        the target is returned.'''
-        addresses = []
-        for address, arg_type in self.asm_args:
-            if arg_type == ArgumentTypes.ReferencedAddress:
-                addresses.append(eval('0x'+address))
-
-        return addresses
-
-    @property
-    def target_address(self):
-        '''Return the branch target address, or None if instruction cannot branch'''
-        for address, arg_type in self.asm_args:
-            if arg_type == ArgumentTypes.TargetAddress:
-                return eval('0x'+address)
-
-        return None
-
 def _reg(opcode):
     r = opcode & 0b111
     return ('X', 'A', 'C', 'B', 'E', 'D', 'L', 'H')[r]
@@ -99,14 +137,14 @@ def _mem_indirect(mem):
 def _mem_base(mem):
     mem = mem & 0b111
     try:
-        return ('[DE+0x%02x]', '[SP+0x%02x]', '[HL+0x%02x]')[mem]
+        return ('DE', 'SP', 'HL')[mem]
     except IndexError as exc:
         raise IllegalInstructionError("Illegal mem for adressing mode") from exc
 
 def _mem_indexed(mem):
     mem = mem & 0b111
     try:
-        return ('0x%04x [DE]', '0x%04x [A]', '0x%04x [HL]', '0x%04x [B]')[mem]
+        return ('DE', 'A', 'HL', 'B')[mem]
     except IndexError as exc:
         raise IllegalInstructionError("Illegal mem for adressing mode") from exc
         
@@ -124,6 +162,13 @@ def _math_ops(opcode):
     op = opcode & 0x07
     return ("ADD", "ADDC", "SUB", "SUBC", "AND", "XOR", "OR", "CMP")[op]
 
+def _math_destination(opcode):
+    '''Return the ArgumentTypes of the destination of an 8-bit ALU
+    operation: CMP only reads it'''
+    if (opcode & 0x07) == 0x07:
+        return ArgumentTypes.ReadAddress
+    return ArgumentTypes.ModifiedAddress
+
 def _math_opsW(opcode):
     op = opcode & 0x03
     return ("ADDW", "ADDW", "SUBW", "CMPW")[op]
@@ -137,941 +182,1243 @@ def _addr16p(low, high):
         raise IllegalInstructionError("addr16p must be an even address")
     return addr16p
 
-def _I8(param):
-    return  "%02x" % param
-
-def _I11(param):
-    return  "%03x" % param
+def _rel(pc, length, disp):
+    return (pc + length + (disp & 0x7f) - (disp & 0x80)) & 0xFFFF
+
+def _build_table(forms):
+    '''Build a 256-entry dispatch table from (mask, value, handler) forms.
+    Forms are matched in order and the first match wins, so a byte that
+    matches several forms is decoded by the earliest one.'''
+    table = []
+    for byte in range(256):
+        for mask, value, handler in forms:
+            if (byte & mask) == value:
+                break
+        else:
+            handler = _illegal
+        table.append(handler)
+    return table
 
-def _I16(param):
-    return  "%04x" % param
+def _second_level(table):
+    '''Dispatch on the byte following the opcode'''
+    def dispatch(rom, pc, opcodes, mem_prefix):
+        return table[rom[pc+1]](rom, pc, opcodes, mem_prefix)
+    return dispatch
 
 def disassemble(rom, pc):
-    inst = None
-
-    asm_args = ()
-    flow_type=FlowTypes.Continue
-    opcodes = [rom[pc]]
-    operands=()
-    
-    mem_prefix=''
-    if opcodes[0] == 0x01: #FIXME: should check for illegal usage of 0x1
+    opcode = rom[pc]
+    if opcode == 0x01: #FIXME: should check for illegal usage of 0x1
         pc = pc + 1
-        opcodes.append(rom[pc])
-        mem_prefix='&'
-
-    # NOP
-    if rom[pc] == 0b00000000:
-        asm = "nop"
-
-    # MOV STBC, #byte
-    elif (rom[pc] == 0b00001001) and (rom[pc+1] == 0b11000000):
-        byte = _I8(rom[pc+3])
-        asm = f"MOV STBC, #{byte}"
-        operands=(rom[pc+1], rom[pc+2], rom[pc+3])
-
-    # SEL RBn
-    elif (rom[pc] == 0b00000101) and ((rom[pc+1] & 0xfc) == 0b10101000):
-        bank = rom[pc+1] & 0x03
-        asm = f"SEL RB{bank}"
-        operands=(rom[pc+1], )
-
-    # EI/DI
-    elif (rom[pc] & 0xfe) == 0b01001010:
-        asm = ("DI", "EI")[rom[pc] & 0x01]
-    
-    # MOV r, #byte
-    elif (rom[pc] & 0xf8) == 0b10111000:
-        r = _reg(rom[pc])
-        byte = _I8(rom[pc+1])
-        asm = f"MOV {r}, #{byte}"
-        operands=(rom[pc+1],)
-
-    # MOV saddr, #byte
-    elif rom[pc] == 0b00111010:
-        saddr = _I16(_saddr(rom[pc+1]))
-        byte = _I8(rom[pc+2])
-        asm = f"MOV {{0}}, #{byte}"
-        asm_args = (
-            (saddr, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
-
-    # MOV sfr, #byte
-    elif rom[pc] == 0b00101011:
-        sfr  = _I16(_sfr(rom[pc+1]))
-        byte = _I8(rom[pc+2])
-        asm = f"MOV {{0}}, #{byte}"
-        asm_args = (
-            (sfr, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
+        return _PREFIX_01_TABLE[rom[pc]](rom, pc, [opcode, rom[pc]], '&')
+    return _OPCODE_TABLE[opcode](rom, pc, [opcode], '')
+
+# DecodedImage.targets value of instructions without a static target
+NO_TARGET = -1
+
+def decode_all(rom, disassemble_func=disassemble):
+    '''Speculatively decode every address of the image'''
+    image = DecodedImage(rom, disassemble_func)
+    for pc in range(len(rom)):
+        image.decode(pc)
+    return image
+
+class DecodedImage(object):
+    '''The decode of the addresses of a ROM image, stored as parallel arrays
+    indexed by address.  The image starts empty: an address is only decoded
+    by decode(), once, and decoded[a] tells whether address a is.  The
+    target is NO_TARGET for instructions without a static branch target
+    (including BR rp and CALL rp).  An instruction running past the end of
+    the image is given the length that reaches the end of the image.  The
+    Instruction objects decoded are kept for instruction().'''
+
+    def __init__(self, rom, disassemble_func=disassemble):
+        self.rom = rom
+        self.disassemble_func = disassemble_func
+
+        size = len(rom)
+        self.lengths = bytearray(size)
+        self.flow_types = bytearray(size)
+        self.illegal = bytearray(size)
+        self.targets = array('l', [NO_TARGET]) * size
+        self.decoded = bytearray(size)
+        self.instructions = {}  # address: Instruction
+        self.count = 0  # number of addresses decoded
+
+    def decode(self, pc):
+        '''Decode the address pc into the arrays and return its Instruction,
+        or None if it is illegal or runs past the end of the image'''
+        inst = None
+        try:
+            inst = self.disassemble_func(self.rom, pc)
+        except IllegalInstructionError:
+            self.illegal[pc] = 1
+        except IndexError:
+            self.lengths[pc] = len(self.lengths) - pc
+        else:
+            self.lengths[pc] = len(inst)
+            self.flow_types[pc] = inst.flow_type
+            if inst.target_address is not None:
+                self.targets[pc] = inst.target_address
+            self.instructions[pc] = inst
+        self.decoded[pc] = 1
+        self.count += 1
+        return inst
 
-    # MOV r, r’
-    elif (rom[pc] == 0b00100100) and ((rom[pc+1] & 0x88) == 0x00):
+    def __len__(self):
+        return self.count
+
+    def instruction(self, pc):
+        '''Return the Instruction object decoded at pc'''
+        if not self.decoded[pc]:
+            return self.decode(pc)
+        return self.instructions.get(pc)
+
+    def target_address(self, pc):
+        target = self.targets[pc]
+        return None if target == NO_TARGET else target
+
+def _illegal(rom, pc, opcodes, mem_prefix):
+    raise IllegalInstructionError(f"Illegal opcode 0x{rom[pc]:02x} at 0x{pc:04x}")
+
+# NOP
+def _nop(rom, pc, opcodes, mem_prefix):
+    return Instruction(template="nop", values=(),
+                       asm_args=(), flow_type=FlowTypes.Continue,
+                       opcode=opcodes, operands=())
+
+# MOV STBC, #byte
+def _mov_stbc_byte(rom, pc, opcodes, mem_prefix):
+    byte = rom[pc+3]
+    return Instruction(template="MOV STBC, #{0:02x}",
+                       values=(byte,), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2], rom[pc+3]))
+
+# SEL RBn
+def _sel_rb(rom, pc, opcodes, mem_prefix):
+    bank = rom[pc+1] & 0x03
+    return Instruction(template="SEL RB{0}", values=(bank,), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# EI/DI
+def _di_ei(rom, pc, opcodes, mem_prefix):
+    template = ("DI", "EI")[rom[pc] & 0x01]
+    return Instruction(template=template, values=(), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=())
+
+# MOV r, #byte
+def _mov_r_byte(rom, pc, opcodes, mem_prefix):
+    r = _reg(rom[pc])
+    byte = rom[pc+1]
+    return Instruction(template="MOV {0}, #{1:02x}",
+                       values=(r, byte), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# MOV saddr, #byte
+def _mov_saddr_byte(rom, pc, opcodes, mem_prefix):
+    saddr = _saddr(rom[pc+1])
+    byte = rom[pc+2]
+    asm_args = (
+        (saddr, ArgumentTypes.WrittenAddress),
+    )
+    return Instruction(template="MOV {0}, #{1:02x}",
+                       values=(byte,), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# MOV sfr, #byte
+def _mov_sfr_byte(rom, pc, opcodes, mem_prefix):
+    sfr = _sfr(rom[pc+1])
+    byte = rom[pc+2]
+    asm_args = (
+        (sfr, ArgumentTypes.WrittenAddress),
+    )
+    return Instruction(template="MOV {0}, #{1:02x}",
+                       values=(byte,), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# MOV r, r’ and MOVW rp, rp’
+def _mov_r_r(rom, pc, opcodes, mem_prefix):
+    if (rom[pc+1] & 0x88) == 0x00:
         rp = _reg(rom[pc+1])
         r = _reg(rom[pc+1] >> 4)
-        asm = f"MOV {r}, {rp}"
-        operands=(rom[pc+1],)
-
-    # MOV A, r
-    elif (rom[pc] & 0xf8) == 0b11010000:
-        r = _reg(rom[pc])
-        asm = f"MOV A, {r}"
-
-    # MOV A, saddr
-    elif rom[pc] == 0b00100000:
-        saddr  = _I16(_saddr(rom[pc+1]))
-        asm = f"MOV A, {{0}}"
-        asm_args = (
-            (saddr, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1],)
-
-    # MOV saddr, A
-    elif rom[pc] == 0b00100010:
-        saddr = _I16(_saddr(rom[pc+1]))
-        asm = f"MOV {{0}}, A"
-        asm_args = (
-            (saddr, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1],)
-
-    # MOV A, sfr
-    elif rom[pc] == 0b00010000:
-        sfr  = _I16(_sfr(rom[pc+1]))
-        asm = f"MOV A, {{0}}"
-        asm_args = (
-            (sfr, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1],)
-
-    # MOV sfr, A
-    elif rom[pc] == 0b00010010:
-        sfr  = _I16(_sfr(rom[pc+1]))
-        asm = f"MOV {{0}}, A"
-        asm_args = (
-            (sfr, ArgumentTypes.ReferencedAddress),
-        )
+        template = "MOV {0}, {1}"
+    elif (rom[pc+1] & 0x99) == 0x08:
+        rp = _regpair(rom[pc+1])
+        r = _regpair(rom[pc+1] >> 4)
+        template = "MOVW {0}, {1}"
+    else:
+        return _illegal(rom, pc, opcodes, mem_prefix)
+    return Instruction(template=template, values=(r, rp), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# MOV A, r
+def _mov_a_r(rom, pc, opcodes, mem_prefix):
+    r = _reg(rom[pc])
+    return Instruction(template="MOV A, {0}", values=(r,), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=())
+
+# MOV A, saddr
+def _mov_a_saddr(rom, pc, opcodes, mem_prefix):
+    saddr = _saddr(rom[pc+1])
+    asm_args = (
+        (saddr, ArgumentTypes.ReadAddress),
+    )
+    return Instruction(template="MOV A, {0}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# MOV saddr, A
+def _mov_saddr_a(rom, pc, opcodes, mem_prefix):
+    saddr = _saddr(rom[pc+1])
+    asm_args = (
+        (saddr, ArgumentTypes.WrittenAddress),
+    )
+    return Instruction(template="MOV {0}, A", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# MOV A, sfr
+def _mov_a_sfr(rom, pc, opcodes, mem_prefix):
+    sfr = _sfr(rom[pc+1])
+    asm_args = (
+        (sfr, ArgumentTypes.ReadAddress),
+    )
+    return Instruction(template="MOV A, {0}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# MOV sfr, A
+def _mov_sfr_a(rom, pc, opcodes, mem_prefix):
+    sfr = _sfr(rom[pc+1])
+    asm_args = (
+        (sfr, ArgumentTypes.WrittenAddress),
+    )
+    return Instruction(template="MOV {0}, A", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# MOV saddr, saddr’
+def _mov_saddr_saddr(rom, pc, opcodes, mem_prefix):
+    saddrp = _saddr(rom[pc+1])
+    saddr  = _saddr(rom[pc+2])
+    asm_args = (
+        (saddr, ArgumentTypes.WrittenAddress),
+        (saddrp, ArgumentTypes.ReadAddress),
+    )
+    return Instruction(template="MOV {0}, {1}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# MOV A, mem and MOV A, &mem (short 1/2B code)
+def _mov_a_mem_short(rom, pc, opcodes, mem_prefix):
+    return Instruction(template="MOV A, {0}{1}",
+                       values=(mem_prefix, _mem_indirect(rom[pc])),
+                       asm_args=(), flow_type=FlowTypes.Continue,
+                       opcode=opcodes, operands=())
+
+# MOV mem, A and MOV &mem, A (short 1/2B code)
+def _mov_mem_a_short(rom, pc, opcodes, mem_prefix):
+    return Instruction(template="MOV {0}{1}, A",
+                       values=(mem_prefix, _mem_indirect(rom[pc])),
+                       asm_args=(), flow_type=FlowTypes.Continue,
+                       opcode=opcodes, operands=())
+
+def _mem(rom, pc):
+    '''Return the addressing (0 for indirect, 1 for based and 2 for
+    indexed), the operand values and the operand bytes of a 0x16, 0x06 or
+    0x0a mem instruction'''
+    if rom[pc] == 0b00010110:
+        addressing = 0
+        values = (_mem_indirect(rom[pc+1] >> 4), )
         operands=(rom[pc+1],)
-
-    # MOV saddr, saddr’
-    elif rom[pc] == 0b00111000:
-        saddrp = _I16(_saddr(rom[pc+1]))
-        saddr  = _I16(_saddr(rom[pc+2]))
-        asm = f"MOV {{0}}, {{1}}"
-        asm_args = (
-            (saddr, ArgumentTypes.ReferencedAddress),
-            (saddrp, ArgumentTypes.ReferencedAddress),
-        )
+    elif rom[pc] == 0b00000110:
+        addressing = 1
+        values = (_mem_base(rom[pc+1] >> 4), rom[pc+2])
         operands=(rom[pc+1], rom[pc+2])
+    else:
+        addressing = 2
+        values = (_mem_indexed(rom[pc+1] >> 4), _addr16p(rom[pc+2], rom[pc+3]))
+        operands=(rom[pc+1], rom[pc+2], rom[pc+3])
+    return addressing, values, operands
+
+def _mem_templates(text, field):
+    '''Return the templates of a mem instruction form for each addressing
+    of _mem().  The mem operand replaces the %s of text and its values
+    are in fields field and field+1.'''
+    return (
+        text % ('{%d}' % field),
+        text % ('[{%d}+0x{%d:02x}]' % (field, field + 1)),
+        text % ('0x{%d:04x} [{%d}]' % (field + 1, field)),
+    )
+
+# MOV A, mem and MOV A, &mem
+_MOV_A_MEM = _mem_templates("MOV A, {0}%s", 1)
+
+def _mov_a_mem(rom, pc, opcodes, mem_prefix):
+    addressing, values, operands = _mem(rom, pc)
+    return Instruction(template=_MOV_A_MEM[addressing],
+                       values=(mem_prefix, ) + values, asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=operands)
 
-    # MOV A, mem and MOV A, &mem (short 1/2B code)
-    elif ((rom[pc] & 0xf8) == 0b01011000) and ((rom[pc] & 0x07) < 6):
-        asm = f"MOV A, {mem_prefix}{_mem_indirect(rom[pc])}"
-
-    # MOV A, mem and MOV A, &mem
-    elif rom[pc] in (0b00010110, 0b00000110, 0b00001010) and ((rom[pc+1] & 0x8f) == 0b00000000):
-        if rom[pc] == 0b00010110:
-            mem = _mem_indirect(rom[pc+1] >> 4)
-            operands=(rom[pc+1],)
-        elif rom[pc] == 0b00000110:
-            mem = _mem_base(rom[pc+1] >> 4) % rom[pc+2]
-            operands=(rom[pc+1], rom[pc+2])
-        elif rom[pc] == 0b00001010:
-            mem = _mem_indexed(rom[pc+1] >> 4) % _addr16p(rom[pc+2], rom[pc+3])
-            operands=(rom[pc+1], rom[pc+2], rom[pc+3])
-        else:
-            raise IllegalInstructionError(f"Illegal opcode 0x{rom[pc]:02x} at 0x{pc:04x}")
-        asm = f"MOV A, {mem_prefix}{mem}"
-
-    # MOV mem, A and MOV &mem, A (short 1/2B code)
-    elif ((rom[pc] & 0xf8) == 0b01010000) and ((rom[pc] & 0x07) < 6):
-        asm = f"MOV {mem_prefix}{_mem_indirect(rom[pc])}, A"
-
-    # MOV mem, A and MOV &mem, A
-    elif rom[pc] in (0b00010110, 0b00000110, 0b00001010)  and ((rom[pc+1] & 0x8f) == 0b10000000):
-        if rom[pc] == 0b00010110:
-            mem = _mem_indirect(rom[pc+1] >> 4)
-            operands=(rom[pc+1],)
-        elif rom[pc] == 0b00000110:
-            mem = _mem_base(rom[pc+1] >> 4) % rom[pc+2]
-            operands=(rom[pc+1], rom[pc+2])
-        elif rom[pc] == 0b00001010:
-            mem = _mem_indexed(rom[pc+1] >> 4) % _addr16p(rom[pc+2], rom[pc+3])
-            operands=(rom[pc+1], rom[pc+2], rom[pc+3])
-        else:
-            raise IllegalInstructionError(f"Illegal opcode 0x{rom[pc]:02x} at 0x{pc:04x}")
-        asm = f"MOV {mem_prefix}{mem}, A"
-
-    # MOV A, !addr16 and MOV A, &!addr16
-    elif (rom[pc] == 0b00001001) and (rom[pc+1] == 0b11110000):
-        addr16 = _I16(_addr16(rom[pc+2], rom[pc+3]))
-        asm = f"MOV A, {mem_prefix}!{addr16}"
-        opcodes.append(rom[pc+1])
-        operands=(rom[pc+2], rom[pc+3])
-
-    # MOV !addr16, A and MOV &!addr16, A
-    elif (rom[pc] == 0b00001001) and (rom[pc+1] == 0b11110001):
-        addr16 = _I16(_addr16(rom[pc+2], rom[pc+3]))
-        asm = f"MOV {mem_prefix}!{addr16}, A"
-        opcodes.append(rom[pc+1])
-        operands=(rom[pc+2], rom[pc+3])
-
-    # MOV PSW, #byte
-    elif (rom[pc] == 0b00101011) and (rom[pc+1] == 0b11111110):
-        byte = _I8(rom[pc+2])
-        asm = f"MOV PSW, {byte}"
-        opcodes.append(rom[pc+1])
-        operands=(rom[pc+2],)
-
-    # MOV PSW, A
-    elif (rom[pc] == 0b00010010) and (rom[pc+1] == 0b11111110):
-        asm = "MOV PSW, A"
-        opcodes.append(rom[pc+1])
-
-    # MOV A, PSW
-    elif (rom[pc] == 0b00010000) and (rom[pc+1] == 0b11111110):
-        asm = "MOV A, PSW"
-        opcodes.append(rom[pc+1])
-
-    # XCH r, r’
-    elif (rom[pc] == 0b00100101) and ((rom[pc+1] & 0x88) == 0x00):
-        rp = _reg(rom[pc+1])
-        r = _reg(rom[pc+1] >> 4)
-        asm = f"XCH {r}, {rp}"
-        operands=(rom[pc+1],)
-
-    # XCH A, r
-    elif (rom[pc] & 0xf8) == 0b11011000:
-        r = _reg(rom[pc])
-        asm = f"XCH A, {r}"
-
-    # XCH A, saddr and XCH A, sfr
-    elif rom[pc] == 0b00100001:
-        if opcodes[0] == 0b00000001:
-            sfr = _I16(_sfr(rom[pc+1]))
-            asm = f"XCH A, {{0}}"
-            asm_args = (
-                (sfr, ArgumentTypes.ReferencedAddress),
-            )
-        else:
-            saddr = _I16(_saddr(rom[pc+1]))
-            asm = f"XCH A, {{0}}"
-            asm_args = (
-                (saddr, ArgumentTypes.ReferencedAddress),
-            )
-        operands=(rom[pc+1],)
+# MOV mem, A and MOV &mem, A
+_MOV_MEM_A = _mem_templates("MOV {0}%s, A", 1)
 
-    # XCH saddr, saddr’
-    elif rom[pc] == 0b00111001:
-        saddrp = _I16(_saddr(rom[pc+1]))
-        saddr  = _I16(_saddr(rom[pc+2]))
-        asm = f"XCH {{0}}, {{1}}"
-        asm_args = (
-            (saddr , ArgumentTypes.ReferencedAddress),
-            (saddrp, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
+def _mov_mem_a(rom, pc, opcodes, mem_prefix):
+    addressing, values, operands = _mem(rom, pc)
+    return Instruction(template=_MOV_MEM_A[addressing],
+                       values=(mem_prefix, ) + values, asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=operands)
 
-    # XCH A, mem and XCH A, &mem
-    elif rom[pc] in (0b00010110, 0b00000110, 0b00001010) and ((rom[pc+1] & 0x8f) == 0b00000100):
-        if rom[pc] == 0b00010110:
-            mem = _mem_indirect(rom[pc+1] >> 4)
-            operands=(rom[pc+1],)
-        elif rom[pc] == 0b00000110:
-            mem = _mem_base(rom[pc+1] >> 4) % rom[pc+2]
-            operands=(rom[pc+1], rom[pc+2])
-        elif rom[pc] == 0b00001010:
-            mem = _mem_indexed(rom[pc+1] >> 4) % _addr16p(rom[pc+2], rom[pc+3])
-            operands=(rom[pc+1], rom[pc+2], rom[pc+3])
-        else:
-            raise IllegalInstructionError(f"Illegal opcode 0x{rom[pc]:02x} at 0x{pc:04x}")
-        asm = f"XCH A, {mem_prefix}{mem}"
-
-    # MOVW rp, #word
-    elif (rom[pc] & 0xf8) == 0b01100000:
-        rp = _regpair(rom[pc])
-        word = _I16(_addr16(rom[pc+1], rom[pc+2]))
-        asm = f"MOVW {rp}, #{word}"
-        operands=(rom[pc+1], rom[pc+2])
+# MOV A, !addr16 and MOV A, &!addr16
+def _mov_a_addr16(rom, pc, opcodes, mem_prefix):
+    addr16 = _addr16(rom[pc+2], rom[pc+3])
+    opcodes.append(rom[pc+1])
+    return Instruction(template="MOV A, {0}!{1:04x}",
+                       values=(mem_prefix, addr16), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+2], rom[pc+3]))
+
+# MOV !addr16, A and MOV &!addr16, A
+def _mov_addr16_a(rom, pc, opcodes, mem_prefix):
+    addr16 = _addr16(rom[pc+2], rom[pc+3])
+    opcodes.append(rom[pc+1])
+    return Instruction(template="MOV {0}!{1:04x}, A",
+                       values=(mem_prefix, addr16), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+2], rom[pc+3]))
+
+# MOV PSW, #byte, MOV PSW, A and MOV A, PSW (0x2b/0x12/0x10 + 0xfe) are
+# decoded as MOV sfr, #byte / MOV sfr, A / MOV A, sfr with sfr=0xfffe
+
+# XCH r, r’
+def _xch_r_r(rom, pc, opcodes, mem_prefix):
+    if (rom[pc+1] & 0x88) != 0x00:
+        return _illegal(rom, pc, opcodes, mem_prefix)
+    rp = _reg(rom[pc+1])
+    r = _reg(rom[pc+1] >> 4)
+    return Instruction(template="XCH {0}, {1}", values=(r, rp), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# XCH A, r
+def _xch_a_r(rom, pc, opcodes, mem_prefix):
+    r = _reg(rom[pc])
+    return Instruction(template="XCH A, {0}", values=(r,), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=())
+
+# XCH A, saddr
+def _xch_a_saddr(rom, pc, opcodes, mem_prefix):
+    saddr = _saddr(rom[pc+1])
+    asm_args = (
+        (saddr, ArgumentTypes.ModifiedAddress),
+    )
+    return Instruction(template="XCH A, {0}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# XCH A, sfr
+def _xch_a_sfr(rom, pc, opcodes, mem_prefix):
+    sfr = _sfr(rom[pc+1])
+    asm_args = (
+        (sfr, ArgumentTypes.ModifiedAddress),
+    )
+    return Instruction(template="XCH A, {0}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# XCH saddr, saddr’
+def _xch_saddr_saddr(rom, pc, opcodes, mem_prefix):
+    saddrp = _saddr(rom[pc+1])
+    saddr  = _saddr(rom[pc+2])
+    asm_args = (
+        (saddr , ArgumentTypes.ModifiedAddress),
+        (saddrp, ArgumentTypes.ModifiedAddress),
+    )
+    return Instruction(template="XCH {0}, {1}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# XCH A, mem and XCH A, &mem
+_XCH_A_MEM = _mem_templates("XCH A, {0}%s", 1)
+
+def _xch_a_mem(rom, pc, opcodes, mem_prefix):
+    addressing, values, operands = _mem(rom, pc)
+    return Instruction(template=_XCH_A_MEM[addressing],
+                       values=(mem_prefix, ) + values, asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=operands)
 
-    # MOVW saddrp, #word
-    elif rom[pc] == 0b00001100:
-        saddrp = _I16(_saddr(rom[pc+1]))
-        word = _I16(_addr16(rom[pc+2], rom[pc+3]))
-        asm = f"MOVW {{0}}, #{word}"
+# MOVW rp, #word
+def _movw_rp_word(rom, pc, opcodes, mem_prefix):
+    rp = _regpair(rom[pc])
+    word = _addr16(rom[pc+1], rom[pc+2])
+    return Instruction(template="MOVW {0}, #{1:04x}",
+                       values=(rp, word), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# MOVW saddrp, #word
+def _movw_saddrp_word(rom, pc, opcodes, mem_prefix):
+    saddrp = _saddr(rom[pc+1])
+    word = _addr16(rom[pc+2], rom[pc+3])
+    asm_args = (
+        (saddrp, ArgumentTypes.WrittenAddress),
+    )
+    return Instruction(template="MOVW {0}, #{1:04x}",
+                       values=(word,), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2], rom[pc+3]))
+
+# MOVW sfrp, #word and MOVW SP, #word
+def _movw_sfrp_word(rom, pc, opcodes, mem_prefix):
+    word = _addr16(rom[pc+2], rom[pc+3])
+    asm_args = ()
+    if rom[pc+1] == 0b11111100:
+        template = "MOVW SP, #{0:04x}"
+    else:
+        sfrp = _sfr(rom[pc+1])
+        template = "MOVW {0}, #{1:04x}"
         asm_args = (
-            (saddrp, ArgumentTypes.ReferencedAddress),
+            (sfrp, ArgumentTypes.WrittenAddress),
         )
-        operands=(rom[pc+1], rom[pc+2], rom[pc+3])
-
-    # MOVW sfrp, #word and MOVW SP, #word
-    elif rom[pc] == 0b00001011:
-        word = _I16(_addr16(rom[pc+2], rom[pc+3]))
-        if rom[pc+1] == 0b11111100:
-            asm = f"MOVW SP, #{word}"
+    return Instruction(template=template, values=(word,), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2], rom[pc+3]))
+
+# MOVW AX, saddrp
+def _movw_ax_saddrp(rom, pc, opcodes, mem_prefix):
+    saddrp = _saddr(rom[pc+1])
+    asm_args = (
+        (saddrp, ArgumentTypes.ReadAddress),
+    )
+    return Instruction(template="MOVW AX, {0}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# MOVW saddrp, AX
+def _movw_saddrp_ax(rom, pc, opcodes, mem_prefix):
+    saddrp = _saddr(rom[pc+1])
+    asm_args = (
+        (saddrp, ArgumentTypes.WrittenAddress),
+    )
+    return Instruction(template="MOVW {0}, AX", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# MOVW AX, sfrp/SP and MOVW sfrp/SP, AX
+def _movw_ax_sfrp(rom, pc, opcodes, mem_prefix):
+    asm_args = ()
+    if rom[pc+1] == 0b11111100:
+        template = "MOVW AX, SP" if (rom[pc] & 0x2) == 0 else "MOVW SP, AX"
+    else:
+        sfrp = _sfr(rom[pc+1])
+        if (rom[pc] & 0x2) == 0:
+            template = "MOVW AX, {0}"
+            arg_type = ArgumentTypes.ReadAddress
         else:
-            sfrp = _I16(_sfr(rom[pc+1]))
-            asm = f"MOVW {{0}}, #{word}"
-            asm_args = (
-                (sfrp, ArgumentTypes.ReferencedAddress),
-            )
-        operands=(rom[pc+1], rom[pc+2], rom[pc+3])
-
-    # MOVW r, r’
-    elif (rom[pc] == 0b00100100) and ((rom[pc+1] & 0x99) == 0x08):
-        rp = _regpair(rom[pc+1])
-        r = _regpair(rom[pc+1] >> 4)
-        asm = f"MOVW {r}, {rp}"
-        operands=(rom[pc+1],)
-
-    # MOVW AX, saddrp
-    elif rom[pc] == 0b00011100:
-        saddrp = _I16(_saddr(rom[pc+1]))
-        asm = f"MOVW AX, {{0}}"
+            template = "MOVW {0}, AX"
+            arg_type = ArgumentTypes.WrittenAddress
         asm_args = (
-            (saddrp, ArgumentTypes.ReferencedAddress),
+            (sfrp, arg_type),
         )
-        operands=(rom[pc+1],)
-
-    # MOVW saddrp, AX
-    elif rom[pc] == 0b00011010:
-        saddrp = _I16(_saddr(rom[pc+1]))
-        asm = f"MOVW {{0}}, AX"
-        asm_args = (
-            (saddrp, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1],)
-
-    # MOVW AX, sfrp/SP and MOVW sfrp/SP, AX
-    elif (rom[pc] & 0xfd) == 0b00010001:
-        if rom[pc+1] == 0b11111100:
-            asm = "MOVW AX, SP" if (rom[pc] & 0x2) == 0 else "MOVW SP, AX"
-        else:
-            sfrp = _I16(_sfr(rom[pc+1]))
-            asm = f"MOVW AX, {{0}}" if (rom[pc] & 0x2) == 0 else f"MOVW {{0}}, AX"
-            asm_args = (
-                (sfrp, ArgumentTypes.ReferencedAddress),
-            )
-        operands=(rom[pc+1],)
-
-    # MOVW AX, mem1
-    elif (rom[pc] == 0b00000101) and ((rom[pc+1] & 0xfe) == 0b11100010):
-        mem1 = _mem1(rom[pc+1])
-        asm = f"MOVW AX, {mem_prefix}{mem1}"
-        operands=(rom[pc+1],)
-
-    # MOVW mem1, AX
-    elif (rom[pc] == 0b00000101) and ((rom[pc+1] & 0xfe) == 0b11100110):
-        mem1 = _mem1(rom[pc+1])
-        asm = f"MOVW {mem_prefix}{mem1}, AX"
-        operands=(rom[pc+1],)
-
-    # ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP A, #byte
-    elif (rom[pc] & 0xf8) == 0b10101000:
-        op = _math_ops(rom[pc])
-        byte = _I8(rom[pc+1])
-        asm = f"{op} A, #{byte}"
-        operands=(rom[pc+1],)
-
-    # ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP saddr/sfr, #byte
-    elif (rom[pc] & 0xf8) == 0b01101000:
-        op = _math_ops(rom[pc])
-        byte = _I8(rom[pc+2])
-        if opcodes[0] == 0x01:
-            sfr = _I16(_sfr(rom[pc+1]))
-            asm_args = (
-                (sfr, ArgumentTypes.ReferencedAddress),
-            )
-        else:
-            saddr = _I16(_saddr(rom[pc+1]))
-            asm_args = (
-                (saddr, ArgumentTypes.ReferencedAddress),
-            )
-        asm = f"{op} {{0}}, #{byte}"
-        operands=(rom[pc+1], rom[pc+2])
-
-    # ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP r, r'
-    elif ((rom[pc] & 0xf8) == 0b10001000) and ((rom[pc+1] & 0x88) == 0x00):
+    return Instruction(template=template, values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# MOVW AX, mem1
+def _movw_ax_mem1(rom, pc, opcodes, mem_prefix):
+    mem1 = _mem1(rom[pc+1])
+    return Instruction(template="MOVW AX, {0}{1}",
+                       values=(mem_prefix, mem1), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# MOVW mem1, AX
+def _movw_mem1_ax(rom, pc, opcodes, mem_prefix):
+    mem1 = _mem1(rom[pc+1])
+    return Instruction(template="MOVW {0}{1}, AX",
+                       values=(mem_prefix, mem1), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP A, #byte
+def _alu_a_byte(rom, pc, opcodes, mem_prefix):
+    op = _math_ops(rom[pc])
+    byte = rom[pc+1]
+    return Instruction(template="{0} A, #{1:02x}",
+                       values=(op, byte), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+# ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP saddr/sfr, #byte
+def _alu_byte(rom, pc, opcodes, address):
+    op = _math_ops(rom[pc])
+    byte = rom[pc+2]
+    asm_args = (
+        (address, _math_destination(rom[pc])),
+    )
+    return Instruction(template="{1} {0}, #{2:02x}",
+                       values=(op, byte), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+def _alu_saddr_byte(rom, pc, opcodes, mem_prefix):
+    return _alu_byte(rom, pc, opcodes, _saddr(rom[pc+1]))
+
+def _alu_sfr_byte(rom, pc, opcodes, mem_prefix):
+    return _alu_byte(rom, pc, opcodes, _sfr(rom[pc+1]))
+
+# ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP r, r' and ADDW/SUBW/CMPW AX, rp
+def _alu_r_r(rom, pc, opcodes, mem_prefix):
+    if (rom[pc+1] & 0x88) == 0x00:
         op = _math_ops(rom[pc])
         rp = _reg(rom[pc+1])
         r = _reg(rom[pc+1] >> 4)
-        asm = f"{op} {r}, {rp}"
-        operands=(rom[pc+1], )
-
-    # ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP A, saddr/sfr
-    elif (rom[pc] & 0xf8) == 0b10011000:
-        op = _math_ops(rom[pc])
-        if opcodes[0] == 0x01:
-            sfr = _I16(_sfr(rom[pc+1]))
-            asm_args = (
-                (sfr, ArgumentTypes.ReferencedAddress),
-            )
-        else:
-            saddr = _I16(_saddr(rom[pc+1]))
-            asm_args = (
-                (saddr,  ArgumentTypes.ReferencedAddress),
-            )
-        asm = f"{op} A, {{0}}"
-        operands=(rom[pc+1],)
-
-    # ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP A, saddr/saddr'
-    elif (rom[pc] & 0xf8) == 0b01111000:
-        op = _math_ops(rom[pc])
-        saddrp = _I16(_saddr(rom[pc+1]))
-        saddr  = _I16(_saddr(rom[pc+2]))
-        asm = f"{op} {{0}}, {{1}}"
-        asm_args = (
-            (saddr, ArgumentTypes.ReferencedAddress),
-            (saddrp, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
-
-    # ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP A, mem and &mem
-    elif rom[pc] in (0b00010110, 0b00000110, 0b00001010) and ((rom[pc+1] & 0x88) == 0x08):
-        op = _math_ops(rom[pc+1])
-        if rom[pc] == 0b00010110:
-            mem = _mem_indirect(rom[pc+1] >> 4)
-            operands=(rom[pc+1],)
-        elif rom[pc] == 0b00000110:
-            mem = _mem_base(rom[pc+1] >> 4) % rom[pc+2]
-            operands=(rom[pc+1], rom[pc+2])
-        elif rom[pc] == 0b00001010:
-            mem = _mem_indexed(rom[pc+1] >> 4) % _addr16p(rom[pc+2], rom[pc+3])
-            operands=(rom[pc+1], rom[pc+2], rom[pc+3])
-        else:
-            raise IllegalInstructionError(f"Illegal opcode 0x{rom[pc]:02x} at 0x{pc:04x}")
-        asm = f"{op} A, {mem_prefix}{mem}"
-
-    # ADDW/SUBW/CMPW AX, #word
-    elif rom[pc] in (0b00101101, 0b00101110, 0b00101111):
-        op = _math_opsW(rom[pc])
-        word = _I16(_addr16(rom[pc+1], rom[pc+2]))
-        asm = f"{op} AX, #{word}"
-        operands=(rom[pc+1], rom[pc+2])
-
-    # ADDW/SUBW/CMPW AX, rp
+        template = "{0} {1}, {2}"
     elif rom[pc] in (0b10001000, 0b10001010, 0b10001111) and ((rom[pc+1] & 0xf9) == 0x08):
         op = _math_opsW(rom[pc])
         rp = _regpair(rom[pc+1])
-        asm = f"{op} AX, {rp}"
-        operands=(rom[pc+1], )
-
-    # ADDW/SUBW/CMPW AX, saddrp/sfrp
-    elif rom[pc] in (0b00011101, 0b00011110, 0b00011111):
-        op = _math_opsW(rom[pc])
-        if opcodes[0] == 0x01:
-            sfrp = _I16(_sfr(rom[pc+1]))
-            asm_args = (
-                (sfrp, ArgumentTypes.ReferencedAddress),
-            )
-        else:
-            saddrp = _I16(_saddr(rom[pc+1]))
-            asm_args = (
-                (saddrp, ArgumentTypes.ReferencedAddress),
-            )
-        asm = f"{op} AX, {{0}}"
-        operands=(rom[pc+1], )
-
-    # MULU and DIVUW rp
-    elif (rom[pc] == 0b00000101) and ((rom[pc+1] & 0xe8) == 0x08):
-        op = ("MULU", "DIVUW")[(rom[pc+1] >> 4) & 0x1]
-        rp = _reg(rom[pc+1])
-        asm = f"{op} {rp}"
-        operands=(rom[pc+1], )
-        
-    # INC/DEC r
-    elif (rom[pc] & 0xf0) == 0b11000000:
-        op = ("INC", "DEC")[(rom[pc] >> 3) & 0x1]
-        r = _reg(rom[pc])
-        asm = f"{op} {r}"
-
-    # INC/DEC saddr
-    elif (rom[pc] & 0xfe) == 0b00100110:
-        op = ("INC", "DEC")[rom[pc] & 0x1]
-        saddr = _I16(_saddr(rom[pc+1]))
-        asm = f"{op} {{0}}"
-        asm_args = (
-            (saddr, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1], )
-
-    # INCW/DECW rp
-    elif (rom[pc] & 0xf4) == 0b01000100:
-        op = ("INCW", "DECW")[(rom[pc] >> 3) & 0x1]
-        rp = _regpair(rom[pc] << 1)
-        asm = f"{op} {rp}"
-
-    # ROR/ROL/RORC/ROLC/SHR/SHL/SHRW/SHLW r, n
-    elif (rom[pc] & 0xfe) == 0b00110000:
-        ra = ((rom[pc+1] >> 6) & 0x03) + ((rom[pc] & 0x01) << 2)
-        op = ("RORC", "ROR", "SHR", "SHRW", "ROLC", "ROL", "SHL", "SHLW")[ra]
-        if (ra & 0x03) == 0x3:
-            r = _regpair(rom[pc+1])
-        else:
-            r = _reg(rom[pc+1])
-        n = (rom[pc+1] >> 3) & 0x07
-        asm = f"{op} {r}, {n:1d}"
-        operands=(rom[pc+1], )
-
-    # ROR4 et ROL4 mem1 and & mem1
-    elif (rom[pc] == 0b00000101) and ((rom[pc+1] & 0xed) == 0b10001100):
-        op = ("ROR4", "ROL4")[(rom[pc+1] >> 4) & 0x1]
-        mem1 = _mem1((rom[pc+1] >> 1) & 0x1)
-        asm = f"{op} {mem_prefix}{mem1}"
-        operands=(rom[pc+1])
-
-    # ADJBA/ADJBS
-    elif (rom[pc] & 0xfe) == 0b000001110:
-        asm = ("ADJBA", "ADJBS")[rom[pc] & 0x01]
-
-    # MOV1/AND1/OR1/XOR1 CY, saddr/sfr.bit
-    elif (rom[pc] == 0b00001000) and ((rom[pc+1] & 0x90) == 0b00000000):
-        op = ("MOV1", "AND1", "OR1", "XOR1")[(rom[pc+1] >> 5) & 0x03]
-        bit = rom[pc+1] & 0x7
-        if (rom[pc+1] & 0x08) == 0:
-            saddr = _I16(_saddr(rom[pc+2]))
-            asm_args = (
-                (saddr, ArgumentTypes.ReferencedAddress),
-            )
-        else:
-            sfr = _I16(_sfr(rom[pc+2]))
-            asm_args = (
-                (sfr, ArgumentTypes.ReferencedAddress),
-            )
-        asm = f"{op} CY, {{0}}.{bit:1d}"
-        operands=(rom[pc+1], rom[pc+2])
-
-    # MOV1 saddr/sfr.bit, CY
-    elif (rom[pc] == 0b00001000) and ((rom[pc+1] & 0xf0) == 0b00010000):
-        bit = rom[pc+1] & 0x7
-        if (rom[pc+1] & 0x08) == 0:
-            saddr = _I16(_saddr(rom[pc+2]))
-            asm_args = (
-                (saddr, ArgumentTypes.ReferencedAddress),
-            )
-        else:
-            sfr = _I16(_sfr(rom[pc+2]))
-            asm_args = (
-                (sfr, ArgumentTypes.ReferencedAddress),
-            )
-        asm = f"MOV1 {{0}}.{bit:1d}, CY"
-        operands=(rom[pc+1], rom[pc+2])
-
-    # AND1 CY, /saddr.bit or /sfr.bit
-    elif (rom[pc] == 0b00001000) and ((rom[pc+1] & 0xf0) == 0b00110000):
-        bit = rom[pc+1] & 0x7
-        if (rom[pc+1] & 0x08) == 0:
-            saddr = _I16(_saddr(rom[pc+2]))
-            asm_args = (
-                (saddr, ArgumentTypes.ReferencedAddress),
-            )
-        else:
-            sfr = _I16(_sfr(rom[pc+2]))
-            asm_args = (
-                (sfr, ArgumentTypes.ReferencedAddress),
-            )
-        asm = f"AND1 CY, /{{0}}.{bit:1d}, CY"
-        operands=(rom[pc+1], rom[pc+2])
-
-    # OR1 CY, /saddr.bit or /sfr.bit
-    elif (rom[pc] == 0b00001000) and ((rom[pc+1] & 0xf0) == 0b01010000):
-        bit = rom[pc+1] & 0x7
-        if (rom[pc+1] & 0x08) == 0:
-            saddr = _I16(_saddr(rom[pc+2]))
-            asm_args = (
-                (saddr, ArgumentTypes.ReferencedAddress),
-            )
-        else:
-            sfr = _I16(_sfr(rom[pc+2]))
-            asm_args = (
-                (sfr, ArgumentTypes.ReferencedAddress),
-            )
-        asm = f"OR1 CY, /{{0}}.{bit:1d}, CY"
-        operands=(rom[pc+1], rom[pc+2])
-
-    # NOT1 saddr.bit or sfr.bit
-    elif (rom[pc] == 0b00001000) and ((rom[pc+1] & 0xf0) == 0b01110000):
-        bit = rom[pc+1] & 0x7
-        if (rom[pc+1] & 0x08) == 0:
-            saddr = _I16(_saddr(rom[pc+2]))
-            asm_args = (
-                (saddr    , ArgumentTypes.ReferencedAddress),
-            )
-        else:
-            sfr = _I16(_sfr(rom[pc+2]))
-            asm_args = (
-                (sfr, ArgumentTypes.ReferencedAddress),
-            )
-        asm = f"NOT1 {{0}}.{bit:1d}"
-        operands=(rom[pc+1], rom[pc+2])
-
-    # SET1/CLR1 sfr.bit
-    elif (rom[pc] == 0b00001000) and ((rom[pc+1] & 0xe8) == 0b10001000):
-        op = ("SET1", "CLR1")[(rom[pc+1] >> 4) & 0x1]
-        sfr = _I16(_sfr(rom[pc+2]))
-        bit = rom[pc+1] & 0x7
-        asm = f"{op} {{0}}.{bit:1d}"
-        asm_args = (
-            (sfr, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
-
-    # MOV1/AND1/OR1/XOR1 CY, X.bit or A.bit
-    elif (rom[pc] == 0b00000011) and ((rom[pc+1] & 0x90) == 0b00000000):
-        op = ("MOV1", "AND1", "OR1", "XOR1")[(rom[pc+1] >> 5) & 0x03]
-        r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
-        bit = rom[pc+1] & 0x7
-        asm = f"{op} CY, {r}.{bit:1d}" % (op, r)
-        operands=(rom[pc+1], )
-
-    # MOV1 X.bit or A.bit, CY
-    elif (rom[pc] == 0b00000011) and ((rom[pc+1] & 0xf0) == 0b00010000):
-        r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
-        bit = rom[pc+1] & 0x7
-        asm = f"MOV1 {r}.{bit:1d}, CY"
-        operands=(rom[pc+1], )
-
-    # AND1 CY, /X.bit or /A.bit
-    elif (rom[pc] == 0b00000011) and ((rom[pc+1] & 0xf0) == 0b00110000):
-        r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
-        bit = rom[pc+1] & 0x7
-        asm = f"AND1 CY, /{r}.{bit:1d}"
-        operands=(rom[pc+1], )
-
-    # OR1 CY, /X.bit or /A.bit
-    elif (rom[pc] == 0b00000011) and ((rom[pc+1] & 0xf0) == 0b01010000):
-        r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
-        bit = rom[pc+1] & 0x7
-        asm = f"OR1 CY, /{r}.{bit:1d}"
-        operands=(rom[pc+1], )
-
-    # NOT1 X.bit or A.bit
-    elif (rom[pc] == 0b00000011) and ((rom[pc+1] & 0xf0) == 0b01110000):
-        r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
-        bit = rom[pc+1] & 0x7
-        asm = f"NOT1 {r}.{bit:1d}"
-        operands=(rom[pc+1], )
-
-    # SET1/CLR1 X.bit or A.bit
-    elif (rom[pc] == 0b00000011) and ((rom[pc+1] & 0xe0) == 0b10000000):
-        op = ("SET1", "CLR1")[(rom[pc+1] >> 4) & 0x1]
-        r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
-        bit = rom[pc+1] & 0x7
-        asm = f"{op} {r}.{bit:1d}"
-        operands=(rom[pc+1], )
-
-    # CLR1 CY
-    elif rom[pc] == 0b01000000:
-        asm = "CLR1 CY"
-
-    # SET1 CY
-    elif rom[pc] == 0b01000001:
-        asm = "SET1 CY"
-
-    # NOT1 CY
-    elif rom[pc] == 0b01000010:
-        asm = "NOT1 CY"
-
-    # SET1/CLR1 saddr.bit
-    elif ((rom[pc] & 0xe8) == 0b10100000):
-        op = ("CLR1", "SET1")[(rom[pc] >> 4) & 0x1]
-        saddr = _I16(_saddr(rom[pc+1]))
-        bit = rom[pc] & 0x7
-        asm = f"{op} {{0}}.{bit:1d}"
-        asm_args = (
-            (saddr, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1], )
-
-    # MOV1/AND1/OR1/XOR1 CY, PSW.bit
-    elif (rom[pc] == 0b00000010) and ((rom[pc+1] & 0x90) == 0b00000000):
-        op = ("MOV1", "AND1", "OR1", "XOR1")[(rom[pc+1] >> 5) & 0x03]
-        bit = rom[pc+1] & 0x7
-        asm = f"{op} CY, PSW.{bit:1d}"
-        operands=(rom[pc+1], )
-
-    # MOV1 PSW.bit, CY
-    elif (rom[pc] == 0b00000010) and ((rom[pc+1] & 0xf8) == 0b00010000):
-        bit = rom[pc+1] & 0x7
-        asm = f"MOV1 PSW.{bit:1d}, CY"
-        asm_args = (
-            (rom[pc+1] & 0x7, ArgumentTypes.AsIs),
-        )
-        operands=(rom[pc+1], )
-
-    # AND1 CY, /PSW.bit
-    elif (rom[pc] == 0b00000010) and ((rom[pc+1] & 0xf8) == 0b00110000):
-        bit = rom[pc+1] & 0x7
-        asm = f"AND1 CY, /PSW.{bit:1d}"
-        operands=(rom[pc+1], )
-
-    # OR1 CY, /PSW.bit
-    elif (rom[pc] == 0b00000010) and ((rom[pc+1] & 0xf8) == 0b01010000):
-        bit = rom[pc+1] & 0x7
-        asm = f"OR1 CY, /PSW.{bit:1d}"
-        operands=(rom[pc+1], )
-
-    # NOT1 PSW.bit
-    elif (rom[pc] == 0b00000010) and ((rom[pc+1] & 0xf8) == 0b01110000):
-        bit = rom[pc+1] & 0x7
-        asm = f"NOT1 PSW.{bit:1d}"
-        operands=(rom[pc+1], )
-
-    # SET1/CLR1 PSW.bit
-    elif (rom[pc] == 0b00000010) and ((rom[pc+1] & 0xe8) == 0b10000000):
-        op = ("SET1", "CLR1")[(rom[pc+1] >> 4) & 0x1]
-        bit = rom[pc+1] & 0x7
-        asm = f"{op} PSW.{bit:1d}"
-        operands=(rom[pc+1], )
-
-    # CALL !addr16
-    elif rom[pc] == 0b00101000:
-        flow_type = FlowTypes.SubroutineCall
-        target_address = _I16(_addr16(rom[pc+1], rom[pc+2]))
-        asm = f"CALL !{{0}}"
-        asm_args = (
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
-
-    # CALL rp
-    elif (rom[pc] == 0b00000101) and ((rom[pc+1] & 0xf8) == 0b01011000):
-        rp = _regpair(rom[pc+1])
-        asm = f"CALL {rp}"
-        operands=(rom[pc+1], )
-
-    # CALLF !addr11
-    elif ((rom[pc] & 0xf8) == 0b10010000):
-        flow_type = FlowTypes.SubroutineCall
-        target_address = _I11(0x0800 + rom[pc+1] + ((rom[pc] & 0x07) << 8))
-        asm = f"CALLF !{{0}}"
-        asm_args = (
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], )
-
-    # CALLT [addr5]
-    elif ((rom[pc] & 0xe0) == 0b11100000):
-        flow_type = FlowTypes.SubroutineCall
-        addr5 = rom[pc] & 0x1f
-        target_address = _I16(rom[0x0040 + addr5])
-        asm = f"CALLT [{addr5:02x}]:{{0}}"
-        asm_args = (
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-
-    # BRK/RET/RETI/RETB
-    elif ((rom[pc] & 0xf6) == 0b01010110):
-        flow_type = FlowTypes.Stop if (rom[pc] == 0b01011110) else FlowTypes.SubroutineReturn
-        asm = ("RET", "RETI", "BRK", "RETB")[((rom[pc] & 0x08) >> 2) + (rom[pc] & 0x01)]
-
-    # PUSH/POP rp
-    elif ((rom[pc] & 0xf4) == 0b00110100):
-        op = ("POP", "PUSH")[(rom[pc] >> 3) & 0x1]
-        rp = _regpair(rom[pc] << 1)
-        asm = f"{op} {rp}"
-
-    # PUSH/POP PSW
-    elif ((rom[pc] & 0xfe) == 0b01001000):
-        op = ("POP", "PUSH")[rom[pc] & 0x1]
-        asm = f"{op} PSW"
-
-    # PUSH sfr
-    elif rom[pc] == 0b00101001:
-        sfr = _I16(_sfr(rom[pc+1]))
-        asm = f"PUSH {{0}}"
-        asm_args = (
-            (sfr, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1], )
-
-    # POP sfr
-    elif rom[pc] == 0b01000011:
-        sfr = _I16(_sfr(rom[pc+1]))
-        asm = f"POP {{0}}"
-        asm_args = (
-            (sfr, ArgumentTypes.ReferencedAddress),
-        )
-        operands=(rom[pc+1], )
-
-    # INCW SP and DECW SP
-    elif (rom[pc] == 0b00000101) and ((rom[pc+1] & 0xfe) == 0b11001000):
-        op = ("INCW", "DECW")[rom[pc+1] & 0x1]
-        asm = f"{op} SP"
-        operands=(rom[pc+1], )
-
-    # BR !addr16
-    elif rom[pc] == 0b00101100:
-        flow_type = FlowTypes.UnconditionalJump
-        target_address = _I16(_addr16(rom[pc+1], rom[pc+2]))
-        asm = f"BR !{{0}}"
-        asm_args = (
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
-
-    # BR rp
-    elif (rom[pc] == 0b00000101) and ((rom[pc+1] & 0xf9) == 0b01001000):
-        rp = _regpair(rom[pc+1])
-        asm = f"BR !{rp}"
-        operands=(rom[pc+1], )
-
-    # BR $addr16
-    elif rom[pc] == 0b00010100:
-        flow_type = FlowTypes.UnconditionalJump
-        target_address = _I16(pc + 2 + (rom[pc+1] & 0x7f) - (rom[pc+1] & 0x80))
-        asm = f"BR ${{0}}"
-        asm_args = (
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], )
-
-    # BC/BL, BNC/BNL, BZ/BE, BNZ/BNE $addr16
-    elif (rom[pc] & 0xfc) == 0b10000000:
-        flow_type = FlowTypes.ConditionalJump
-        target_address = _I16(pc + 2 + (rom[pc+1] & 0x7f) - (rom[pc+1] & 0x80))
-        op = ("BNZ", "BZ", "BNC", "BC")[rom[pc] & 0x3]
-        asm = f"{op} ${{0}}"
-        asm_args = (
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], )
-
-    # BT saddr.bit, $addr16
-    elif (rom[pc] & 0xf8) == 0b01110000:
-        flow_type = FlowTypes.ConditionalJump
-        saddr = _I16(_saddr(rom[pc+1]))
-        bit = rom[pc] & 0x07
-        target_address = _I16(pc + 3 + (rom[pc+2] & 0x7f) - (rom[pc+2] & 0x80))
-        asm = f"BT {{0}}.{bit:1d}, ${{1}}"
-        asm_args = (
-            (saddr, ArgumentTypes.ReferencedAddress),
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
-
-    # BF saddr.bit, $addr16
-    elif (rom[pc] == 0b00001000) and ((rom[pc+1] & 0xe8) == 0b10100000):
-        flow_type = FlowTypes.ConditionalJump
-        op = ("BF", "BTCLR")[(rom[pc+1] >> 4) & 0x1]
-        saddr = _I16(_saddr(rom[pc+2]))
-        bit = rom[pc+1] & 0x07
-        target_address = _I16(pc + 4 + (rom[pc+3] & 0x7f) - (rom[pc+3] & 0x80))
-        asm = f"{op} {{0}}.{bit:1d}, ${{1}}"
-        asm_args = (
-            (saddr, ArgumentTypes.ReferencedAddress),
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2], rom[pc+3])
-
-    # BT or BF sfr.bit, $addr16
-    elif (rom[pc] == 0b00001000) and ((rom[pc+1] & 0xe8) == 0b10101000):
-        flow_type = FlowTypes.ConditionalJump
-        op = ("BF", "BT")[(rom[pc+1] >> 4) & 0x1]
-        sfr = _I16(_sfr(rom[pc+2]))
-        bit = rom[pc+1] & 0x07
-        target_address = _I16(pc + 4 + (rom[pc+3] & 0x7f) - (rom[pc+3] & 0x80))
-        asm = f"{op} {{0}}.{bit:1d}, ${{1}}"
-        asm_args = (
-            (sfr, ArgumentTypes.ReferencedAddress),
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2], rom[pc+3])
-
-    # BTCLR sfr.bit, $addr16
-    elif (rom[pc] == 0b00001000) and ((rom[pc+1] & 0xf8) == 0b11010000):
-        flow_type = FlowTypes.ConditionalJump
-        sfr = _I16(_sfr(rom[pc+2]))
-        bit = rom[pc+1] & 0x07
-        target_address = _I16(pc + 4 + (rom[pc+3] & 0x7f) - (rom[pc+3] & 0x80))
-        asm = f"BTCLR {{0}}.{bit:1d}, ${{1}}"
-        asm_args = (
-            (sfr, ArgumentTypes.ReferencedAddress),
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        referenced_addresses = (sfr, )
-        operands=(rom[pc+1], rom[pc+2], rom[pc+3])
-
-    # BT or BF A.bit, $addr16 and BT X.bit, $addr16
-    elif (rom[pc] == 0b00000011) and ((rom[pc+1] & 0xe0) == 0b10100000):
-        flow_type = FlowTypes.ConditionalJump
-        op = ("BF", "BT")[(rom[pc+1] >> 4) & 0x1]
-        arg = ("X", "A")[(rom[pc+1] >> 3) & 0x1] 
-        bit = rom[pc+1] & 0x07
-        target_address = _I16(pc + 3 + (rom[pc+2] & 0x7f) - (rom[pc+2] & 0x80))
-        asm = f"{op} {arg}.{bit:1d}, {{0}}"
-        asm_args = (
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
-
-    # BTCLR A.bit, $addr16 and BT X.bit, $addr16
-    elif (rom[pc] == 0b00000011) and ((rom[pc+1] & 0xf0) == 0b11010000):
-        flow_type = FlowTypes.ConditionalJump
-        arg = ("X", "A")[(rom[pc+1] >> 3) & 0x1] 
-        bit = rom[pc+1] & 0x07
-        target_address = _I16(pc + 3 + (rom[pc+2] & 0x7f) - (rom[pc+2] & 0x80))
-        asm = f"BTCLR {arg}.{bit:1d}, {{0}}"
-        asm_args = (
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
-
-    # BT or BF PSW.bit, $addr16
-    elif rom[pc] in (0b0000010, 0b00000010) and ((rom[pc+1] & 0xf8) == 0b10100000):
-        flow_type = FlowTypes.ConditionalJump
-        op = "BT" if rom[pc] == 0b00000010 else "BF"
-        bit = rom[pc+1] & 0x07
-        target_address = _I16(pc + 3 + (rom[pc+2] & 0x7f) - (rom[pc+2] & 0x80))
-        asm = f"{op} PSW.{bit:1d}, ${{0}}"
-        asm_args = (
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
-
-    # BTCLR PSW.bit, $addr16
-    elif (rom[pc] == 0b0000010) and ((rom[pc+1] & 0xf8) == 0b11010000):
-        flow_type = FlowTypes.ConditionalJump
-        bit = rom[pc+1] & 0x07
-        target_address = _I16(pc + 3 + (rom[pc+2] & 0x7f) - (rom[pc+2] & 0x80))
-        asm = f"BTCLR PSW.{bit:1d}, ${{0}}"
-        asm_args = (
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
-
-    # DBNZ r1, $addr16
-    elif (rom[pc] & 0xfe) == 0b00110010:
-        flow_type = FlowTypes.ConditionalJump
-        r1 = _r1(rom[pc])
-        target_address = _I16(pc + 2 + (rom[pc+1] & 0x7f) - (rom[pc+1] & 0x80))
-        asm = f"DBNZ {r1}, {{0}}"
-        asm_args = (
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], )
-
-    # DBNZ saddr, $addr16
-    elif rom[pc] == 0b00111011:
-        flow_type = FlowTypes.ConditionalJump
-        target_address = _I16(pc + 3 + (rom[pc+2] & 0x7f) - (rom[pc+2] & 0x80))
-        saddr = _I16(_saddr(rom[pc+1]))
-        asm = f"DBNZ {{0}}, {{1}}"
-        asm_args = (
-            (saddr, ArgumentTypes.ReferencedAddress),
-            (target_address, ArgumentTypes.TargetAddress),
-        )
-        operands=(rom[pc+1], rom[pc+2])
-
+        r = "AX"
+        template = "{0} {1}, {2}"
     else:
-        raise IllegalInstructionError(f"Illegal opcode 0x{rom[pc]:02x} at 0x{pc:04x}")
-
-    inst = Instruction(asm = asm,
-                       asm_args=asm_args,
-                       flow_type=flow_type,
-                       opcode=opcodes,
+        return _illegal(rom, pc, opcodes, mem_prefix)
+    return Instruction(template=template, values=(op, r, rp), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP A, saddr/sfr
+def _alu_a(rom, pc, opcodes, address):
+    op = _math_ops(rom[pc])
+    asm_args = (
+        (address, ArgumentTypes.ReadAddress),
+    )
+    return Instruction(template="{1} A, {0}", values=(op,), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1],))
+
+def _alu_a_saddr(rom, pc, opcodes, mem_prefix):
+    return _alu_a(rom, pc, opcodes, _saddr(rom[pc+1]))
+
+def _alu_a_sfr(rom, pc, opcodes, mem_prefix):
+    return _alu_a(rom, pc, opcodes, _sfr(rom[pc+1]))
+
+# ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP saddr, saddr'
+def _alu_saddr_saddr(rom, pc, opcodes, mem_prefix):
+    op = _math_ops(rom[pc])
+    saddrp = _saddr(rom[pc+1])
+    saddr  = _saddr(rom[pc+2])
+    asm_args = (
+        (saddr, _math_destination(rom[pc])),
+        (saddrp, ArgumentTypes.ReadAddress),
+    )
+    return Instruction(template="{2} {0}, {1}",
+                       values=(op,), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# ADD/ADDC/SUB/SUBC/AND/OR/XOR/CMP A, mem and &mem
+_ALU_A_MEM = _mem_templates("{0} A, {1}%s", 2)
+
+def _alu_a_mem(rom, pc, opcodes, mem_prefix):
+    op = _math_ops(rom[pc+1])
+    addressing, values, operands = _mem(rom, pc)
+    return Instruction(template=_ALU_A_MEM[addressing],
+                       values=(op, mem_prefix) + values, asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
                        operands=operands)
 
-    return inst
+# ADDW/SUBW/CMPW AX, #word
+def _aluw_ax_word(rom, pc, opcodes, mem_prefix):
+    op = _math_opsW(rom[pc])
+    word = _addr16(rom[pc+1], rom[pc+2])
+    return Instruction(template="{0} AX, #{1:04x}",
+                       values=(op, word), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# ADDW/SUBW/CMPW AX, saddrp/sfrp
+def _aluw_ax(rom, pc, opcodes, address):
+    op = _math_opsW(rom[pc])
+    asm_args = (
+        (address, ArgumentTypes.ReadAddress),
+    )
+    return Instruction(template="{1} AX, {0}", values=(op,), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+def _aluw_ax_saddrp(rom, pc, opcodes, mem_prefix):
+    return _aluw_ax(rom, pc, opcodes, _saddr(rom[pc+1]))
+
+def _aluw_ax_sfrp(rom, pc, opcodes, mem_prefix):
+    return _aluw_ax(rom, pc, opcodes, _sfr(rom[pc+1]))
+
+# MULU and DIVUW rp
+def _mulu_divuw(rom, pc, opcodes, mem_prefix):
+    op = ("MULU", "DIVUW")[(rom[pc+1] >> 4) & 0x1]
+    rp = _reg(rom[pc+1])
+    return Instruction(template="{0} {1}", values=(op, rp), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# INC/DEC r
+def _inc_dec_r(rom, pc, opcodes, mem_prefix):
+    op = ("INC", "DEC")[(rom[pc] >> 3) & 0x1]
+    r = _reg(rom[pc])
+    return Instruction(template="{0} {1}", values=(op, r), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=())
+
+# INC/DEC saddr
+def _inc_dec_saddr(rom, pc, opcodes, mem_prefix):
+    op = ("INC", "DEC")[rom[pc] & 0x1]
+    saddr = _saddr(rom[pc+1])
+    asm_args = (
+        (saddr, ArgumentTypes.ModifiedAddress),
+    )
+    return Instruction(template="{1} {0}", values=(op,), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# INCW/DECW rp
+def _incw_decw_rp(rom, pc, opcodes, mem_prefix):
+    op = ("INCW", "DECW")[(rom[pc] >> 3) & 0x1]
+    rp = _regpair(rom[pc] << 1)
+    return Instruction(template="{0} {1}", values=(op, rp), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=())
+
+# ROR/ROL/RORC/ROLC/SHR/SHL/SHRW/SHLW r, n
+def _shift(rom, pc, opcodes, mem_prefix):
+    ra = ((rom[pc+1] >> 6) & 0x03) + ((rom[pc] & 0x01) << 2)
+    op = ("RORC", "ROR", "SHR", "SHRW", "ROLC", "ROL", "SHL", "SHLW")[ra]
+    if (ra & 0x03) == 0x3:
+        r = _regpair(rom[pc+1])
+    else:
+        r = _reg(rom[pc+1])
+    n = (rom[pc+1] >> 3) & 0x07
+    return Instruction(template="{0} {1}, {2:1d}",
+                       values=(op, r, n), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# ROR4 et ROL4 mem1 and & mem1
+def _ror4_rol4(rom, pc, opcodes, mem_prefix):
+    op = ("ROR4", "ROL4")[(rom[pc+1] >> 4) & 0x1]
+    mem1 = _mem1((rom[pc+1] >> 1) & 0x1)
+    return Instruction(template="{0} {1}{2}",
+                       values=(op, mem_prefix, mem1), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# ADJBA/ADJBS
+def _adjba_adjbs(rom, pc, opcodes, mem_prefix):
+    template = ("ADJBA", "ADJBS")[rom[pc] & 0x01]
+    return Instruction(template=template, values=(), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=())
+
+def _saddr_or_sfr_bit(rom, pc, arg_type=ArgumentTypes.ReadAddress):
+    '''Return asm_args for a saddr.bit or sfr.bit operand of a 0x08 instruction'''
+    if (rom[pc+1] & 0x08) == 0:
+        address = _saddr(rom[pc+2])
+    else:
+        address = _sfr(rom[pc+2])
+    return (
+        (address, arg_type),
+    )
+
+# MOV1/AND1/OR1/XOR1 CY, saddr/sfr.bit
+def _bit_cy_saddr(rom, pc, opcodes, mem_prefix):
+    op = ("MOV1", "AND1", "OR1", "XOR1")[(rom[pc+1] >> 5) & 0x03]
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="{1} CY, {0}.{2:1d}", values=(op, bit),
+                       asm_args=_saddr_or_sfr_bit(rom, pc),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# MOV1 saddr/sfr.bit, CY
+def _mov1_saddr_cy(rom, pc, opcodes, mem_prefix):
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="MOV1 {0}.{1:1d}, CY", values=(bit,),
+                       asm_args=_saddr_or_sfr_bit(rom, pc, ArgumentTypes.ModifiedAddress),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# AND1 CY, /saddr.bit or /sfr.bit
+def _and1_cy_not_saddr(rom, pc, opcodes, mem_prefix):
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="AND1 CY, /{0}.{1:1d}, CY", values=(bit,),
+                       asm_args=_saddr_or_sfr_bit(rom, pc),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# OR1 CY, /saddr.bit or /sfr.bit
+def _or1_cy_not_saddr(rom, pc, opcodes, mem_prefix):
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="OR1 CY, /{0}.{1:1d}, CY", values=(bit,),
+                       asm_args=_saddr_or_sfr_bit(rom, pc),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# NOT1 saddr.bit or sfr.bit
+def _not1_saddr(rom, pc, opcodes, mem_prefix):
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="NOT1 {0}.{1:1d}", values=(bit,),
+                       asm_args=_saddr_or_sfr_bit(rom, pc, ArgumentTypes.ModifiedAddress),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# SET1/CLR1 sfr.bit
+def _set1_clr1_sfr(rom, pc, opcodes, mem_prefix):
+    op = ("SET1", "CLR1")[(rom[pc+1] >> 4) & 0x1]
+    sfr = _sfr(rom[pc+2])
+    bit = rom[pc+1] & 0x7
+    asm_args = (
+        (sfr, ArgumentTypes.ModifiedAddress),
+    )
+    return Instruction(template="{1} {0}.{2:1d}",
+                       values=(op, bit), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# MOV1/AND1/OR1/XOR1 CY, X.bit or A.bit
+def _bit_cy_r(rom, pc, opcodes, mem_prefix):
+    op = ("MOV1", "AND1", "OR1", "XOR1")[(rom[pc+1] >> 5) & 0x03]
+    r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="{0} CY, {1}.{2:1d}",
+                       values=(op, r, bit), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# MOV1 X.bit or A.bit, CY
+def _mov1_r_cy(rom, pc, opcodes, mem_prefix):
+    r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="MOV1 {0}.{1:1d}, CY",
+                       values=(r, bit), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# AND1 CY, /X.bit or /A.bit
+def _and1_cy_not_r(rom, pc, opcodes, mem_prefix):
+    r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="AND1 CY, /{0}.{1:1d}",
+                       values=(r, bit), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# OR1 CY, /X.bit or /A.bit
+def _or1_cy_not_r(rom, pc, opcodes, mem_prefix):
+    r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="OR1 CY, /{0}.{1:1d}",
+                       values=(r, bit), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# NOT1 X.bit or A.bit
+def _not1_r(rom, pc, opcodes, mem_prefix):
+    r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="NOT1 {0}.{1:1d}",
+                       values=(r, bit), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# SET1/CLR1 X.bit or A.bit
+def _set1_clr1_r(rom, pc, opcodes, mem_prefix):
+    op = ("SET1", "CLR1")[(rom[pc+1] >> 4) & 0x1]
+    r = ("X", "A")[(rom[pc+1] >> 3) & 0x01]
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="{0} {1}.{2:1d}",
+                       values=(op, r, bit), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# CLR1 CY, SET1 CY and NOT1 CY
+def _bit_cy(rom, pc, opcodes, mem_prefix):
+    template = ("CLR1 CY", "SET1 CY", "NOT1 CY")[rom[pc] & 0x03]
+    return Instruction(template=template, values=(), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=())
+
+# SET1/CLR1 saddr.bit
+def _set1_clr1_saddr(rom, pc, opcodes, mem_prefix):
+    op = ("CLR1", "SET1")[(rom[pc] >> 4) & 0x1]
+    saddr = _saddr(rom[pc+1])
+    bit = rom[pc] & 0x7
+    asm_args = (
+        (saddr, ArgumentTypes.ModifiedAddress),
+    )
+    return Instruction(template="{1} {0}.{2:1d}",
+                       values=(op, bit), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# MOV1/AND1/OR1/XOR1 CY, PSW.bit
+def _bit_cy_psw(rom, pc, opcodes, mem_prefix):
+    op = ("MOV1", "AND1", "OR1", "XOR1")[(rom[pc+1] >> 5) & 0x03]
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="{0} CY, PSW.{1:1d}",
+                       values=(op, bit), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# MOV1 PSW.bit, CY
+def _mov1_psw_cy(rom, pc, opcodes, mem_prefix):
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="MOV1 PSW.{0:1d}, CY",
+                       values=(bit,), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# AND1 CY, /PSW.bit
+def _and1_cy_not_psw(rom, pc, opcodes, mem_prefix):
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="AND1 CY, /PSW.{0:1d}",
+                       values=(bit,), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# OR1 CY, /PSW.bit
+def _or1_cy_not_psw(rom, pc, opcodes, mem_prefix):
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="OR1 CY, /PSW.{0:1d}",
+                       values=(bit,), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# NOT1 PSW.bit
+def _not1_psw(rom, pc, opcodes, mem_prefix):
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="NOT1 PSW.{0:1d}", values=(bit,), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# SET1/CLR1 PSW.bit
+def _set1_clr1_psw(rom, pc, opcodes, mem_prefix):
+    op = ("SET1", "CLR1")[(rom[pc+1] >> 4) & 0x1]
+    bit = rom[pc+1] & 0x7
+    return Instruction(template="{0} PSW.{1:1d}",
+                       values=(op, bit), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# CALL !addr16
+def _call_addr16(rom, pc, opcodes, mem_prefix):
+    target_address = _addr16(rom[pc+1], rom[pc+2])
+    asm_args = (
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="CALL !{0}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.SubroutineCall, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# CALL rp
+def _call_rp(rom, pc, opcodes, mem_prefix):
+    rp = _regpair(rom[pc+1])
+    return Instruction(template="CALL {0}", values=(rp,), asm_args=(),
+                       flow_type=FlowTypes.SubroutineCall, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# CALLF !addr11
+def _callf(rom, pc, opcodes, mem_prefix):
+    target_address = 0x0800 + rom[pc+1] + ((rom[pc] & 0x07) << 8)
+    asm_args = (
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="CALLF !{0}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.SubroutineCall, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# CALLT [addr5]
+def _callt(rom, pc, opcodes, mem_prefix):
+    addr5 = rom[pc] & 0x1f
+    # the CALLT table holds the word targets at 0x0040-0x007f
+    table = 0x0040 + 2 * addr5
+    target_address = _addr16(rom[table], rom[table + 1])
+    asm_args = (
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="CALLT [{1:02x}]:{0}",
+                       values=(addr5,), asm_args=asm_args,
+                       flow_type=FlowTypes.SubroutineCall, opcode=opcodes,
+                       operands=())
+
+# BRK/RET/RETI/RETB
+def _return(rom, pc, opcodes, mem_prefix):
+    flow_type = FlowTypes.Stop if (rom[pc] == 0b01011110) else FlowTypes.SubroutineReturn
+    template = ("RET", "RETI", "BRK", "RETB")[((rom[pc] & 0x08) >> 2) + (rom[pc] & 0x01)]
+    return Instruction(template=template, values=(), asm_args=(),
+                       flow_type=flow_type, opcode=opcodes, operands=())
+
+# PUSH/POP rp
+def _push_pop_rp(rom, pc, opcodes, mem_prefix):
+    op = ("POP", "PUSH")[(rom[pc] >> 3) & 0x1]
+    rp = _regpair(rom[pc] << 1)
+    return Instruction(template="{0} {1}", values=(op, rp), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=())
+
+# PUSH/POP PSW
+def _push_pop_psw(rom, pc, opcodes, mem_prefix):
+    op = ("POP", "PUSH")[rom[pc] & 0x1]
+    return Instruction(template="{0} PSW", values=(op,), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=())
+
+# PUSH sfr
+def _push_sfr(rom, pc, opcodes, mem_prefix):
+    sfr = _sfr(rom[pc+1])
+    asm_args = (
+        (sfr, ArgumentTypes.ReadAddress),
+    )
+    return Instruction(template="PUSH {0}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# POP sfr
+def _pop_sfr(rom, pc, opcodes, mem_prefix):
+    sfr = _sfr(rom[pc+1])
+    asm_args = (
+        (sfr, ArgumentTypes.WrittenAddress),
+    )
+    return Instruction(template="POP {0}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# INCW SP and DECW SP
+def _incw_decw_sp(rom, pc, opcodes, mem_prefix):
+    op = ("INCW", "DECW")[rom[pc+1] & 0x1]
+    return Instruction(template="{0} SP", values=(op,), asm_args=(),
+                       flow_type=FlowTypes.Continue, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# BR !addr16
+def _br_addr16(rom, pc, opcodes, mem_prefix):
+    target_address = _addr16(rom[pc+1], rom[pc+2])
+    asm_args = (
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="BR !{0}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.UnconditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# BR rp
+def _br_rp(rom, pc, opcodes, mem_prefix):
+    rp = _regpair(rom[pc+1])
+    return Instruction(template="BR !{0}", values=(rp,), asm_args=(),
+                       flow_type=FlowTypes.IndirectUnconditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# BR $addr16
+def _br_rel(rom, pc, opcodes, mem_prefix):
+    target_address = _rel(pc, 2, rom[pc+1])
+    asm_args = (
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="BR ${0}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.UnconditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# BC/BL, BNC/BNL, BZ/BE, BNZ/BNE $addr16
+def _bcc(rom, pc, opcodes, mem_prefix):
+    target_address = _rel(pc, 2, rom[pc+1])
+    op = ("BNZ", "BZ", "BNC", "BC")[rom[pc] & 0x3]
+    asm_args = (
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="{1} ${0}", values=(op,), asm_args=asm_args,
+                       flow_type=FlowTypes.ConditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# BT saddr.bit, $addr16
+def _bt_saddr(rom, pc, opcodes, mem_prefix):
+    saddr = _saddr(rom[pc+1])
+    bit = rom[pc] & 0x07
+    target_address = _rel(pc, 3, rom[pc+2])
+    asm_args = (
+        (saddr, ArgumentTypes.ReadAddress),
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="BT {0}.{2:1d}, ${1}",
+                       values=(bit,), asm_args=asm_args,
+                       flow_type=FlowTypes.ConditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# BF saddr.bit, $addr16
+def _bf_saddr(rom, pc, opcodes, mem_prefix):
+    op = ("BF", "BTCLR")[(rom[pc+1] >> 4) & 0x1]
+    arg_type = (ArgumentTypes.ReadAddress, ArgumentTypes.ModifiedAddress)[(rom[pc+1] >> 4) & 0x1]
+    saddr = _saddr(rom[pc+2])
+    bit = rom[pc+1] & 0x07
+    target_address = _rel(pc, 4, rom[pc+3])
+    asm_args = (
+        (saddr, arg_type),
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="{2} {0}.{3:1d}, ${1}",
+                       values=(op, bit), asm_args=asm_args,
+                       flow_type=FlowTypes.ConditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2], rom[pc+3]))
+
+# BT or BF sfr.bit, $addr16
+def _bt_bf_sfr(rom, pc, opcodes, mem_prefix):
+    op = ("BF", "BT")[(rom[pc+1] >> 4) & 0x1]
+    sfr = _sfr(rom[pc+2])
+    bit = rom[pc+1] & 0x07
+    target_address = _rel(pc, 4, rom[pc+3])
+    asm_args = (
+        (sfr, ArgumentTypes.ReadAddress),
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="{2} {0}.{3:1d}, ${1}",
+                       values=(op, bit), asm_args=asm_args,
+                       flow_type=FlowTypes.ConditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2], rom[pc+3]))
+
+# BTCLR sfr.bit, $addr16
+def _btclr_sfr(rom, pc, opcodes, mem_prefix):
+    sfr = _sfr(rom[pc+2])
+    bit = rom[pc+1] & 0x07
+    target_address = _rel(pc, 4, rom[pc+3])
+    asm_args = (
+        (sfr, ArgumentTypes.ModifiedAddress),
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="BTCLR {0}.{2:1d}, ${1}",
+                       values=(bit,), asm_args=asm_args,
+                       flow_type=FlowTypes.ConditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2], rom[pc+3]))
+
+# BT or BF A.bit, $addr16 and BT X.bit, $addr16
+def _bt_bf_r(rom, pc, opcodes, mem_prefix):
+    op = ("BF", "BT")[(rom[pc+1] >> 4) & 0x1]
+    arg = ("X", "A")[(rom[pc+1] >> 3) & 0x1]
+    bit = rom[pc+1] & 0x07
+    target_address = _rel(pc, 3, rom[pc+2])
+    asm_args = (
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="{1} {2}.{3:1d}, {0}",
+                       values=(op, arg, bit), asm_args=asm_args,
+                       flow_type=FlowTypes.ConditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# BTCLR A.bit, $addr16 and BT X.bit, $addr16
+def _btclr_r(rom, pc, opcodes, mem_prefix):
+    arg = ("X", "A")[(rom[pc+1] >> 3) & 0x1]
+    bit = rom[pc+1] & 0x07
+    target_address = _rel(pc, 3, rom[pc+2])
+    asm_args = (
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="BTCLR {1}.{2:1d}, {0}",
+                       values=(arg, bit), asm_args=asm_args,
+                       flow_type=FlowTypes.ConditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# BT or BF PSW.bit, $addr16
+def _bt_psw(rom, pc, opcodes, mem_prefix):
+    bit = rom[pc+1] & 0x07
+    target_address = _rel(pc, 3, rom[pc+2])
+    asm_args = (
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="BT PSW.{1:1d}, ${0}",
+                       values=(bit,), asm_args=asm_args,
+                       flow_type=FlowTypes.ConditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# BTCLR PSW.bit, $addr16
+def _btclr_psw(rom, pc, opcodes, mem_prefix):
+    bit = rom[pc+1] & 0x07
+    target_address = _rel(pc, 3, rom[pc+2])
+    asm_args = (
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="BTCLR PSW.{1:1d}, ${0}",
+                       values=(bit,), asm_args=asm_args,
+                       flow_type=FlowTypes.ConditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+# DBNZ r1, $addr16
+def _dbnz_r1(rom, pc, opcodes, mem_prefix):
+    r1 = _r1(rom[pc])
+    target_address = _rel(pc, 2, rom[pc+1])
+    asm_args = (
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="DBNZ {1}, {0}",
+                       values=(r1,), asm_args=asm_args,
+                       flow_type=FlowTypes.ConditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], ))
+
+# DBNZ saddr, $addr16
+def _dbnz_saddr(rom, pc, opcodes, mem_prefix):
+    target_address = _rel(pc, 3, rom[pc+2])
+    saddr = _saddr(rom[pc+1])
+    asm_args = (
+        (saddr, ArgumentTypes.ModifiedAddress),
+        (target_address, ArgumentTypes.TargetAddress),
+    )
+    return Instruction(template="DBNZ {0}, {1}", values=(), asm_args=asm_args,
+                       flow_type=FlowTypes.ConditionalJump, opcode=opcodes,
+                       operands=(rom[pc+1], rom[pc+2]))
+
+
+# Second-level tables, indexed by the byte following the opcode
+
+_OPCODE_TABLE_02 = _build_table((
+    (0x90, 0x00, _bit_cy_psw),
+    (0xf8, 0x10, _mov1_psw_cy),
+    (0xf8, 0x30, _and1_cy_not_psw),
+    (0xf8, 0x50, _or1_cy_not_psw),
+    (0xf8, 0x70, _not1_psw),
+    (0xe8, 0x80, _set1_clr1_psw),
+    (0xf8, 0xa0, _bt_psw),
+    (0xf8, 0xd0, _btclr_psw),
+))
+
+_OPCODE_TABLE_03 = _build_table((
+    (0x90, 0x00, _bit_cy_r),
+    (0xf0, 0x10, _mov1_r_cy),
+    (0xf0, 0x30, _and1_cy_not_r),
+    (0xf0, 0x50, _or1_cy_not_r),
+    (0xf0, 0x70, _not1_r),
+    (0xe0, 0x80, _set1_clr1_r),
+    (0xe0, 0xa0, _bt_bf_r),
+    (0xf0, 0xd0, _btclr_r),
+))
+
+_OPCODE_TABLE_05 = _build_table((
+    (0xfc, 0xa8, _sel_rb),
+    (0xfe, 0xe2, _movw_ax_mem1),
+    (0xfe, 0xe6, _movw_mem1_ax),
+    (0xe8, 0x08, _mulu_divuw),
+    (0xed, 0x8c, _ror4_rol4),
+    (0xf8, 0x58, _call_rp),
+    (0xfe, 0xc8, _incw_decw_sp),
+    (0xf9, 0x48, _br_rp),
+))
+
+_OPCODE_TABLE_08 = _build_table((
+    (0x90, 0x00, _bit_cy_saddr),
+    (0xf0, 0x10, _mov1_saddr_cy),
+    (0xf0, 0x30, _and1_cy_not_saddr),
+    (0xf0, 0x50, _or1_cy_not_saddr),
+    (0xf0, 0x70, _not1_saddr),
+    (0xe8, 0x88, _set1_clr1_sfr),
+    (0xe8, 0xa0, _bf_saddr),
+    (0xe8, 0xa8, _bt_bf_sfr),
+    (0xf8, 0xd0, _btclr_sfr),
+))
+
+_OPCODE_TABLE_09 = _build_table((
+    (0xff, 0xc0, _mov_stbc_byte),
+    (0xff, 0xf0, _mov_a_addr16),
+    (0xff, 0xf1, _mov_addr16_a),
+))
+
+# shared by 0x16 (mem), 0x06 (based) and 0x0a (indexed) addressing
+_OPCODE_TABLE_16 = _build_table((
+    (0x8f, 0x00, _mov_a_mem),
+    (0x8f, 0x80, _mov_mem_a),
+    (0x8f, 0x04, _xch_a_mem),
+    (0x88, 0x08, _alu_a_mem),
+))
+
+# First-level table, indexed by the opcode byte
+
+_OPCODE_TABLE = _build_table((
+    (0xff, 0x00, _nop),
+    (0xff, 0x09, _second_level(_OPCODE_TABLE_09)),
+    (0xff, 0x05, _second_level(_OPCODE_TABLE_05)),
+    (0xfe, 0x4a, _di_ei),
+    (0xf8, 0xb8, _mov_r_byte),
+    (0xff, 0x3a, _mov_saddr_byte),
+    (0xff, 0x2b, _mov_sfr_byte),
+    (0xff, 0x24, _mov_r_r),
+    (0xf8, 0xd0, _mov_a_r),
+    (0xff, 0x20, _mov_a_saddr),
+    (0xff, 0x22, _mov_saddr_a),
+    (0xff, 0x10, _mov_a_sfr),
+    (0xff, 0x12, _mov_sfr_a),
+    (0xff, 0x38, _mov_saddr_saddr),
+    (0xfe, 0x58, _mov_a_mem_short),
+    (0xfe, 0x5a, _mov_a_mem_short),
+    (0xfe, 0x5c, _mov_a_mem_short),
+    (0xff, 0x16, _second_level(_OPCODE_TABLE_16)),
+    (0xff, 0x06, _second_level(_OPCODE_TABLE_16)),
+    (0xff, 0x0a, _second_level(_OPCODE_TABLE_16)),
+    (0xfe, 0x50, _mov_mem_a_short),
+    (0xfe, 0x52, _mov_mem_a_short),
+    (0xfe, 0x54, _mov_mem_a_short),
+    (0xff, 0x25, _xch_r_r),
+    (0xf8, 0xd8, _xch_a_r),
+    (0xff, 0x21, _xch_a_saddr),
+    (0xff, 0x39, _xch_saddr_saddr),
+    (0xf8, 0x60, _movw_rp_word),
+    (0xff, 0x0c, _movw_saddrp_word),
+    (0xff, 0x0b, _movw_sfrp_word),
+    (0xff, 0x1c, _movw_ax_saddrp),
+    (0xff, 0x1a, _movw_saddrp_ax),
+    (0xfd, 0x11, _movw_ax_sfrp),
+    (0xf8, 0xa8, _alu_a_byte),
+    (0xf8, 0x68, _alu_saddr_byte),
+    (0xf8, 0x88, _alu_r_r),
+    (0xf8, 0x98, _alu_a_saddr),
+    (0xf8, 0x78, _alu_saddr_saddr),
+    (0xff, 0x2d, _aluw_ax_word),
+    (0xfe, 0x2e, _aluw_ax_word),
+    (0xff, 0x1d, _aluw_ax_saddrp),
+    (0xfe, 0x1e, _aluw_ax_saddrp),
+    (0xf0, 0xc0, _inc_dec_r),
+    (0xfe, 0x26, _inc_dec_saddr),
+    (0xf4, 0x44, _incw_decw_rp),
+    (0xfe, 0x30, _shift),
+    (0xfe, 0x0e, _adjba_adjbs),
+    (0xff, 0x08, _second_level(_OPCODE_TABLE_08)),
+    (0xff, 0x03, _second_level(_OPCODE_TABLE_03)),
+    (0xfe, 0x40, _bit_cy),
+    (0xff, 0x42, _bit_cy),
+    (0xe8, 0xa0, _set1_clr1_saddr),
+    (0xff, 0x02, _second_level(_OPCODE_TABLE_02)),
+    (0xff, 0x28, _call_addr16),
+    (0xf8, 0x90, _callf),
+    (0xe0, 0xe0, _callt),
+    (0xf6, 0x56, _return),
+    (0xf4, 0x34, _push_pop_rp),
+    (0xfe, 0x48, _push_pop_psw),
+    (0xff, 0x29, _push_sfr),
+    (0xff, 0x43, _pop_sfr),
+    (0xff, 0x2c, _br_addr16),
+    (0xff, 0x14, _br_rel),
+    (0xfc, 0x80, _bcc),
+    (0xf8, 0x70, _bt_saddr),
+    (0xfe, 0x32, _dbnz_r1),
+    (0xff, 0x3b, _dbnz_saddr),
+))
+
+# Second-level table for the 0x01 prefix: same as the first-level table but
+# saddr operands are replaced by sfr operands
+_PREFIX_01_TABLE = list(_OPCODE_TABLE)
+_PREFIX_01_TABLE[0x21] = _xch_a_sfr
+for _opcode in range(0x68, 0x70):
+    _PREFIX_01_TABLE[_opcode] = _alu_sfr_byte
+for _opcode in range(0x98, 0xa0):
+    _PREFIX_01_TABLE[_opcode] = _alu_a_sfr
+for _opcode in range(0x1d, 0x20):
+    _PREFIX_01_TABLE[_opcode] = _aluw_ax_sfrp
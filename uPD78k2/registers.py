@@ -0,0 +1,100 @@
+# Effect of 78K/II instructions on known register values, for the tracer
+#
+# Register values are kept as a tuple of 8 bytes in _reg() order (X, A, C,
+# B, E, D, L, H) where None is an unknown value.  Only instructions whose
+# effect is simple are modelled; any other instruction makes all registers
+# and the register bank unknown, which is always safe.
+
+REGISTER_NAMES = ('X', 'A', 'C', 'B', 'E', 'D', 'L', 'H')
+REGISTER_PAIR_NAMES = ('AX', 'BC', 'DE', 'HL')
+
+UNKNOWN_REGISTERS = (None, ) * 8
+
+_X, _A = 0, 1
+_REGISTER_AREA = range(0xfee0, 0xff00)  # general registers of all banks
+_PSW_SFR_LOWS = (0xfe, 0xff)            # PSW (holds the RBS bank bits)
+
+# Instructions that change neither registers nor PSW bank bits
+_PRESERVING = frozenset(
+    [0x00] +                                # NOP
+    [0x80, 0x81, 0x82, 0x83] +              # BNZ/BZ/BNC/BC $addr16
+    [0x14, 0x2c] +                          # BR $addr16, BR !addr16
+    [0x4a, 0x4b] +                          # DI/EI
+    [0xaf]                                  # CMP A, #byte
+)
+
+
+def register_pair(regs, rp):
+    '''Return the value of register pair rp (0-3 for AX, BC, DE, HL), or
+    None if unknown'''
+    low = regs[2 * rp]
+    high = regs[2 * rp + 1]
+    if low is None or high is None:
+        return None
+    return (high << 8) | low
+
+def _saddr(low):
+    return 0xff00 + low if low < 0x20 else 0xfe00 + low
+
+def execute(rom, pc, bank, regs):
+    '''Return the (bank, regs) known after the instruction at pc'''
+    opcode = rom[pc]
+
+    if opcode in _PRESERVING:
+        return bank, regs
+
+    if 0xb8 <= opcode <= 0xbf:  # MOV r, #byte
+        regs = list(regs)
+        regs[opcode & 0x07] = rom[pc + 1]
+        return bank, tuple(regs)
+
+    if (opcode & 0xf8) == 0x60:  # MOVW rp, #word
+        rp = (opcode >> 1) & 0x03
+        regs = list(regs)
+        regs[2 * rp] = rom[pc + 1]
+        regs[2 * rp + 1] = rom[pc + 2]
+        return bank, tuple(regs)
+
+    if (opcode & 0xf8) == 0xd0:  # MOV A, r
+        regs = list(regs)
+        regs[_A] = regs[opcode & 0x07]
+        return bank, tuple(regs)
+
+    if (opcode & 0xf8) == 0xd8:  # XCH A, r
+        r = opcode & 0x07
+        regs = list(regs)
+        regs[_A], regs[r] = regs[r], regs[_A]
+        return bank, tuple(regs)
+
+    if opcode in (0x22, 0x3a):  # MOV saddr, A / MOV saddr, #byte
+        if _saddr(rom[pc + 1]) not in _REGISTER_AREA:
+            return bank, regs
+        return None, UNKNOWN_REGISTERS
+
+    if opcode in (0x12, 0x2b):  # MOV sfr, A / MOV sfr, #byte
+        if rom[pc + 1] not in _PSW_SFR_LOWS:
+            return bank, regs
+        return None, UNKNOWN_REGISTERS
+
+    if opcode == 0x05 and (rom[pc + 1] & 0xfc) == 0xa8:  # SEL RBn
+        return rom[pc + 1] & 0x03, UNKNOWN_REGISTERS
+
+    return None, UNKNOWN_REGISTERS
+
+def indirect_target(rom, pc, regs):
+    '''Return the target of the BR rp or CALL rp at pc if the register
+    pair is known, else None'''
+    if rom[pc] == 0x05:
+        second = rom[pc + 1]
+        if (second & 0xf9) == 0x48 or (second & 0xf8) == 0x58:
+            return register_pair(regs, (second >> 1) & 0x03)
+    return None
+
+def join(bank, regs, other_bank, other_regs):
+    '''Return the (bank, regs) known in both states'''
+    if bank != other_bank:
+        bank = None
+    if regs != other_regs:
+        regs = tuple(value if value == other else None
+                     for value, other in zip(regs, other_regs))
+    return bank, regs
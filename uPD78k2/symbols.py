@@ -1,37 +1,39 @@
+from uPD78k2.disassemble import DATA_XREF_KINDS
+
+
 
 class SymbolTable(object):
     def __init__(self, initial_symbols=None):
         if initial_symbols is None:
             initial_symbols = {}
         self.symbols = initial_symbols.copy()
+        # every generated symbol, including those an initial symbol shadows
+        self.generated = {}
+
+    def generate(self, memory, traceable_range):
+        self.generate_code_symbols(memory, traceable_range)
+        self.generate_data_symbols(memory, traceable_range)
 
-    def generate(self, memory, start_address):
-        self.generate_code_symbols(memory, start_address)
-        self.generate_data_symbols(memory, start_address)
+    def add_generated(self, address, name):
+        '''Record a generated symbol, used unless address already has one'''
+        if address not in self.generated:
+            self.generated[address] = (name, '')
+            self.symbols.setdefault(address, (name, ''))
 
-    def generate_code_symbols(self, memory, start_address):
-        for address in range(start_address, len(memory)):
-            if address not in self.symbols:
+    def generate_code_symbols(self, memory, traceable_range):
+        for address in sorted(memory.iter_annotated()):
+            if address in traceable_range:
                 if memory.is_call_target(address):
                     if memory.is_instruction_start(address):
-                        self.symbols[address] = ('sub_%04x' % address, '')
+                        self.add_generated(address, 'sub_%04x' % address)
                 elif memory.is_jump_target(address) or memory.is_entry_point(address):
                     if memory.is_instruction_start(address):
-                        self.symbols[address] = ('lab_%04x' % address, '')
-        # XXX do not overwrite
-
-    def generate_data_symbols(self, memory, start_address):
-        data_addresses = set()
-
-        for _, inst in memory.iter_instructions():
-            addresses = getattr(inst, 'referenced_addresses', None)
-            if addresses is not None:
-                for address in addresses:
-                    data_addresses.add(address)
+                        self.add_generated(address, 'lab_%04x' % address)
 
-        for address in data_addresses:
-            if address not in self.symbols:
-                self.symbols[address] = ('mem_%04x' % address, '')
+    def generate_data_symbols(self, memory, traceable_range):
+        # data may live outside of the traceable range (RAM, SFRs)
+        for address in memory.iter_xref_targets(*DATA_XREF_KINDS):
+            self.add_generated(address, 'mem_%04x' % address)
 
 
 NEC78K2_COMMON_SYMBOLS = {}